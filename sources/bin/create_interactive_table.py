@@ -4,15 +4,21 @@ import argparse
 from pathlib import Path
 
 import pandas as pd
+import shared
 
 
 def load_table(tsv_path: str) -> pd.DataFrame:
     """
-    Load TSV as dataframe
+    Load TSV as dataframe, from the Parquet file next to it if written from it
 
     :param tsv_path: Path to TSV file with table
     """
-    df = pd.read_csv(tsv_path, sep="\t").fillna("")
+    df = shared.read_table(tsv_path)
+    for col in df.columns:
+        # list columns from the Parquet file are displayed as in the TSV file
+        if df[col].map(lambda value: isinstance(value, list)).any():
+            df[col] = shared.format_list_column(df[col])
+    df = df.fillna("")
     df.insert(0, "Expand", "")  # the column where the expand button is shown
     return df
 
@@ -6,6 +6,7 @@ from typing import Dict
 import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
+import shared
 from PIL import Image
 from wordcloud import WordCloud
 
@@ -16,11 +17,12 @@ def prepare_data(table_path: str, name_col: str, stat_col: str) -> Dict:
     value the stat/counts
 
     :param table_path: Path TSV file with name and stats
-        have the columns "Galaxy wrapper id" and `stats_column`
+        have the columns "Galaxy wrapper id" and `stats_column`,
+        read from the Parquet file next to it if written from it
     :param name_col: Name of the column with name for wordcloud
     :param stat_col: Name of columns with usage/count
     """
-    table = pd.read_csv(table_path, sep="\t")
+    table = shared.read_table(table_path, columns=[name_col, stat_col])
 
     assert stat_col in table, f"Stat column: {stat_col} not found in table!"
     assert name_col in table, f"Name column: {name_col} not found in table!"
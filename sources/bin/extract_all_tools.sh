@@ -14,6 +14,7 @@ then
                         --all-tutorials "communities/all/resources/test_tutorials.json" \
                         --test \
                         --clone-depth 0 \
+                        --clone-mode sparse \
                         "${@:2}"
         else
                 tsv_output="communities/all/resources/${1}_tools.tsv"
@@ -29,7 +30,11 @@ then
                         --all-workflows "communities/all/resources/workflows.json" \
                         --all-tutorials "communities/all/resources/tutorials.json" \
                         --planemo-repository-list $1 \
-                        --clone-depth 0
+                        --manifest "$HOME/.galaxy_tool_manifest/${1}.json" \
+                        --biotools-source index \
+                        --conda-source repodata \
+                        --clone-depth 0 \
+                        --clone-mode sparse
                 else
                 python sources/bin/extract_galaxy_tools.py \
                         extract \
@@ -39,8 +44,12 @@ then
                         --all-workflows "communities/all/resources/workflows.json" \
                         --all-tutorials "communities/all/resources/tutorials.json" \
                         --planemo-repository-list $1 \
+                        --manifest "$HOME/.galaxy_tool_manifest/${1}.json" \
+                        --biotools-source index \
+                        --conda-source repodata \
                         --avoid-extra-repositories \
-                        --clone-depth 0
+                        --clone-depth 0 \
+                        --clone-mode sparse
                 fi
         fi
 else
@@ -52,6 +61,7 @@ else
                 --all-yml 'communities/all/resources/tools.yml' \
                 --all-workflows "communities/all/resources/workflows.json" \
                 --all-tutorials "communities/all/resources/tutorials.json" \
-                --clone-depth 0
+                --clone-depth 0 \
+                --clone-mode sparse
 fi
 
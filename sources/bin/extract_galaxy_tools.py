@@ -1,24 +1,41 @@
 #!/usr/bin/env python
 import argparse
+import codecs
+import copy
+import csv
+import gzip
+import hashlib
+import heapq
 import json
+import os
 import re
+import shutil
+import sqlite3
 import subprocess
 import sys
+import time
 import traceback
 import xml.etree.ElementTree as et
 from concurrent.futures import (
     as_completed,
+    ProcessPoolExecutor,
     ThreadPoolExecutor,
+    TimeoutError as FuturesTimeoutError,
 )
 from functools import lru_cache
 from pathlib import Path
 from typing import (
     Any,
+    Callable,
     Dict,
+    FrozenSet,
+    Iterable,
+    Iterator,
     List,
     Literal,
     Optional,
     Pattern,
+    Set,
     Tuple,
     Union,
 )
@@ -29,7 +46,6 @@ import requests
 import shared
 import yaml
 from extract_galaxy_workflows import Workflows
-from owlready2 import get_ontology
 from ruamel.yaml import YAML as ruamelyaml
 from ruamel.yaml.scalarstring import LiteralScalarString
 
@@ -43,6 +59,12 @@ USEGALAXY_SERVER_URLS = {
     "UseGalaxy.fr": "https://usegalaxy.fr",
 }
 
+BIOCONDA_CHANNEL_URL = "https://conda.anaconda.org/bioconda"
+BIOCONDA_SUBDIRS = ["noarch", "linux-64"]
+
+# Version of the metadata stored in the extraction manifest, to increase when the extracted metadata change
+MANIFEST_VERSION = 4
+
 stat_usage_date = "2025.08.31"
 project_path = Path(__file__).resolve().parent.parent  # galaxy_tool_extractor folder
 usage_stats_path = project_path.joinpath("data", "usage_stats", f"usage_stats_{ stat_usage_date }")
@@ -77,7 +99,7 @@ STATS_SUM = {
 
 # load the configs globally
 with open(conf_path) as f:
-    configs = yaml.safe_load(f)
+    configs = yaml.load(f, Loader=shared.YAML_LOADER)
 
 
 def get_last_url_position(toot_id: str) -> str:
@@ -94,6 +116,27 @@ def get_last_url_position(toot_id: str) -> str:
     return toot_id
 
 
+def get_stats_mode(stat_name: str) -> Literal["sum", "max"]:
+    """
+    Get the aggregation mode of a stat: user counts can not be summed over the tools of a suite
+    (a user of 2 tools would be counted twice), so the max is used for them
+
+    :param stat_name: name of the stat column, e.g. "Suite users (usegalaxy.eu)"
+    """
+    return "max" if "Suite users" in stat_name else "sum"
+
+
+def group_tool_stats_by_suite_id(tool_stats_df: pd.DataFrame) -> pd.Series:
+    """
+    Sum the counts of a stats DataFrame per suite-level tool ID (all versions and toolsheds together)
+
+    :param tool_stats_df: DataFrame with 'tool_name' and 'count' columns. (toolshed.g2.bx.psu.edu/repos/iuc/snpsift/snpSift_filter,3394539)
+    """
+    # vectorised equivalent of get_last_url_position
+    suite_ids = tool_stats_df["tool_name"].astype(str).str.rsplit("/", n=1).str[-1]
+    return tool_stats_df["count"].groupby(suite_ids).sum()
+
+
 def get_tool_stats_from_stats_file(
     tool_stats_df: pd.DataFrame, tool_ids: List[str], mode: Literal["sum", "max"] = "sum"
 ) -> int:
@@ -106,11 +149,8 @@ def get_tool_stats_from_stats_file(
     :param mode: Aggregation mode: "sum" or "max".
     :return: Aggregated count based on mode.
     """
-    # extract suite-level tool ID from full tool_name path
-    tool_stats_df["Suite ID"] = tool_stats_df["tool_name"].apply(get_last_url_position)
-
     # Group by Suite ID and sum all version counts
-    grouped = tool_stats_df.groupby("Suite ID")["count"].sum()
+    grouped = group_tool_stats_by_suite_id(tool_stats_df)
 
     # Get values for tool_ids that are present in grouped index
     relevant_counts: List[int] = [int(grouped[tid]) for tid in tool_ids if tid in grouped]
@@ -121,6 +161,83 @@ def get_tool_stats_from_stats_file(
     return max(relevant_counts) if mode == "max" else sum(relevant_counts)
 
 
+class UsageStatsIndex:
+    """
+    Usage statistics of all stats files, each file being loaded only once and
+    indexed by suite-level tool ID for constant-time lookups
+    """
+
+    def __init__(self, stats_files: Dict[str, Path]) -> None:
+        """
+        :param stats_files: dictionary with stat names as keys and path to stats CSV files as values
+        """
+        self.counts: Dict[str, Dict[str, int]] = {}
+        columns: Dict[str, pd.Series] = {}
+        for name, path in stats_files.items():
+            grouped = group_tool_stats_by_suite_id(pd.read_csv(path))
+            grouped.index = grouped.index.astype(str)
+            self.counts[name] = {str(suite_id): int(count) for suite_id, count in grouped.items()}
+            columns[name] = grouped
+        # wide table: one row per suite-level tool ID, one column per stat
+        self.table = pd.DataFrame(columns).fillna(0).astype("int64")
+        self.table.index.name = "Tool ID"
+
+    def get_stat(self, name: str, tool_ids: List[str], mode: Optional[Literal["sum", "max"]] = None) -> int:
+        """
+        Aggregate a stat for a list of tool IDs, using either sum or max
+
+        :param name: name of the stat, key of the stats files dictionary
+        :param tool_ids: list of suite-level tool IDs
+        :param mode: aggregation mode, by default derived from the stat name
+        """
+        counts = self.counts[name]
+        relevant_counts = [counts[tid] for tid in tool_ids if tid in counts]
+        if not relevant_counts:
+            return 0
+        if mode is None:
+            mode = get_stats_mode(name)
+        return max(relevant_counts) if mode == "max" else sum(relevant_counts)
+
+    def get_stats_table(self, tools: List[Dict[str, Any]], stats_sum: Dict[str, Pattern[str]]) -> pd.DataFrame:
+        """
+        Aggregate all stats for all tools in one pass: the tool IDs are exploded in a long table,
+        joined to the wide stats table and reduced per tool, with sum or max depending on the stat.
+        The totals on main servers are then computed column-wise.
+
+        :param tools: list of dictionaries with tool metadata and "Tool IDs"
+        :param stats_sum: dictionary mapping the name of the totals to regex patterns matching the stats to sum
+        :return: DataFrame with one row per tool (in the same order) and one column per stat and total
+        """
+        tool_ids = pd.DataFrame(
+            {
+                "tool": np.repeat(np.arange(len(tools)), [len(tool["Tool IDs"]) for tool in tools]),
+                "Tool ID": [tool_id for tool in tools for tool_id in tool["Tool IDs"]],
+            }
+        )
+        merged = tool_ids.join(self.table, on="Tool ID", how="inner")
+        stats = (
+            merged.groupby("tool")
+            .agg({name: get_stats_mode(name) for name in self.table.columns})
+            .reindex(range(len(tools)), fill_value=0)
+            .astype("int64")
+        )
+        for stat_name, pattern in stats_sum.items():
+            stats[f"{stat_name} on main servers"] = stats[[c for c in self.table.columns if pattern.match(c)]].sum(
+                axis=1
+            )
+        return stats
+
+    def add_stats_to_tools(self, tools: List[Dict[str, Any]], stats_sum: Dict[str, Pattern[str]]) -> None:
+        """
+        Add all stats and their totals on main servers to the tools
+
+        :param tools: list of dictionaries with tool metadata and "Tool IDs"
+        :param stats_sum: dictionary mapping the name of the totals to regex patterns matching the stats to sum
+        """
+        for tool, stats in zip(tools, self.get_stats_table(tools, stats_sum).to_dict("records")):
+            tool.update({str(name): value for name, value in stats.items()})
+
+
 def get_tool_repositories(
     clone_dir: Path,
     repository_list: Optional[str] = None,
@@ -194,41 +311,254 @@ def _normalize_repo_url(url: str) -> str:
     return url
 
 
-def clone_repositories(repo_list: List[str], clone_dir: Path, depth: Optional[int] = 1) -> List[Tuple[str, Path]]:
+def get_repository_size(repo_path: Path) -> int:
+    """
+    Get the size in bytes of the git objects of a local repository, 0 if it can not be determined
+
+    :param repo_path: path to the local repository
+    """
+    if not repo_path.exists():
+        return 0
+    try:
+        result = subprocess.run(
+            ["git", "-C", str(repo_path), "count-objects", "-v"], capture_output=True, text=True, timeout=60
+        )
+        sizes = dict(line.split(": ", 1) for line in str(result.stdout).splitlines() if ": " in line)
+        return (int(sizes.get("size", 0)) + int(sizes.get("size-pack", 0))) * 1024
+    except (subprocess.SubprocessError, OSError, ValueError):
+        return 0
+
+
+def get_remote_head(url: str, timeout: float = 60) -> str:
+    """
+    Get the commit hash of the HEAD of a remote repository without fetching it,
+    empty string if it can not be determined
+
+    :param url: repository URL
+    :param timeout: timeout in seconds of git ls-remote
+    """
+    # never wait for credentials of private or deleted repositories
+    env = {**os.environ, "GIT_TERMINAL_PROMPT": "0"}
+    try:
+        result = subprocess.run(
+            ["git", "ls-remote", url, "HEAD"], capture_output=True, text=True, timeout=timeout, env=env
+        )
+    except (subprocess.SubprocessError, OSError):
+        return ""
+    if result.returncode != 0:
+        return ""
+    for line in str(result.stdout).splitlines():
+        commit, _, ref = line.partition("\t")
+        if ref == "HEAD":
+            return commit
+    return ""
+
+
+def clone_repository(
+    url: str,
+    dest: Path,
+    depth: Optional[int] = 1,
+    timeout: float = 900,
+    retries: int = 2,
+    backoff: float = 5,
+    mode: str = "full",
+) -> Dict[str, Any]:
+    """
+    Clone a repository or update it if it is already cloned, retrying with exponential backoff.
+    In sparse mode, the clone is a partial clone without the file contents of the history
+    and only the files of SPARSE_CHECKOUT_PATTERNS are checked out and downloaded, with the files outside them
+    that the tool folders symlink or import (see checkout_sparse_dependencies); the commits and trees are all fetched, so the first commit dates of the folders are unchanged.
+
+    :param url: repository URL
+    :param dest: local path of the repository
+    :param depth: git clone depth (None for full history)
+    :param timeout: timeout in seconds of each git command
+    :param retries: number of retries after a failed attempt
+    :param backoff: delay in seconds before the first retry, doubled at each retry
+    :param mode: "full" for a standard clone or "sparse" for a partial clone with a sparse checkout
+    :return: report with status ("OK" or "FAIL"), action, attempts, seconds, downloaded bytes and error
+    """
+    action = "pull" if dest.exists() else "clone"
+    sparse_checkout = ["git", "-C", str(dest), "sparse-checkout", "set", "--no-cone", *SPARSE_CHECKOUT_PATTERNS]
+    cmds: List[List[str]] = []
+    if action == "pull":
+        if mode == "sparse":
+            # also restricts the checkout of a repository cloned in full mode
+            cmds.append(sparse_checkout)
+        cmds.append(["git", "-C", str(dest), "pull", "--ff-only"])
+    else:
+        cmd = ["git", "clone"]
+        if depth is not None:
+            cmd.extend(["--depth", str(depth)])
+        if mode == "sparse":
+            cmd.extend(["--filter=blob:none", "--no-checkout"])
+        cmd.extend([url, str(dest)])
+        cmds.append(cmd)
+        if mode == "sparse":
+            cmds.extend([sparse_checkout, ["git", "-C", str(dest), "checkout"]])
+    # never wait for credentials of private or deleted repositories
+    env = {**os.environ, "GIT_TERMINAL_PROMPT": "0"}
+
+    start = time.time()
+    size_before = get_repository_size(dest)
+    error = ""
+    attempt = 0
+    while attempt <= retries:
+        if attempt > 0:
+            time.sleep(backoff * 2 ** (attempt - 1))
+        attempt += 1
+        try:
+            for cmd in cmds:
+                subprocess.run(cmd, check=True, capture_output=True, text=True, timeout=timeout, env=env)
+            if mode == "sparse":
+                checkout_sparse_dependencies(dest, timeout, env)
+            error = ""
+            break
+        except subprocess.CalledProcessError as ex:
+            error = str(ex.stderr).strip().splitlines()[-1] if str(ex.stderr).strip() else str(ex)
+        except subprocess.TimeoutExpired:
+            error = f"timeout after {timeout}s"
+        except OSError as ex:
+            error = str(ex)
+        if action == "clone" and dest.exists():
+            # do not leave a partial clone behind for the next attempt
+            shutil.rmtree(dest, ignore_errors=True)
+    return {
+        "status": "FAIL" if error else "OK",
+        "action": action,
+        "attempts": attempt,
+        "seconds": time.time() - start,
+        "bytes": max(get_repository_size(dest) - size_before, 0),
+        "error": error,
+    }
+
+
+def checkout_sparse_dependencies(dest: Path, timeout: float, env: Dict[str, str]) -> None:
+    """
+    Add to the sparse checkout of a repository the files outside SPARSE_CHECKOUT_PATTERNS that the tool folders
+    depend on (see get_folder_dependencies), e.g. macro files symlinked or imported from a shared folder,
+    until the files they import in turn are checked out too
+
+    :param dest: local path of the repository
+    :param timeout: timeout in seconds of each git command
+    :param env: environment of the git commands
+    """
+    added: Set[str] = set()
+    while True:
+        missing = {
+            dependency
+            for tool_folder, xml_files in get_tool_folders(crawl_tool_files(dest)).items()
+            for dependency in get_folder_dependencies(dest / tool_folder, dest, xml_files)
+            if dependency not in added and not (dest / dependency).exists()
+        }
+        if not missing:
+            return
+        # imported files that do not exist in the repository are added once, without effect
+        added.update(missing)
+        subprocess.run(
+            ["git", "-C", str(dest), "sparse-checkout", "add", *(f"/{path}" for path in sorted(missing))],
+            check=True,
+            capture_output=True,
+            text=True,
+            timeout=timeout,
+            env=env,
+        )
+
+
+def clone_repositories(
+    repo_list: List[str],
+    clone_dir: Path,
+    depth: Optional[int] = 1,
+    workers: int = 1,
+    timeout: float = 900,
+    retries: int = 2,
+    report: Optional[Dict[str, Dict[str, Any]]] = None,
+    mode: str = "full",
+    previous_heads: Optional[Dict[str, str]] = None,
+) -> List[Tuple[str, Path]]:
     """
     Clone or update GitHub repositories into a local directory.
 
     Duplicate URLs are skipped. Uses shallow clones by default for CI efficiency.
+    Repositories that could not be cloned are recorded in the report and not returned,
+    repositories that could not be updated are returned with their previous state.
+    With previous_heads, the remote HEAD of all repositories is first checked in parallel with git ls-remote:
+    repositories whose HEAD is unchanged are neither cloned nor updated, but returned, even if they are not
+    cloned locally, with the "skip" action and their HEAD commit ("head") in the report.
 
     :param repo_list: list of repository URLs
     :param clone_dir: directory to clone into
     :param depth: git clone depth (None for full history, default 1 for shallow)
+    :param workers: number of repositories cloned or updated in parallel
+    :param timeout: timeout in seconds of each git command
+    :param retries: number of retries after a failed clone or update
+    :param report: optional dictionary filled with the report of clone_repository per repository URL
+    :param mode: "full" for standard clones or "sparse" for partial clones checking out only the tool metadata files
+    :param previous_heads: optional HEAD commit per repository URL in the previous run
     :returns: list of (original_url, local_path) tuples
     """
     clone_dir.mkdir(parents=True, exist_ok=True)
-    results: List[Tuple[str, Path]] = []
+    if report is None:
+        report = {}
+    repos: Dict[str, Path] = {}
     seen: set = set()
-    total = len(repo_list)
-    for i, url in enumerate(repo_list, 1):
+    for url in repo_list:
         normalized = _normalize_repo_url(url)
         if normalized in seen:
-            print(f"  [{i}/{total}] {url} (duplicate, skipped)", flush=True)
+            print(f"  {url} (duplicate, skipped)", flush=True)
             continue
         seen.add(normalized)
+        repos[url] = clone_dir / _repo_name_from_url(url)
+
+    start = time.time()
+    unchanged: Set[str] = set()
+    if previous_heads:
+        with ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+            remote_heads = dict(zip(repos, executor.map(get_remote_head, repos)))
+        for url, head in remote_heads.items():
+            if head and previous_heads.get(url) == head:
+                unchanged.add(url)
+                report[url] = {
+                    "status": "OK",
+                    "action": "skip",
+                    "attempts": 0,
+                    "seconds": 0.0,
+                    "bytes": 0,
+                    "error": "",
+                    "head": head,
+                }
+        print(
+            f"  [{time.time() - start:6.1f}s] {len(unchanged)}/{len(repos)} repositories unchanged since the previous run, "
+            "no fetch needed",
+            flush=True,
+        )
+    to_fetch = {url: dest for url, dest in repos.items() if url not in unchanged}
+
+    total = len(to_fetch)
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+        futures = {
+            executor.submit(clone_repository, url, dest, depth=depth, timeout=timeout, retries=retries, mode=mode): url
+            for url, dest in to_fetch.items()
+        }
+        for i, future in enumerate(as_completed(futures), 1):
+            url = futures[future]
+            stats = report[url] = future.result()
+            print(
+                f"  [{time.time() - start:6.1f}s] ({i}/{total}) {stats['status']:4s} {stats['action']} {url}: "
+                f"{stats['bytes'] / 1e6:.1f} MB in {stats['seconds']:.1f}s"
+                + (f" after {stats['attempts']} attempts ({stats['error']})" if stats["attempts"] > 1 else ""),
+                flush=True,
+            )
 
-        print(f"  [{i}/{total}] {url}", flush=True)
-        name = _repo_name_from_url(url)
-        dest = clone_dir / name
-        if dest.exists():
-            subprocess.run(["git", "-C", str(dest), "pull", "--ff-only"])
-        else:
-            clone_cmd = ["git", "clone"]
-            if depth is not None:
-                clone_cmd.extend(["--depth", str(depth)])
-            clone_cmd.extend([url, str(dest)])
-            subprocess.run(clone_cmd)
-        results.append((url, dest))
-    return results
+    failed = [url for url, stats in report.items() if stats["status"] != "OK"]
+    print(
+        f"Cloned or updated {total - len(failed)}/{total} repositories "
+        f"({sum(stats['bytes'] for stats in report.values()) / 1e6:.1f} MB) in {time.time() - start:.1f}s",
+        flush=True,
+    )
+    for url in failed:
+        print(f"  Failed to {report[url]['action']} {url}: {report[url]['error']}", file=sys.stderr)
+    return [(url, dest) for url, dest in repos.items() if report[url]["status"] == "OK" or dest.exists()]
 
 
 def get_first_commit_for_local_folder(repo_path: Path, tool_rel_path: str) -> str:
@@ -268,10 +598,186 @@ def get_first_commit_for_local_folder(repo_path: Path, tool_rel_path: str) -> st
     return date
 
 
-def get_tool_metadata_from_local(tool_path: Path, repo_path: Path, repo_url: str = "") -> Optional[Dict[str, Any]]:
+def _walk_first_commit_dates(repo_path: Path, folders: Set[str], dates: Dict[str, str]) -> None:
+    """
+    Walk the history of a repository once, from the oldest commit, and fill in the date of the
+    first commit touching each of the folders not yet in dates.
+    """
+    cmd = [
+        "git",
+        "-c",
+        "core.quotePath=false",
+        "log",
+        "--reverse",
+        "--no-renames",
+        "--format=%x00%ad",
+        "--date=short",
+        "--name-only",
+    ]
+    missing = folders - dates.keys()
+    # directories already seen in an older commit: their ancestors have been seen too
+    seen: Set[str] = set()
+    try:
+        with subprocess.Popen(
+            cmd, cwd=repo_path, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, errors="replace"
+        ) as proc:
+            assert proc.stdout is not None
+            date = ""
+            for line in proc.stdout:
+                line = line.rstrip("\n")
+                if line.startswith("\x00"):
+                    date = line[1:]
+                    continue
+                folder = line
+                while "/" in folder:
+                    folder = folder.rsplit("/", 1)[0]
+                    if folder in seen:
+                        break
+                    seen.add(folder)
+                    if folder in missing:
+                        dates[folder] = date
+                        missing.discard(folder)
+                if not missing:
+                    proc.kill()
+                    break
+    except OSError:
+        pass
+
+
+def get_first_commit_dates(repo_path: Path, folders: List[str]) -> Dict[str, str]:
     """
-    Get tool metadata from a locally cloned tool directory.
-    Uses Galaxy's xml_macros to expand macros before parsing.
+    Get the date of the first commit in each folder of a repository with a single history walk.
+    If the clone is shallow and some folders are not found, fetch more history once and walk again.
+
+    :param repo_path: path to the local repository
+    :param folders: folder paths relative to the repository root
+    :return: dictionary with folders as keys and dates (YYYY-MM-DD) as values, for folders found in the history
+    """
+    dates: Dict[str, str] = {}
+    _walk_first_commit_dates(repo_path, set(folders), dates)
+    if len(dates) < len(set(folders)) and (repo_path / ".git" / "shallow").exists():
+        try:
+            subprocess.run(
+                ["git", "fetch", "--deepen", "1000", "origin"],
+                cwd=repo_path,
+                capture_output=True,
+                text=True,
+                timeout=120,
+            )
+            _walk_first_commit_dates(repo_path, set(folders), dates)
+        except Exception:
+            pass
+    return dates
+
+
+TOKEN_PATTERN = re.compile(r"@(\w+)@")
+IMPORT_PATTERN = re.compile(r"<import>\s*([^<]+?)\s*</import>")
+# folders of a repository with the tool folders
+TOOL_SEARCH_DIRS = ("tools", "wrappers", "tool_collections")
+# files checked out by the sparse clones: .shed.yml and XML files (tools and macros) of the tool folders,
+# the files they symlink or import from elsewhere are added after the checkout (see checkout_sparse_dependencies)
+SPARSE_CHECKOUT_PATTERNS = [
+    pattern
+    for sd in TOOL_SEARCH_DIRS
+    for pattern in (f"/{sd}/**/.shed.yml", f"/{sd}/**/*xml", f"!/{sd}/**/test-data/**")
+]
+# sections of the tool XML read for the metadata
+TOOL_XML_SECTIONS = ("xrefs", "requirements", "outputs")
+
+
+@lru_cache(maxsize=None)
+def parse_macro_file(path: str, mtime_ns: int, size: int) -> Dict[str, Any]:
+    """
+    Parse the named macros (tokens, xml macros) and the imports of a macro file. The result is cached by path,
+    modification time and size, so a macro file shared between tool folders is parsed once and an edited file
+    is parsed again. The cached result must not be modified.
+
+    :param path: resolved path to the macro file
+    :param mtime_ns: modification time of the macro file in nanoseconds
+    :param size: size of the macro file in bytes
+    :return: named macros with their tag, text, conda package, xrefs and tags of their children (up to a parsing
+        error), imported macro files and parsing error
+    """
+    macro_file: Dict[str, Any] = {"macros": [], "imports": [], "error": None}
+    try:
+        root = et.fromstring(Path(path).read_text())
+        for child in root:
+            if child.tag == "import":
+                macro_file["imports"].append(child.text)
+            if "name" in child.attrib:
+                macro: Dict[str, Any] = {
+                    "name": child.attrib["name"],
+                    "tag": child.tag,
+                    "text": child.text,
+                    "children": frozenset(el.tag for el in child),
+                    "conda package": None,
+                    "bio.tool ID": None,
+                    "biii ID": None,
+                }
+                macro_file["macros"].append(macro)
+                if macro["name"] == "requirements":
+                    macro["conda package"] = get_conda_package(child)
+                macro["bio.tool ID"] = get_xref(child, attrib_type="bio.tools")
+                macro["biii ID"] = get_xref(child, attrib_type="biii")
+    except Exception:
+        macro_file["error"] = traceback.format_exc()
+    return macro_file
+
+
+def load_macro_file(macro_path: Path) -> Dict[str, Any]:
+    """
+    Get the named macros and imports of a macro file from the parsing cache (see parse_macro_file)
+
+    :param macro_path: path to the macro file
+    """
+    try:
+        stat = macro_path.stat()
+        return parse_macro_file(str(macro_path.resolve()), stat.st_mtime_ns, stat.st_size)
+    except OSError:
+        return {"macros": [], "imports": [], "error": traceback.format_exc()}
+
+
+def resolve_tokens(tokens: Dict[str, str]) -> Dict[str, str]:
+    """
+    Resolve the token values that reference other tokens (e.g. @VERSION@ = @TOOL_VERSION@+galaxy0),
+    each token once whatever the length of the chains. References in a cycle are left as they are.
+
+    :param tokens: token values per token name (e.g. @TOOL_VERSION@)
+    """
+    resolved: Dict[str, str] = {}
+    resolving: Set[str] = set()
+
+    def _resolve(name: str) -> str:
+        if name not in resolved:
+            resolving.add(name)
+            resolved[name] = TOKEN_PATTERN.sub(
+                lambda m: (
+                    _resolve(m.group(0)) if m.group(0) in tokens and m.group(0) not in resolving else m.group(0)
+                ),
+                tokens[name],
+            )
+            resolving.discard(name)
+        return resolved[name]
+
+    return {name: _resolve(name) for name in tokens}
+
+
+def get_tool_metadata_from_local(
+    tool_path: Path,
+    repo_path: Path,
+    repo_url: str = "",
+    first_commit_dates: Optional[Dict[str, str]] = None,
+    xml_files: Optional[List[str]] = None,
+) -> Optional[Dict[str, Any]]:
+    """
+    Get tool metadata from a locally cloned tool directory, without any network request.
+    The conda and bio.tools metadata are added afterwards for all tools at once by enrich_tools.
+    Uses Galaxy's xml_macros to expand macros before parsing, when the metadata may come from macros.
+
+    :param first_commit_dates: optional first commit date per tool folder (see get_first_commit_dates),
+        otherwise the date is taken from the history of the tool folder
+    :param xml_files: optional names of the XML files (tools and macros) in the tool folder (see get_tool_folders),
+        otherwise the tool folder is listed
     """
     if not tool_path.is_dir():
         return None
@@ -306,7 +812,7 @@ def get_tool_metadata_from_local(tool_path: Path, repo_path: Path, repo_url: str
     if not shed_path.exists():
         return None
     with shed_path.open() as fh:
-        shed_content = yaml.load(fh, Loader=yaml.FullLoader)
+        shed_content = yaml.load(fh, Loader=shared.YAML_LOADER)
     metadata["Description"] = get_shed_attribute("description", shed_content, None)
     if metadata["Description"] is None:
         metadata["Description"] = get_shed_attribute("long_description", shed_content, None)
@@ -329,58 +835,47 @@ def get_tool_metadata_from_local(tool_path: Path, repo_path: Path, repo_url: str
         metadata["Suite parsed folder"] = str(tool_path)
 
     # first commit date
-    metadata["Suite first commit date"] = get_first_commit_for_local_folder(repo_path, tool_rel_path)
+    if first_commit_dates is not None:
+        metadata["Suite first commit date"] = first_commit_dates.get(tool_rel_path, "")
+    else:
+        metadata["Suite first commit date"] = get_first_commit_for_local_folder(repo_path, tool_rel_path)
 
     # parse macro files for token values, requirements, xrefs
+    if xml_files is None:
+        xml_files = [entry.name for entry in tool_path.iterdir() if entry.name.endswith("xml")]
     macro_tokens: Dict[str, str] = {}
-    for entry in tool_path.iterdir():
-        if "macro" in entry.name and entry.name.endswith("xml"):
-            try:
-                root = et.fromstring(entry.read_text())
-                for child in root:
-                    if "name" in child.attrib:
-                        token_name = child.attrib["name"]
-                        if child.text:
-                            macro_tokens[token_name] = child.text
-                        if token_name in ("@TOOL_VERSION@", "@VERSION@"):
-                            metadata["Suite version"] = child.text
-                        elif token_name == "requirements":
-                            metadata["Suite conda package"] = get_conda_package(child)
-                        biotools = get_xref(child, attrib_type="bio.tools")
-                        if biotools is not None:
-                            metadata["bio.tool ID"] = biotools
-                        biii = get_xref(child, attrib_type="biii")
-                        if biii is not None:
-                            metadata["biii ID"] = biii
-            except Exception:
-                print(traceback.format_exc())
-
-    # resolve macro token values that reference other tokens (multi-pass for chains)
-    for _ in range(5):
-        changed = False
-        for key, val in list(macro_tokens.items()):
-            resolved = re.sub(r"@(\w+)@", lambda m: macro_tokens.get(m.group(0), m.group(0)), val)
-            if resolved != val:
-                macro_tokens[key] = resolved
-                changed = True
-        if not changed:
-            break
-
-    if metadata["Suite version"] is not None and re.search(r"@\w+@", metadata["Suite version"]):
-        metadata["Suite version"] = re.sub(
-            r"@(\w+)@", lambda m: macro_tokens.get(m.group(0), m.group(0)), metadata["Suite version"]
-        )
+    for name in xml_files:
+        if "macro" in name:
+            macro_file = load_macro_file(tool_path / name)
+            for macro in macro_file["macros"]:
+                if macro["text"]:
+                    macro_tokens[macro["name"]] = macro["text"]
+                if macro["name"] in ("@TOOL_VERSION@", "@VERSION@"):
+                    metadata["Suite version"] = macro["text"]
+                elif macro["name"] == "requirements":
+                    metadata["Suite conda package"] = macro["conda package"]
+                if macro["bio.tool ID"] is not None:
+                    metadata["bio.tool ID"] = macro["bio.tool ID"]
+                if macro["biii ID"] is not None:
+                    metadata["biii ID"] = macro["biii ID"]
+            if macro_file["error"] is not None:
+                print(macro_file["error"])
+
+    # resolve macro token values that reference other tokens
+    macro_tokens = resolve_tokens(macro_tokens)
 
     def _resolve_macros(text: str) -> str:
-        return re.sub(r"@(\w+)@", lambda m: macro_tokens.get(m.group(0), m.group(0)), text)
+        return TOKEN_PATTERN.sub(lambda m: macro_tokens.get(m.group(0), m.group(0)), text)
+
+    if metadata["Suite version"] is not None:
+        metadata["Suite version"] = _resolve_macros(metadata["Suite version"])
 
     # parse each tool XML with macro expansion
-    for entry in sorted(tool_path.iterdir()):
-        if entry.name.endswith("xml") and "macro" not in entry.name:
+    for name in sorted(xml_files):
+        if "macro" not in name:
+            entry = tool_path / name
             try:
-                tree = _load_tool_xml_with_macros(entry)
-                if tree is None:
-                    tree = _load_tool_xml_fallback(entry)
+                tree = load_tool_xml(entry, macro_tokens)
                 if tree is None:
                     continue
                 root = tree.getroot()
@@ -431,49 +926,500 @@ def get_tool_metadata_from_local(tool_path: Path, repo_path: Path, repo_url: str
         else:
             metadata["Suite ID"] = tool_path.name
 
-    # get latest conda version
-    if metadata["Suite conda package"] is not None:
-        r = requests.get(f'https://api.anaconda.org/package/bioconda/{metadata["Suite conda package"]}', timeout=10)
-        if r.status_code == requests.codes.ok:
-            conda_info = r.json()
-            if "latest_version" in conda_info:
-                metadata["Latest suite conda package version"] = conda_info["latest_version"]
-                if metadata["Latest suite conda package version"] == metadata["Suite version"]:
-                    metadata["Suite version status"] = "Up-to-date"
-
-    # get bio.tool information
-    if metadata["bio.tool ID"] is not None:
-        r = requests.get(f'{BIOTOOLS_API_URL}/api/tool/{metadata["bio.tool ID"]}/?format=json', timeout=10)
-        if r.status_code == requests.codes.ok:
-            biotool_info = r.json()
-            if "function" in biotool_info:
-                for func in biotool_info["function"]:
-                    if "operation" in func:
-                        for op in func["operation"]:
-                            metadata["EDAM operations"].append(op["term"])
-            if "topic" in biotool_info:
-                for t in biotool_info["topic"]:
-                    metadata["EDAM topics"].append(t["term"])
-            if "name" in biotool_info:
-                metadata["bio.tool name"] = biotool_info["name"]
-            if "description" in biotool_info:
-                metadata["bio.tool description"] = biotool_info["description"].replace("\n", "")
-
     return metadata
 
 
-def _load_tool_xml_with_macros(xml_path: Path) -> Optional[Any]:
-    """Try to load and expand macros using Galaxy's xml_macros (galaxy-util)."""
+class UrlCache:
+    """
+    SQLite cache of JSON documents keyed by URL, including "not found" answers stored as None.
+    Entries older than the TTL are fetched again, except in offline mode where all entries are used.
+    The cache is only used from the thread that created it.
+    """
+
+    def __init__(self, db_path: Path, ttl: float = 24 * 3600, offline: bool = False) -> None:
+        """
+        :param db_path: path to the SQLite database
+        :param ttl: time in seconds after which an entry is fetched again
+        :param offline: use all entries, whatever their age, and never fetch missing ones
+        """
+        self.ttl = ttl
+        self.offline = offline
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.connection = sqlite3.connect(str(db_path))
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS documents (url TEXT PRIMARY KEY, fetched REAL NOT NULL, document TEXT)"
+        )
+
+    def get(self, urls: List[str]) -> Dict[str, Any]:
+        """
+        Get the cached documents of URLs
+
+        :param urls: URLs to look up
+        :return: dictionary with the URLs with a usable entry as keys and the documents (or None) as values
+        """
+        min_fetched = 0 if self.offline else time.time() - self.ttl
+        documents = {}
+        for url in urls:
+            row = self.connection.execute(
+                "SELECT document FROM documents WHERE url = ? AND fetched >= ?", (url, min_fetched)
+            ).fetchone()
+            if row is not None:
+                documents[url] = None if row[0] is None else json.loads(row[0])
+        return documents
+
+    def set(self, documents: Dict[str, Any]) -> None:
+        """
+        Store documents
+
+        :param documents: dictionary with URLs as keys and the documents (or None when not found) as values
+        """
+        now = time.time()
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO documents (url, fetched, document) VALUES (?, ?, ?)",
+                [(url, now, None if doc is None else json.dumps(doc)) for url, doc in documents.items()],
+            )
+
+    def close(self) -> None:
+        self.connection.close()
+
+
+def fetch_json_concurrently(
+    urls: Dict[str, str],
+    workers: int = 16,
+    timeout: int = 10,
+    cache: Optional[UrlCache] = None,
+    fields: Optional[List[str]] = None,
+) -> Dict[str, Any]:
+    """
+    Get JSON documents concurrently, with a bounded number of parallel requests sharing a keep-alive connection pool
+
+    :param urls: dictionary with keys and the URL to fetch for each key
+    :param workers: maximum number of parallel requests
+    :param timeout: request timeout in seconds
+    :param cache: optional cache of the documents, queried first and filled with the fetched documents
+    :param fields: optional top-level fields of the documents to keep, the others are dropped
+    :return: dictionary with the keys and the JSON documents, None for the URLs that failed or were not found
+    """
+    results: Dict[str, Any] = {}
+    if cache is not None:
+        cached = cache.get(list(urls.values()))
+        results = {key: cached[url] for key, url in urls.items() if url in cached}
+        to_fetch = {key: url for key, url in urls.items() if url not in cached}
+        print(f"  {len(results)}/{len(urls)} documents from cache", flush=True)
+        if cache.offline:
+            return {key: results.get(key) for key in urls}
+    else:
+        to_fetch = urls
+
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=workers, pool_maxsize=workers)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+
+    def _fetch(url: str) -> Any:
+        r = session.get(url, timeout=timeout)
+        if r.status_code == requests.codes.not_found:
+            return None
+        r.raise_for_status()
+        document = r.json()
+        if fields is not None and isinstance(document, dict):
+            document = {field: document[field] for field in fields if field in document}
+        return document
+
+    fetched: Dict[str, Any] = {}
+    with session, ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(_fetch, url): key for key, url in to_fetch.items()}
+        for future in as_completed(futures):
+            key = futures[future]
+            try:
+                results[key] = fetched[to_fetch[key]] = future.result()
+            except Exception as ex:
+                print(f"Could not get {to_fetch[key]} ({ex})", file=sys.stderr)
+                results[key] = None
+    if cache is not None:
+        # failed requests are not cached, to be tried again in the next run
+        cache.set(fetched)
+    return results
+
+
+def add_conda_and_biotools_metadata(
+    metadata: Dict[str, Any], conda_info: Optional[Dict[str, Any]], biotool_info: Optional[Dict[str, Any]]
+) -> None:
+    """
+    Add the latest conda package version and the bio.tools metadata to the metadata of a tool
+
+    :param metadata: tool metadata from get_tool_metadata_from_local
+    :param conda_info: Anaconda API document of the conda package of the tool
+    :param biotool_info: bio.tools API document of the bio.tools entry of the tool
+    """
+    if conda_info is not None and "latest_version" in conda_info:
+        metadata["Latest suite conda package version"] = conda_info["latest_version"]
+        if metadata["Latest suite conda package version"] == metadata["Suite version"]:
+            metadata["Suite version status"] = "Up-to-date"
+
+    if biotool_info is not None:
+        if "function" in biotool_info:
+            for func in biotool_info["function"]:
+                if "operation" in func:
+                    for op in func["operation"]:
+                        metadata["EDAM operations"].append(op["term"])
+        if "topic" in biotool_info:
+            for t in biotool_info["topic"]:
+                metadata["EDAM topics"].append(t["term"])
+        if "name" in biotool_info:
+            metadata["bio.tool name"] = biotool_info["name"]
+        if "description" in biotool_info:
+            metadata["bio.tool description"] = biotool_info["description"].replace("\n", "")
+
+
+class BiotoolsIndex:
+    """
+    Local mirror of all bio.tools entries, with only the fields used for the tool metadata,
+    stored as gzipped JSON and built by paging once through the bio.tools listing API
+    """
+
+    def __init__(self, index_path: Path) -> None:
+        """
+        :param index_path: path to the gzipped JSON index
+        """
+        self.index_path = index_path
+        self.created = 0.0
+        # name, description, operation terms and topic terms per lowercase bio.tools ID
+        self.entries: Dict[str, Dict[str, Any]] = {}
+
+    def load(self) -> bool:
+        """
+        Load the index from disk
+
+        :return: True if the index could be loaded
+        """
+        try:
+            with gzip.open(self.index_path, "rt") as f:
+                content = json.load(f)
+        except (OSError, ValueError):
+            return False
+        self.created = content["created"]
+        self.entries = content["entries"]
+        return True
+
+    def build(self, workers: int = 16, timeout: int = 60, retries: int = 3, backoff: float = 5) -> None:
+        """
+        Page through the bio.tools listing API and store the index on disk.
+        The first page gives the number of pages, the others are fetched concurrently.
+        Failed pages are fetched again, with exponential backoff, and the index is not stored if some still fail.
+
+        :param workers: maximum number of parallel requests
+        :param timeout: request timeout in seconds
+        :param retries: number of retries of the failed pages
+        :param backoff: delay in seconds before the first retry, doubled at each retry
+        :raises RuntimeError: if some pages could not be fetched
+        """
+        start = time.time()
+        first_page_url = f"{BIOTOOLS_API_URL}/api/tool/?format=json&page=1"
+        for attempt in range(retries + 1):
+            if attempt > 0:
+                time.sleep(backoff * 2 ** (attempt - 1))
+            try:
+                first_page = requests.get(first_page_url, timeout=timeout)
+                first_page.raise_for_status()
+                content = first_page.json()
+                break
+            except (requests.exceptions.RequestException, ValueError) as ex:
+                print(f"Could not get bio.tools page 1 ({ex})", file=sys.stderr)
+        else:
+            raise RuntimeError("Could not get bio.tools page 1")
+        page_nb = -(-content["count"] // max(len(content["list"]), 1))
+        print(f"Fetching {content['count']} bio.tools entries in {page_nb} pages ...", flush=True)
+        urls = {str(page): f"{BIOTOOLS_API_URL}/api/tool/?format=json&page={page}" for page in range(2, page_nb + 1)}
+        pages: Dict[str, Any] = {}
+        for attempt in range(retries + 1):
+            if not urls:
+                break
+            if attempt > 0:
+                time.sleep(backoff * 2 ** (attempt - 1))
+                print(f"Fetching {len(urls)} failed bio.tools pages again ...", flush=True)
+            fetched = fetch_json_concurrently(urls, workers=workers, timeout=timeout, fields=["list"])
+            pages.update((page, page_content) for page, page_content in fetched.items() if page_content is not None)
+            urls = {page: url for page, url in urls.items() if page not in pages}
+        if urls:
+            # an incomplete index would hide the missing entries, since lookups in the index are authoritative
+            raise RuntimeError(f"Could not get bio.tools pages {sorted(int(page) for page in urls)}")
+
+        entries = {}
+        for page_content in [content, *(pages[page] for page in sorted(pages, key=int))]:
+            for entry in page_content["list"]:
+                entries[entry["biotoolsID"].lower()] = {
+                    "name": entry.get("name"),
+                    "description": entry.get("description"),
+                    "operations": [
+                        op["term"] for func in entry.get("function") or [] for op in func.get("operation") or []
+                    ],
+                    "topics": [topic["term"] for topic in entry.get("topic") or []],
+                }
+        self.entries = entries
+        self.created = time.time()
+        self.index_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.index_path.with_name(f"{self.index_path.name}.{os.getpid()}.tmp")
+        with gzip.open(tmp_path, "wt") as f:
+            json.dump({"created": self.created, "entries": self.entries}, f)
+        os.replace(tmp_path, self.index_path)
+        print(f"Indexed {len(entries)} bio.tools entries in {time.time() - start:.1f}s", flush=True)
+
+    def get(self, biotools_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Get a bio.tools entry in the format of the bio.tools API, None if it does not exist
+
+        :param biotools_id: bio.tools ID
+        """
+        entry = self.entries.get(biotools_id.lower())
+        if entry is None:
+            return None
+        document: Dict[str, Any] = {
+            "function": [{"operation": [{"term": term} for term in entry["operations"]]}],
+            "topic": [{"term": term} for term in entry["topics"]],
+        }
+        for field in ("name", "description"):
+            if entry[field] is not None:
+                document[field] = entry[field]
+        return document
+
+
+def get_biotools_index(cache_dir: Path, ttl: float, offline: bool = False, workers: int = 16) -> BiotoolsIndex:
+    """
+    Get the bio.tools index of the cache directory, built again if missing or older than the TTL
+
+    :param cache_dir: cache directory
+    :param ttl: time in seconds after which the index is built again
+    :param offline: use the index whatever its age
+    :param workers: maximum number of parallel requests to build the index
+    """
+    index = BiotoolsIndex(cache_dir / "biotools_index.json.gz")
+    if index.load() and (offline or time.time() - index.created < ttl):
+        return index
+    if offline:
+        raise ValueError(f"No bio.tools index in {cache_dir} in offline mode")
+    index.build(workers=workers)
+    return index
+
+
+def get_conda_version_tokens(version: str) -> List[Tuple[int, Union[int, str]]]:
+    """
+    Split a conda package version into comparable tokens (see compare_conda_version_tokens),
+    the local version (after "+") is ignored
+
+    :param version: conda package version
+    """
+    epoch, _, version = version.lower().rpartition("!")
+    tokens: List[Tuple[int, Union[int, str]]] = [(1, int(epoch) if epoch.isdigit() else 0)]
+    for token in re.findall(r"\d+|[a-z]+", version.split("+")[0]):
+        if token.isdigit():
+            tokens.append((1, int(token)))
+        elif token == "dev":
+            tokens.append((-1, token))
+        elif token == "post":
+            tokens.append((2, token))
+        else:
+            tokens.append((0, token))
+    return tokens
+
+
+def compare_conda_version_tokens(
+    tokens: List[Tuple[int, Union[int, str]]], other: List[Tuple[int, Union[int, str]]]
+) -> int:
+    """
+    Compare two conda versions split by get_conda_version_tokens, following the conda version ordering:
+    numbers are compared numerically, "dev" < other strings < numbers < "post" and a missing token counts as 0
+
+    :return: -1, 0 or 1 if the first version is older, equal or newer
+    """
+    for i in range(max(len(tokens), len(other))):
+        token = tokens[i] if i < len(tokens) else (1, 0)
+        other_token = other[i] if i < len(other) else (1, 0)
+        if token != other_token:
+            return -1 if token < other_token else 1
+    return 0
+
+
+def iter_repodata_packages(chunks: Iterable[str]) -> Iterator[Dict[str, Any]]:
+    """
+    Iterate over the package records of a conda repodata.json ("packages" and "packages.conda"),
+    parsing the document while it is downloaded, without holding it in memory
+
+    :param chunks: successive parts of the repodata.json text
+    """
+    parser = shared.JsonStreamParser(chunks, name="repodata.json")
+    for key in parser.iter_object_keys():
+        if key in ("packages", "packages.conda"):
+            for _file_name in parser.iter_object_keys():
+                yield parser.decode()
+        else:
+            parser.decode()
+
+
+class BiocondaIndex:
+    """
+    Local index of the latest version of each Bioconda package,
+    built from the repodata.json of the noarch and linux-64 subdirectories of the channel
+    """
+
+    def __init__(self, index_path: Path) -> None:
+        """
+        :param index_path: path to the gzipped JSON index
+        """
+        self.index_path = index_path
+        self.created = 0.0
+        # latest version per package name
+        self.versions: Dict[str, str] = {}
+
+    def load(self) -> bool:
+        """
+        Load the index from disk
+
+        :return: True if the index could be loaded
+        """
+        try:
+            with gzip.open(self.index_path, "rt") as f:
+                content = json.load(f)
+        except (OSError, ValueError):
+            return False
+        self.created = content["created"]
+        self.versions = content["versions"]
+        return True
+
+    def build(self, timeout: int = 300) -> None:
+        """
+        Download the repodata.json of the channel subdirectories and store the index on disk
+
+        :param timeout: request timeout in seconds
+        """
+        start = time.time()
+        tokens: Dict[str, List[Tuple[int, Union[int, str]]]] = {}
+        versions: Dict[str, str] = {}
+        for subdir in BIOCONDA_SUBDIRS:
+            with requests.get(f"{BIOCONDA_CHANNEL_URL}/{subdir}/repodata.json", stream=True, timeout=timeout) as r:
+                r.raise_for_status()
+                decoder = codecs.getincrementaldecoder("utf-8")()
+                chunks = (decoder.decode(chunk) for chunk in r.iter_content(chunk_size=1 << 20))
+                package_nb = 0
+                for record in iter_repodata_packages(chunks):
+                    package_nb += 1
+                    name, version = record["name"], record["version"]
+                    version_tokens = get_conda_version_tokens(version)
+                    if name not in tokens or compare_conda_version_tokens(version_tokens, tokens[name]) > 0:
+                        tokens[name] = version_tokens
+                        versions[name] = version
+                print(f"Parsed {package_nb} package files of bioconda/{subdir}", flush=True)
+        self.versions = versions
+        self.created = time.time()
+        self.index_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.index_path.with_name(f"{self.index_path.name}.{os.getpid()}.tmp")
+        with gzip.open(tmp_path, "wt") as f:
+            json.dump({"created": self.created, "versions": self.versions}, f)
+        os.replace(tmp_path, self.index_path)
+        print(f"Indexed {len(versions)} Bioconda packages in {time.time() - start:.1f}s", flush=True)
+
+    def get(self, package: str) -> Optional[Dict[str, Any]]:
+        """
+        Get the latest version of a package in the format of the Anaconda API, None if it does not exist
+
+        :param package: conda package name
+        """
+        if package not in self.versions:
+            return None
+        return {"latest_version": self.versions[package]}
+
+
+def get_bioconda_index(cache_dir: Path, ttl: float, offline: bool = False) -> BiocondaIndex:
+    """
+    Get the Bioconda index of the cache directory, built again if missing or older than the TTL
+
+    :param cache_dir: cache directory
+    :param ttl: time in seconds after which the index is built again
+    :param offline: use the index whatever its age
+    """
+    index = BiocondaIndex(cache_dir / "bioconda_index.json.gz")
+    if index.load() and (offline or time.time() - index.created < ttl):
+        return index
+    if offline:
+        raise ValueError(f"No Bioconda index in {cache_dir} in offline mode")
+    index.build()
+    return index
+
+
+def enrich_tools(
+    tools: List[Dict[str, Any]],
+    workers: int = 16,
+    cache: Optional[UrlCache] = None,
+    biotools_index: Optional[BiotoolsIndex] = None,
+    bioconda_index: Optional[BiocondaIndex] = None,
+) -> None:
+    """
+    Add the latest conda package versions and the bio.tools metadata to all tools,
+    fetching each conda package and bio.tools entry only once
+
+    :param tools: tool metadata from get_tool_metadata_from_local
+    :param workers: maximum number of parallel requests
+    :param cache: optional cache of the Anaconda and bio.tools API documents
+    :param biotools_index: optional bio.tools index used instead of the bio.tools API
+    :param bioconda_index: optional Bioconda index used instead of the Anaconda API
+    """
+    packages = sorted({tool["Suite conda package"] for tool in tools if tool["Suite conda package"] is not None})
+    biotools_ids = sorted({tool["bio.tool ID"] for tool in tools if tool["bio.tool ID"] is not None})
+    start = time.time()
+    print(
+        f"Fetching {len(packages)} conda packages and {len(biotools_ids)} bio.tools entries for {len(tools)} tools ...",
+        flush=True,
+    )
+    if bioconda_index is not None:
+        conda_infos = {package: bioconda_index.get(package) for package in packages}
+    else:
+        conda_infos = fetch_json_concurrently(
+            {package: f"https://api.anaconda.org/package/bioconda/{package}" for package in packages},
+            workers=workers,
+            cache=cache,
+            fields=["latest_version"],
+        )
+    if biotools_index is not None:
+        biotool_infos = {biotools_id: biotools_index.get(biotools_id) for biotools_id in biotools_ids}
+    else:
+        biotool_infos = fetch_json_concurrently(
+            {biotools_id: f"{BIOTOOLS_API_URL}/api/tool/{biotools_id}/?format=json" for biotools_id in biotools_ids},
+            workers=workers,
+            cache=cache,
+            fields=["name", "description", "function", "topic"],
+        )
+    print(f"Fetched conda and bio.tools metadata in {time.time() - start:.1f}s", flush=True)
+    for tool in tools:
+        add_conda_and_biotools_metadata(
+            tool, conda_infos.get(tool["Suite conda package"]), biotool_infos.get(tool["bio.tool ID"])
+        )
+
+
+@lru_cache  # the import is tried once, not for each tool XML
+def _get_xml_macros_load() -> Optional[Callable[[str], Any]]:
+    """Get the load function of Galaxy's xml_macros (galaxy-util), None if it is not installed."""
     try:
         from galaxy.util.xml_macros import load as _xml_macros_load
 
-        return _xml_macros_load(str(xml_path))
+        return _xml_macros_load
+    except Exception:
+        return None
+
+
+def _load_tool_xml_with_macros(xml_path: Path) -> Optional[Any]:
+    """Try to load and expand macros using Galaxy's xml_macros (galaxy-util)."""
+    xml_macros_load = _get_xml_macros_load()
+    if xml_macros_load is None:
+        return None
+    try:
+        return xml_macros_load(str(xml_path))
     except Exception:
         return None
 
 
 def _load_tool_xml_fallback(xml_path: Path) -> Optional[Any]:
-    """Fallback: parse XML directly without macro expansion."""
+    """Parse XML directly without macro expansion."""
     try:
         import xml.etree.ElementTree as _et
 
@@ -483,66 +1429,507 @@ def _load_tool_xml_fallback(xml_path: Path) -> Optional[Any]:
         return None
 
 
-def parse_tools_from_local(repo_path: Path, workers: int = 1, repo_url: str = "") -> List[Dict[str, Any]]:
+def get_tool_macros(root: et.Element, xml_dir: Path) -> Optional[Dict[str, Dict[str, Any]]]:
+    """
+    Get the named macros of a tool XML, inline or imported from macro files (see parse_macro_file),
+    None if they can not be determined without Galaxy's xml_macros (macro defined twice, nested import, ...)
+
+    :param root: root of the tool XML, without macro expansion
+    :param xml_dir: folder of the tool XML, to which the imports are relative
+    """
+    macros: Dict[str, Dict[str, Any]] = {}
+    macros_el = root.find("macros")
+    if macros_el is None:
+        return macros
+    for child in macros_el:
+        if child.tag == "import":
+            macro_file = load_macro_file(xml_dir / str(child.text).strip())
+            if macro_file["error"] is not None or macro_file["imports"]:
+                return None
+            file_macros = macro_file["macros"]
+        elif "name" in child.attrib:
+            file_macros = [{"name": child.attrib["name"], "tag": child.tag, "text": child.text}]
+            file_macros[0]["children"] = frozenset(el.tag for el in child)
+        else:
+            return None
+        for macro in file_macros:
+            if macro["name"] in macros:
+                return None
+            macros[macro["name"]] = macro
+    return macros
+
+
+def needs_macro_expansion(root: et.Element, xml_dir: Path, folder_tokens: Dict[str, str]) -> bool:
+    """
+    Check if the metadata read from a tool XML (id, version, xrefs, requirements and output formats)
+    may differ after macro expansion, i.e. if one of them may come from an expand element
+    or contains a token that get_tool_metadata_from_local does not resolve as Galaxy
+
+    :param root: root of the tool XML, without macro expansion
+    :param xml_dir: folder of the tool XML
+    :param folder_tokens: resolved tokens of the macro files of the tool folder, used for the version
+    """
+    macros = get_tool_macros(root, xml_dir)
+    if macros is None:
+        return True
+    # the children of an expand element at the root replace it and can add the sections
+    for child in root.findall("expand"):
+        macro = macros.get(child.attrib.get("macro", ""))
+        if (
+            macro is None
+            or len(child)
+            or macro["children"] & {"expand", "yield", *TOOL_XML_SECTIONS}
+            or any(TOKEN_PATTERN.search(value) for value in child.attrib.values())
+        ):
+            return True
+    values = [root.attrib.get("id", "")]
+    for section in TOOL_XML_SECTIONS:
+        el = root.find(section)
+        if el is None:
+            continue
+        if el.find(".//expand") is not None:
+            return True
+        values.extend(str(sub_el.text) for sub_el in el)
+        values.extend(value for sub_el in el for value in sub_el.attrib.values())
+    if any(TOKEN_PATTERN.search(value) for value in values):
+        return True
+    version = root.attrib.get("version", "")
+    tokens = resolve_tokens(
+        {name: macro["text"] for name, macro in macros.items() if macro["tag"] == "token" and macro["text"]}
+    )
+    resolved_version = TOKEN_PATTERN.sub(lambda m: tokens.get(m.group(0), m.group(0)), version)
+    return (
+        TOKEN_PATTERN.search(resolved_version) is not None
+        or TOKEN_PATTERN.sub(lambda m: folder_tokens.get(m.group(0), m.group(0)), version) != resolved_version
+    )
+
+
+def load_tool_xml(xml_path: Path, folder_tokens: Dict[str, str]) -> Optional[Any]:
+    """
+    Load a tool XML, expanding its macros with Galaxy's xml_macros (galaxy-util) only when the metadata read from it
+    may come from macros (see needs_macro_expansion): the expansion re-reads the imported macro files for each XML.
+
+    :param xml_path: path to the tool XML
+    :param folder_tokens: resolved tokens of the macro files of the tool folder
+    """
+    tree = _load_tool_xml_fallback(xml_path)
+    if _get_xml_macros_load() is None:
+        return tree
+    if tree is not None and not needs_macro_expansion(tree.getroot(), xml_path.parent, folder_tokens):
+        return tree
+    expanded = _load_tool_xml_with_macros(xml_path)
+    return expanded if expanded is not None else tree
+
+
+def get_repository_head(repo_path: Path) -> str:
+    """
+    Get the commit hash of the HEAD of a local repository, empty string if it can not be determined
+
+    :param repo_path: path to the local repository
+    """
+    try:
+        result = subprocess.run(["git", "rev-parse", "HEAD"], cwd=repo_path, capture_output=True, text=True)
+        return result.stdout.strip() if result.returncode == 0 else ""
+    except OSError:
+        return ""
+
+
+def get_folder_tree_hashes(repo_path: Path) -> Dict[str, str]:
+    """
+    Get the git tree hash of all folders at the HEAD of a local repository.
+    The hash of a folder changes whenever any file below it changes.
+
+    :param repo_path: path to the local repository
+    :return: dictionary with folder paths relative to the repository root as keys and tree hashes as values
+    """
+    try:
+        result = subprocess.run(
+            ["git", "-c", "core.quotePath=false", "ls-tree", "-r", "-d", "HEAD"],
+            cwd=repo_path,
+            capture_output=True,
+            text=True,
+        )
+    except OSError:
+        return {}
+    tree_hashes = {}
+    for line in result.stdout.splitlines():
+        # <mode> tree <hash>\t<path>
+        info, _, folder = line.partition("\t")
+        tree_hashes[folder] = info.split()[-1]
+    return tree_hashes
+
+
+def get_blob_hashes(repo_path: Path, file_paths: Iterable[str]) -> Dict[str, str]:
+    """
+    Get the git blob hash of files at the HEAD of a local repository
+
+    :param repo_path: path to the local repository
+    :param file_paths: file paths relative to the repository root
+    :return: dictionary with the file paths found at the HEAD as keys and blob hashes as values
+    """
+    file_paths = sorted(set(file_paths))
+    if not file_paths:
+        return {}
+    try:
+        result = subprocess.run(
+            ["git", "-c", "core.quotePath=false", "ls-tree", "-r", "HEAD", "--", *file_paths],
+            cwd=repo_path,
+            capture_output=True,
+            text=True,
+        )
+    except OSError:
+        return {}
+    blob_hashes = {}
+    for line in result.stdout.splitlines():
+        # <mode> blob <hash>\t<path>
+        info, _, file_path = line.partition("\t")
+        blob_hashes[file_path] = info.split()[-1]
+    return blob_hashes
+
+
+def get_folder_dependencies(tool_path: Path, repo_path: Path, xml_files: List[str]) -> List[str]:
+    """
+    Get the files of the repository outside a tool folder that its metadata may come from:
+    targets of the symlinked XML files and macro files imported, directly or not, from outside the folder.
+    Their changes do not change the git tree hash of the folder.
+
+    :param tool_path: path to the tool folder
+    :param repo_path: path to the local repository
+    :param xml_files: names of the XML files (tools and macros) in the tool folder
+    :return: file paths relative to the repository root, including imported files that do not exist
+    """
+    folder = tool_path.resolve()
+    root = repo_path.resolve()
+    to_visit = [tool_path / name for name in xml_files]
+    visited: Set[Path] = set()
+    dependencies: Set[str] = set()
+    while to_visit:
+        path = to_visit.pop()
+        resolved = path.resolve()
+        if resolved in visited:
+            continue
+        visited.add(resolved)
+        if not resolved.is_relative_to(folder) and resolved.is_relative_to(root):
+            dependencies.add(resolved.relative_to(root).as_posix())
+        try:
+            text = path.read_text(errors="replace")
+        except OSError:
+            continue
+        # imports are relative to the folder of the importing file, as in Galaxy
+        to_visit.extend(path.parent / match.group(1) for match in IMPORT_PATTERN.finditer(text))
+    return sorted(dependencies)
+
+
+def list_tool_files_from_git(repo_path: Path) -> Optional[List[str]]:
+    """
+    List the .shed.yml and XML files of the tool search folders from the git index of a repository,
+    in one call instead of listing each folder
+
+    :param repo_path: path to the local repository
+    :return: file paths relative to the repository, None if the repository has no git index or no such file
+    """
+    # test data can hold thousands of XML files, they are excluded as in crawl_tool_files
+    pathspecs = [
+        pathspec
+        for sd in TOOL_SEARCH_DIRS
+        for pathspec in (f"{sd}/*.shed.yml", f"{sd}/*xml", f":(exclude){sd}/*/test-data/*")
+    ]
+    try:
+        result = subprocess.run(["git", "ls-files", "-z", "--", *pathspecs], cwd=repo_path, capture_output=True)
+    except OSError:
+        return None
+    if result.returncode != 0 or not result.stdout:
+        return None
+    return [path for path in result.stdout.decode("utf-8", "surrogateescape").split("\0") if path]
+
+
+def crawl_tool_files(repo_path: Path) -> List[str]:
+    """
+    List the .shed.yml and XML files of the tool search folders by walking them,
+    without going below a tool folder or in test-data folders
+
+    :param repo_path: path to the local repository
+    :return: file paths relative to the repository
+    """
+    file_paths: List[str] = []
+    for sd in TOOL_SEARCH_DIRS:
+        for dirpath, dirnames, filenames in os.walk(repo_path / sd):
+            folder = Path(dirpath).relative_to(repo_path).as_posix()
+            if ".shed.yml" in filenames and "/" in folder:
+                dirnames.clear()
+            elif "test-data" in dirnames:
+                dirnames.remove("test-data")
+            file_paths.extend(f"{folder}/{name}" for name in filenames if name == ".shed.yml" or name.endswith("xml"))
+    return file_paths
+
+
+def get_tool_folders(file_paths: Iterable[str]) -> Dict[str, List[str]]:
+    """
+    Get the tool folders of a repository with their XML files: the folders with a .shed.yml in a tool search folder
+    (tools/, wrappers/, tool_collections/), at any depth but not inside another tool folder
+
+    :param file_paths: paths of the .shed.yml and XML files relative to the repository (e.g. from
+        list_tool_files_from_git or crawl_tool_files)
+    :return: names of the XML files per tool folder path relative to the repository,
+        sorted by search folder and path
+    """
+    xml_files: Dict[str, List[str]] = {}
+    shed_folders: List[str] = []
+    for file_path in file_paths:
+        folder, _, name = file_path.rpartition("/")
+        if name == ".shed.yml":
+            if "/" in folder and folder.split("/")[0] in TOOL_SEARCH_DIRS:
+                shed_folders.append(folder)
+        elif name.endswith("xml"):
+            xml_files.setdefault(folder, []).append(name)
+
+    tool_folders: Dict[str, List[str]] = {}
+    # the shallowest .shed.yml defines the tool folder
+    for folder in sorted(shed_folders, key=lambda f: f.count("/")):
+        parts = folder.split("/")
+        if not any("/".join(parts[:i]) in tool_folders for i in range(2, len(parts))):
+            tool_folders[folder] = xml_files.get(folder, [])
+    return dict(
+        sorted(
+            tool_folders.items(), key=lambda item: (TOOL_SEARCH_DIRS.index(item[0].split("/")[0]), item[0].split("/"))
+        )
+    )
+
+
+def _parse_tool_folders(
+    items: List[Tuple[Path, str, List[str]]], repo_path: Path, repo_url: str
+) -> List[Tuple[Path, Optional[Dict[str, Any]]]]:
+    """
+    Parse a chunk of tool folders, in a worker process of parse_tools_from_local
+
+    :param items: tool paths with their first commit date and XML files
+    """
+    results: List[Tuple[Path, Optional[Dict[str, Any]]]] = []
+    for tool_path, date, xml_files in items:
+        try:
+            first_commit_dates = {str(tool_path.relative_to(repo_path)): date}
+            results.append(
+                (
+                    tool_path,
+                    get_tool_metadata_from_local(
+                        tool_path,
+                        repo_path,
+                        repo_url=repo_url,
+                        first_commit_dates=first_commit_dates,
+                        xml_files=xml_files,
+                    ),
+                )
+            )
+        except Exception:
+            print(f"      Error parsing {tool_path.name}", file=sys.stderr)
+            print(traceback.format_exc())
+    return results
+
+
+def _parse_tools_in_processes(
+    tool_paths: List[Path],
+    repo_path: Path,
+    repo_url: str,
+    first_commit_dates: Dict[str, str],
+    workers: int,
+    xml_files: Dict[Path, List[str]],
+) -> List[Tuple[Path, Optional[Dict[str, Any]]]]:
+    """
+    Parse tool folders in chunks in worker processes
+
+    :param xml_files: XML files per tool path
+    :return: tool paths with their metadata, for the tool folders parsed without error
+    """
+    total = len(tool_paths)
+    items = [(p, first_commit_dates.get(str(p.relative_to(repo_path)), ""), xml_files[p]) for p in tool_paths]
+    # chunks of tool folders, to keep the inter-process overhead low compared to small tool folders
+    chunk_size = max(1, -(-total // (workers * 4)))
+    chunks = [items[i : i + chunk_size] for i in range(0, total, chunk_size)]
+    parsed: List[Tuple[Path, Optional[Dict[str, Any]]]] = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(_parse_tool_folders, chunk, repo_path, repo_url) for chunk in chunks]
+        done = 0
+        for future in as_completed(futures):
+            try:
+                chunk_results = future.result()
+            except Exception:
+                print("      Error parsing a chunk of tools", file=sys.stderr)
+                print(traceback.format_exc())
+                continue
+            done += len(chunk_results)
+            print(f"    [{done}/{total}] {', '.join(p.name for p, _ in chunk_results)}", flush=True)
+            parsed.extend(chunk_results)
+    return parsed
+
+
+def parse_tools_from_local(
+    repo_path: Path,
+    workers: int = 1,
+    repo_url: str = "",
+    manifest: Optional[Dict[str, Any]] = None,
+    parse_mode: Literal["thread", "process"] = "thread",
+    head: Optional[str] = None,
+) -> List[Dict[str, Any]]:
     """
     Parse tools from a locally cloned repository.
+
+    :param workers: number of parallel workers
+    :param parse_mode: "thread" to parse each tool folder in a thread, "process" to parse chunks of tool folders
+        in worker processes
+
+    :param manifest: optional state of the repository in the previous run, updated in place, with the HEAD commit
+        ("head") and per tool folder the git tree hash, the blob hashes of the files outside the folder that its
+        metadata may come from (see get_folder_dependencies) and the extracted metadata ("folders").
+        The metadata are reused for the whole repository if the HEAD is unchanged,
+        otherwise for the tool folders with an unchanged tree hash and unchanged dependencies.
+    :param head: HEAD commit of the repository if already known (e.g. from git ls-remote), read from the local
+        repository otherwise. The repository does not need to be cloned if it is the HEAD of the manifest.
     """
     tools: List[Dict[str, Any]] = []
+    tree_hashes: Dict[str, str] = {}
+
+    if manifest is not None:
+        head = head or get_repository_head(repo_path)
+        folders = manifest.setdefault("folders", {})
+        if head and manifest.get("head") == head:
+            print(f"    HEAD unchanged, reusing {len(folders)} tool folders", flush=True)
+            return [copy.deepcopy(entry["metadata"]) for entry in folders.values() if entry["metadata"] is not None]
+        manifest["head"] = head
+        tree_hashes = get_folder_tree_hashes(repo_path)
+
+    # look for tool folders in tools/, wrappers/, tool_collections/ from the git index, by crawling otherwise
+    file_paths = list_tool_files_from_git(repo_path)
+    if file_paths is None:
+        file_paths = crawl_tool_files(repo_path)
+    xml_files = {repo_path / folder: files for folder, files in get_tool_folders(file_paths).items()}
+    tool_paths = list(xml_files)
+
+    # metadata per tool path, reused from the manifest or parsed below
+    results: Dict[Path, Optional[Dict[str, Any]]] = {}
+    if manifest is not None:
+        previous = manifest["folders"]
+        manifest["folders"] = {}
+        blob_hashes = get_blob_hashes(repo_path, (dep for entry in previous.values() for dep in entry["dependencies"]))
+        for p in tool_paths:
+            rel_path = str(p.relative_to(repo_path))
+            tree_hash = tree_hashes.get(rel_path)
+            if (
+                tree_hash is not None
+                and rel_path in previous
+                and previous[rel_path]["tree"] == tree_hash
+                and all(blob_hashes.get(dep) == h for dep, h in previous[rel_path]["dependencies"].items())
+            ):
+                manifest["folders"][rel_path] = previous[rel_path]
+                results[p] = copy.deepcopy(previous[rel_path]["metadata"])
+        if results:
+            print(f"    Reusing {len(results)} unchanged tool folders", flush=True)
+    to_parse = [p for p in tool_paths if p not in results]
+
+    total = len(to_parse)
+    if total:
+        print(f"    Parsing {total} tools...", flush=True)
+        # one history walk for the whole repository instead of one per tool folder
+        first_commit_dates = get_first_commit_dates(repo_path, [str(p.relative_to(repo_path)) for p in to_parse])
+
+        def _record(p: Path, metadata: Optional[Dict[str, Any]]) -> None:
+            results[p] = metadata
+            if manifest is not None:
+                rel_path = str(p.relative_to(repo_path))
+                # blob hashes filled in once all folders are parsed
+                manifest["folders"][rel_path] = {
+                    "tree": tree_hashes.get(rel_path),
+                    "dependencies": dict.fromkeys(get_folder_dependencies(p, repo_path, xml_files[p])),
+                    "metadata": copy.deepcopy(metadata),
+                }
+
+        def _process_one(p: Path) -> Optional[Dict[str, Any]]:
+            return get_tool_metadata_from_local(
+                p, repo_path, repo_url=repo_url, first_commit_dates=first_commit_dates, xml_files=xml_files[p]
+            )
 
-    # look for tool folders in tools/, wrappers/, tool_collections/
-    search_dirs = ["tools", "wrappers", "tool_collections"]
-    found = False
-    for sd in search_dirs:
-        candidate = repo_path / sd
-        if candidate.is_dir():
-            found = True
-            items = [p for p in sorted(candidate.iterdir()) if p.is_dir()]
-            # collect all tool paths (handle nested .shed.yml)
-            tool_paths: List[Path] = []
-            for item in items:
-                if (item / ".shed.yml").exists():
-                    tool_paths.append(item)
-                else:
-                    for sub in sorted(item.iterdir()):
-                        if sub.is_dir():
-                            tool_paths.append(sub)
-
-            total = len(tool_paths)
-            print(f"    Parsing {total} tools...", flush=True)
-
-            def _process_one(p: Path) -> Optional[Dict[str, Any]]:
-                return get_tool_metadata_from_local(p, repo_path, repo_url=repo_url)
-
-            if workers > 1:
-                with ThreadPoolExecutor(max_workers=workers) as executor:
-                    fut_to_path = {executor.submit(_process_one, p): p for p in tool_paths}
-                    for idx, future in enumerate(as_completed(fut_to_path), 1):
-                        path = fut_to_path[future]
-                        print(f"    [{idx}/{total}] {path.name}", flush=True)
-                        try:
-                            metadata = future.result()
-                            if metadata is not None:
-                                tools.append(metadata)
-                        except Exception:
-                            print(f"      Error parsing {path.name}", file=sys.stderr)
-                            print(traceback.format_exc())
-            else:
-                for idx, p in enumerate(tool_paths, 1):
-                    print(f"    [{idx}/{total}] {p.name}", flush=True)
+        if parse_mode == "process":
+            for p, parsed_metadata in _parse_tools_in_processes(
+                to_parse, repo_path, repo_url, first_commit_dates, workers, xml_files
+            ):
+                _record(p, parsed_metadata)
+        elif workers > 1:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                fut_to_path = {executor.submit(_process_one, p): p for p in to_parse}
+                for idx, future in enumerate(as_completed(fut_to_path), 1):
+                    path = fut_to_path[future]
+                    print(f"    [{idx}/{total}] {path.name}", flush=True)
                     try:
-                        metadata = _process_one(p)
-                        if metadata is not None:
-                            tools.append(metadata)
+                        _record(path, future.result())
                     except Exception:
-                        print(f"      Error parsing {p.name}", file=sys.stderr)
+                        print(f"      Error parsing {path.name}", file=sys.stderr)
                         print(traceback.format_exc())
+        else:
+            for idx, p in enumerate(to_parse, 1):
+                print(f"    [{idx}/{total}] {p.name}", flush=True)
+                try:
+                    _record(p, _process_one(p))
+                except Exception:
+                    print(f"      Error parsing {p.name}", file=sys.stderr)
+                    print(traceback.format_exc())
+
+        if manifest is not None:
+            parsed = [manifest["folders"].get(str(p.relative_to(repo_path))) for p in to_parse]
+            blob_hashes = get_blob_hashes(
+                repo_path, (dep for entry in parsed if entry for dep in entry["dependencies"])
+            )
+            for entry in parsed:
+                if entry:
+                    entry["dependencies"] = {dep: blob_hashes.get(dep) for dep in entry["dependencies"]}
 
-    if not found:
+    if not tool_paths:
         print("No tool folder found", file=sys.stderr)
 
+    for p in tool_paths:
+        metadata = results.get(p)
+        if metadata is not None:
+            tools.append(metadata)
+    if manifest is not None:
+        # keep the folders in the order of the tool paths, for reuse when the HEAD is unchanged
+        folders = manifest["folders"]
+        manifest["folders"] = {
+            rel_path: folders[rel_path]
+            for rel_path in (str(p.relative_to(repo_path)) for p in tool_paths)
+            if rel_path in folders
+        }
     return tools
 
 
+def load_manifest(manifest_path: Path) -> Dict[str, Dict[str, Any]]:
+    """
+    Load the manifest of a previous extraction, empty if missing or written by another manifest version
+
+    :param manifest_path: path to the manifest JSON
+    :return: state per repository URL (see parse_tools_from_local)
+    """
+    if not manifest_path.exists():
+        return {}
+    with manifest_path.open() as f:
+        content = json.load(f)
+    if content.get("version") != MANIFEST_VERSION:
+        print(f"Ignoring manifest {manifest_path} written by another version", flush=True)
+        return {}
+    return content["repositories"]
+
+
+def save_manifest(repositories: Dict[str, Dict[str, Any]], manifest_path: Path) -> None:
+    """
+    Save the manifest of the extraction
+
+    :param repositories: state per repository URL (see parse_tools_from_local)
+    :param manifest_path: path to the manifest JSON
+    """
+    manifest_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = manifest_path.with_name(f"{manifest_path.name}.tmp")
+    with tmp_path.open("w") as f:
+        json.dump({"version": MANIFEST_VERSION, "repositories": repositories}, f)
+    os.replace(tmp_path, manifest_path)
+
+
 def get_tool_outputs(el: et.Element) -> list[str]:
     """
     Find tool outputs by format from the outputs XML.
@@ -638,6 +2025,144 @@ def check_categories(ts_categories: str, ts_cat: List[str]) -> bool:
     return bool(set(ts_cat) & set(ts_cats))
 
 
+class ServerToolCache:
+    """
+    On-disk snapshots of the tool ids installed on Galaxy servers, with one gzipped JSON file per server URL.
+    Snapshots younger than the TTL are used without any request, older ones are revalidated
+    using the ETag and Last-Modified headers when the server provides them, and still used if the server cannot
+    be reached or fails.
+    """
+
+    def __init__(self, cache_dir: Path, ttl: float = 24 * 3600, offline: bool = False) -> None:
+        """
+        :param cache_dir: directory to store the snapshots in
+        :param ttl: time in seconds after which a snapshot is revalidated
+        :param offline: use the snapshots whatever their age and never query the servers
+        """
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.offline = offline
+
+    def get_path(self, galaxy_url: str) -> Path:
+        """
+        Get the path of the snapshot for a server, named after the full URL (with the scheme)
+
+        :param galaxy_url: URL of Galaxy instance
+        """
+        url = galaxy_url.rstrip("/")
+        # the hash keeps distinct the URLs made equal by the replaced characters
+        name = re.sub(r"[^\w.-]+", "_", url)
+        return self.cache_dir / f"{name}-{hashlib.sha256(url.encode()).hexdigest()[:12]}.json.gz"
+
+    def load(self, galaxy_url: str) -> Optional[Dict[str, Any]]:
+        """
+        Load the snapshot of a server, None if there is no (readable) snapshot
+
+        :param galaxy_url: URL of Galaxy instance
+        """
+        path = self.get_path(galaxy_url)
+        if not path.exists():
+            return None
+        try:
+            with gzip.open(path, "rt") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def save(
+        self, galaxy_url: str, tool_ids: List[str], etag: Optional[str] = None, last_modified: Optional[str] = None
+    ) -> None:
+        """
+        Store the snapshot of a server (atomically, so concurrent runs can share the cache)
+
+        :param galaxy_url: URL of Galaxy instance
+        :param tool_ids: tool ids installed on the server
+        :param etag: ETag header of the response
+        :param last_modified: Last-Modified header of the response
+        """
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        path = self.get_path(galaxy_url)
+        entry = {
+            "url": galaxy_url.rstrip("/"),
+            "fetched": time.time(),
+            "etag": etag,
+            "last_modified": last_modified,
+            "tool_ids": tool_ids,
+        }
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with gzip.open(tmp_path, "wt") as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, path)
+
+    def fetch(self, galaxy_url: str, session: requests.Session, timeout: int = 30) -> Tuple[List[str], int, str]:
+        """
+        Get the tool ids installed on a server from the snapshot if fresh, otherwise from the server.
+        A stale snapshot is used, with a warning, if the server cannot be reached or answers with a server error.
+
+        :param galaxy_url: URL of Galaxy instance
+        :param session: session used to query the server
+        :param timeout: request timeout in seconds
+        :return: tool ids, size of the downloaded payload in bytes and source ("cache", "revalidated", "stale"
+            or "server")
+        """
+        entry = self.load(galaxy_url)
+        if entry is not None and (self.offline or time.time() - entry["fetched"] < self.ttl):
+            return entry["tool_ids"], 0, "cache"
+        if self.offline:
+            raise ValueError(f"no cached tools for {galaxy_url} in offline mode")
+
+        headers = {}
+        if entry is not None and entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry is not None and entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        try:
+            r = session.get(
+                f"{galaxy_url.rstrip('/')}/api/tools", params={"in_panel": False}, timeout=timeout, headers=headers
+            )
+        except requests.RequestException as ex:
+            if entry is None:
+                raise
+            print(f"Could not revalidate the tools of {galaxy_url} ({ex}), using the stale snapshot", file=sys.stderr)
+            return entry["tool_ids"], 0, "stale"
+        if entry is not None and r.status_code >= 500:
+            print(
+                f"Could not revalidate the tools of {galaxy_url} (HTTP {r.status_code}), using the stale snapshot",
+                file=sys.stderr,
+            )
+            return entry["tool_ids"], 0, "stale"
+        if entry is not None and r.status_code == requests.codes.not_modified:
+            self.save(galaxy_url, entry["tool_ids"], etag=entry.get("etag"), last_modified=entry.get("last_modified"))
+            return entry["tool_ids"], 0, "revalidated"
+        r.raise_for_status()
+        tool_ids = [tool_dict["id"] for tool_dict in r.json()]
+        self.save(galaxy_url, tool_ids, etag=r.headers.get("ETag"), last_modified=r.headers.get("Last-Modified"))
+        return tool_ids, len(r.content), "server"
+
+
+# Tool ids per server URL, filled by prefetch_installed_tool_ids before the suites are processed
+PREFETCHED_TOOL_IDS: Dict[str, List[str]] = {}
+
+
+def request_installed_tool_ids(
+    galaxy_url: str, session: Optional[requests.Session] = None, timeout: int = 30
+) -> Tuple[List[str], int]:
+    """
+    Request all tool ids from a Galaxy server, raising an exception if the query fails
+
+    :param galaxy_url: URL of Galaxy instance
+    :param session: optional session to reuse connections
+    :param timeout: request timeout in seconds
+    :return: list of tool ids and size of the response payload in bytes
+    """
+    base_url = f"{galaxy_url.rstrip('/')}/api"
+    get = session.get if session is not None else requests.get
+    r = get(f"{base_url}/tools", params={"in_panel": False}, timeout=timeout)
+    r.raise_for_status()
+    tool_dict_list = r.json()
+    return [tool_dict["id"] for tool_dict in tool_dict_list], len(r.content)
+
+
 @lru_cache  # need to run this for each suite, so just cache it
 def get_all_installed_tool_ids_on_server(galaxy_url: str) -> List[str]:
     """
@@ -646,13 +2171,11 @@ def get_all_installed_tool_ids_on_server(galaxy_url: str) -> List[str]:
     :param galaxy_url: URL of Galaxy instance
     """
     galaxy_url = galaxy_url.rstrip("/")
-    base_url = f"{galaxy_url}/api"
+    if galaxy_url in PREFETCHED_TOOL_IDS:
+        return PREFETCHED_TOOL_IDS[galaxy_url]
 
     try:
-        r = requests.get(f"{base_url}/tools", params={"in_panel": False}, timeout=30)
-        r.raise_for_status()
-        tool_dict_list = r.json()
-        tools = [tool_dict["id"] for tool_dict in tool_dict_list]
+        tools, _size = request_installed_tool_ids(galaxy_url)
         return tools
     except Exception as ex:
         print(f"Server query failed with: \n {ex}")
@@ -660,6 +2183,105 @@ def get_all_installed_tool_ids_on_server(galaxy_url: str) -> List[str]:
         return []
 
 
+def prefetch_installed_tool_ids(
+    servers: Dict[str, str],
+    workers: int = 20,
+    timeout: int = 30,
+    max_time: float = 600,
+    cache: Optional[ServerToolCache] = None,
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Fetch concurrently the tool ids installed on all servers, before the suites are processed.
+    Servers that fail or do not answer within max_time are reported and considered without any tool.
+    The cap is soft: the requests still running after max_time are not interrupted but end on their own timeout,
+    so the worker threads may keep running, and the process alive, up to about max_time + timeout.
+
+    :param servers: dictionary with server names as keys and URLs as values
+    :param workers: number of parallel requests
+    :param timeout: request timeout in seconds
+    :param max_time: time in seconds after which the servers that did not answer are considered without any tool
+    :param cache: optional on-disk cache of the server tool lists
+    :return: report per server name with status, source, latency (s), payload size (bytes) and number of tools
+    """
+    report: Dict[str, Dict[str, Any]] = {}
+    start = time.time()
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=workers, pool_maxsize=workers)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+
+    def _fetch(url: str) -> Tuple[List[str], Dict[str, Any]]:
+        fetch_start = time.time()
+        source = "server"
+        try:
+            if cache is not None:
+                tool_ids, size, source = cache.fetch(url, session, timeout=timeout)
+            else:
+                tool_ids, size = request_installed_tool_ids(url, session=session, timeout=timeout)
+            status = "OK"
+        except Exception as ex:
+            tool_ids, size = [], 0
+            status = "FAIL"
+            print(f"Could not query tools on server {url} ({ex}), all tools from this server will be set to 0!")
+        return tool_ids, {
+            "status": status,
+            "source": source,
+            "latency": time.time() - fetch_start,
+            "size": size,
+            "tools": len(tool_ids),
+        }
+
+    print(f"Fetching installed tools from {len(servers)} servers with {workers} workers ...", flush=True)
+    executor = ThreadPoolExecutor(max_workers=workers)
+    futures = {executor.submit(_fetch, url): name for name, url in servers.items()}
+    try:
+        for i, future in enumerate(as_completed(futures, timeout=max_time), 1):
+            name = futures[future]
+            tool_ids, report[name] = future.result()
+            PREFETCHED_TOOL_IDS[servers[name].rstrip("/")] = tool_ids
+            stats = report[name]
+            print(
+                f"[{time.time() - start:6.1f}s] ({i:3d}/{len(servers)}) {stats['status']:4s} {name}: "
+                f"{stats['tools']} tools from {stats['source']}, {stats['size'] / 1e6:.1f} MB in {stats['latency']:.1f}s",
+                flush=True,
+            )
+    except FuturesTimeoutError:
+        for future, name in futures.items():
+            if name in report:
+                continue
+            if future.done():
+                tool_ids, report[name] = future.result()
+            else:
+                tool_ids = []
+                report[name] = {"status": "TIMEOUT", "source": "server", "latency": max_time, "size": 0, "tools": 0}
+                print(f"No answer from {name} within {max_time}s, all tools from this server will be set to 0!")
+            PREFETCHED_TOOL_IDS[servers[name].rstrip("/")] = tool_ids
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+        # the session is shared with the requests still running, which end on their own timeout
+        if all(future.done() for future in futures):
+            session.close()
+
+    ok = [stats for stats in report.values() if stats["status"] == "OK"]
+    print(
+        f"Fetched installed tools from {len(ok)}/{len(servers)} servers "
+        f"({sum(stats['size'] for stats in ok) / 1e6:.1f} MB) in {time.time() - start:.1f}s",
+        flush=True,
+    )
+    return report
+
+
+@lru_cache  # the set is built once per server and then reused for all suites
+def get_installed_short_tool_ids_on_server(galaxy_url: str) -> FrozenSet[str]:
+    """
+    Get the set of short tool ids (without ToolShed repository and version) installed on a Galaxy server
+
+    :param galaxy_url: URL of Galaxy instance
+    """
+    installed_tool_ids = get_all_installed_tool_ids_on_server(galaxy_url)
+    return frozenset(tool_id.split("/")[4] if "/" in tool_id else tool_id for tool_id in installed_tool_ids)
+
+
 def check_tools_on_servers(tool_ids: List[str], galaxy_server_url: str) -> int:
     """
     Return number of tools in tool_ids installed on galaxy_server_url
@@ -668,8 +2290,7 @@ def check_tools_on_servers(tool_ids: List[str], galaxy_server_url: str) -> int:
     """
     assert all("/" not in tool_id for tool_id in tool_ids), "This function only works on short tool ids"
 
-    installed_tool_ids = get_all_installed_tool_ids_on_server(galaxy_server_url)
-    installed_tool_short_ids = [tool_id.split("/")[4] if "/" in tool_id else tool_id for tool_id in installed_tool_ids]
+    installed_tool_short_ids = get_installed_short_tool_ids_on_server(galaxy_server_url)
 
     counter = 0
     for tool_id in tool_ids:
@@ -679,6 +2300,57 @@ def check_tools_on_servers(tool_ids: List[str], galaxy_server_url: str) -> int:
     return counter
 
 
+def get_galaxy_servers(run_test: bool = False) -> Dict[str, str]:
+    """
+    Get the name and URL of the Galaxy servers to check the tool availability on:
+    the UseGalaxy servers and the available public servers
+
+    :param run_test: if True, return only UseGalaxy.eu
+    """
+    if run_test:
+        return {"UseGalaxy.eu": USEGALAXY_SERVER_URLS["UseGalaxy.eu"]}
+
+    servers = dict(USEGALAXY_SERVER_URLS)
+    usegalaxy_names = {name.lower() for name in USEGALAXY_SERVER_URLS}
+    public_servers_df = pd.read_csv(public_servers, sep="\t")
+    for name, url in zip(public_servers_df["name"], public_servers_df["url"]):
+        if name.lower() not in usegalaxy_names:
+            servers[name] = url
+    return servers
+
+
+def get_tool_availability_index(servers: Dict[str, str]) -> Dict[str, List[str]]:
+    """
+    Build an inverted index from short tool id to the names of the servers on which the tool is installed
+
+    :param servers: dictionary with server names as keys and URLs as values
+    """
+    availability: Dict[str, List[str]] = {}
+    for name, url in servers.items():
+        for tool_id in get_installed_short_tool_ids_on_server(url):
+            availability.setdefault(tool_id, []).append(name)
+    return availability
+
+
+def count_tools_on_servers(
+    tool_ids: List[str], availability: Dict[str, List[str]], server_names: List[str]
+) -> Dict[str, int]:
+    """
+    Return the number of tools in tool_ids installed on each server, with one index lookup per tool id
+
+    :param tool_ids: galaxy tool ids
+    :param availability: inverted index from short tool id to server names, built with get_tool_availability_index
+    :param server_names: names of all servers, to also report servers without any of the tools
+    """
+    assert all("/" not in tool_id for tool_id in tool_ids), "This function only works on short tool ids"
+
+    counts = dict.fromkeys(server_names, 0)
+    for tool_id in tool_ids:
+        for name in availability.get(tool_id, []):
+            counts[name] += 1
+    return counts
+
+
 def export_tools_to_json(tools: List[Dict], output_fp: str) -> None:
     """
     Export tool metadata to TSV output file
@@ -687,7 +2359,7 @@ def export_tools_to_json(tools: List[Dict], output_fp: str) -> None:
     :param output_fp: path to output file
     """
     with Path(output_fp).open("w") as f:
-        json.dump(tools, f, default=list, indent=4)
+        shared.write_json_list(tools, f, default=list)
 
 
 def export_tools_to_tsv(
@@ -725,26 +2397,55 @@ def export_tools_to_tsv(
     df.to_csv(output_fp, sep="\t", index=False)
 
 
-def add_status(tool: Dict, tool_status: pd.DataFrame) -> None:
+def export_tools_to_parquet(tools: List[Dict], tsv_fp: str) -> None:
+    """
+    Export tool metadata to the Parquet file next to the TSV output file (see shared.write_parquet),
+    in the same order, with numeric usage and server columns and native list columns.
+    Without tools, the Parquet file is removed.
+
+    :param tools: dictionary with tools
+    :param tsv_fp: path to the TSV output file, written first
+    """
+    if not tools:
+        shared.get_parquet_path(tsv_fp).unlink(missing_ok=True)
+        return
+    df = pd.DataFrame(tools).sort_values("Suite ID")
+    for col in df.columns:
+        if col.startswith(("Number of tools on ", "Suite runs", "Suite users")):
+            df[col] = pd.to_numeric(df[col], errors="coerce")
+    shared.write_parquet(df, tsv_fp)
+
+
+def get_status_index(tool_status: pd.DataFrame) -> Dict[Any, Tuple[Optional[bool], Optional[bool]]]:
+    """
+    Index the tool status by suite ID and owner, or by suite ID only for status without owner.
+    The first status of a suite is kept.
+
+    :param tool_status: dataframe with suite ID and owner and their 2 status: Keep and Deprecated
+    :return: "To keep" and "Deprecated" status per (suite ID, suite owner) or suite ID
+    """
+    owners = tool_status["Suite owner"] if "Suite owner" in tool_status else [None] * len(tool_status)
+    status_index: Dict[Any, Tuple[Optional[bool], Optional[bool]]] = {}
+    for name, owner, to_keep, deprecated in zip(
+        tool_status["Suite ID"], owners, tool_status["To keep"], tool_status["Deprecated"]
+    ):
+        key = (name, owner) if owner is not None else name
+        status_index.setdefault(
+            key,
+            (bool(to_keep) if to_keep is not None else None, bool(deprecated) if deprecated is not None else None),
+        )
+    return status_index
+
+
+def add_status(tool: Dict, status_index: Dict[Any, Tuple[Optional[bool], Optional[bool]]]) -> None:
     """
     Add status to tool
 
     :param tool: dictionary with tools and their metadata
-    :param tool_status: dataframe with suite ID and owner and their 2 status: Keep and Deprecated
+    :param status_index: tool status indexed with get_status_index
     """
-    name = tool["Suite ID"]
-    owner = tool["Suite owner"]
-    if "Suite owner" in tool_status:
-        query = tool_status.query(f"`Suite ID` == '{name}' and `Suite owner` == '{owner}'")
-    else:
-        query = tool_status.query(f"`Suite ID` == '{name}'")
-    if query.empty:
-        tool["To keep"] = None
-        tool["Deprecated"] = None
-    else:
-        selected_query = query.iloc[0]
-        tool["To keep"] = bool(selected_query["To keep"]) if selected_query["To keep"] is not None else None
-        tool["Deprecated"] = bool(selected_query["Deprecated"]) if selected_query["Deprecated"] is not None else None
+    status = status_index.get((tool["Suite ID"], tool["Suite owner"]), status_index.get(tool["Suite ID"]))
+    tool["To keep"], tool["Deprecated"] = status if status is not None else (None, None)
 
 
 def filter_tools(
@@ -760,11 +2461,12 @@ def filter_tools(
     :param tool_status: dataframe with suite ID and owner and their 2 status: Keep and Deprecated
     """
     filtered_tools = []
+    status_index = get_status_index(tool_status)
     for tool in tools:
         # filter ToolShed categories and leave function if not in expected categories
         if check_categories(tool["ToolShed categories"], ts_cat):
             filtered_tools.append(tool)
-            add_status(tool, tool_status)
+            add_status(tool, status_index)
     return filtered_tools
 
 
@@ -781,8 +2483,9 @@ def curate_tools(
     curated_tools = []
     tools_wo_biotools = []
     tools_with_biotools = []
+    status_index = get_status_index(tool_status)
     for tool in tools:
-        add_status(tool, tool_status)
+        add_status(tool, status_index)
         if tool["To keep"]:  # only add tools that are manually marked as to keep
             curated_tools.append(tool)
             if tool["bio.tool ID"] is None:
@@ -792,45 +2495,167 @@ def curate_tools(
     return curated_tools, tools_wo_biotools, tools_with_biotools
 
 
-def reduce_ontology_terms(terms: List, ontology: Any) -> List:
+def read_tool_status(status_fp: Optional[str]) -> pd.DataFrame:
     """
-    Reduces a list of Ontology terms, to include only terms that are not super-classes of one of the other terms.
-    In other terms all classes that have a subclass in the terms are removed.
+    Read a tool status file, or get an empty status if missing or not readable
 
-    :terms: list of terms from that ontology
-    :ontology: Ontology
+    :param status_fp: path to the TSV file with tool status
     """
-    # if list is empty do nothing
-    if not terms:
-        return terms
+    if status_fp and Path(status_fp).exists():
+        try:
+            return pd.read_csv(status_fp, sep="\t").replace(np.nan, None)
+        except Exception as ex:
+            print(f"Failed to load {status_fp} file with:\n{ex}")
+            print("Not assigning tool status for this community !")
+    return pd.DataFrame(columns=["Suite ID", "Suite owner", "Description", "To keep", "Deprecated"])
 
-    classes = [ontology.search_one(label=term) for term in terms]
-    check_classes = [cla for cla in classes if cla is not None]  # Remove None values
 
-    new_classes = []
-    for cla in check_classes:
-        try:
-            # get all subclasses
-            subclasses = list(cla.subclasses())
+def export_filtered_tools(filtered_tools: List[Dict], filtered_fp: str, status_fp: str) -> None:
+    """
+    Export the tools filtered for a community, with their status, and update the tool status file
 
-            # check if any of the other classes is a subclass
-            include_class = True
-            for subcla in subclasses:
-                for cla2 in check_classes:
-                    if subcla == cla2:
-                        include_class = False
+    :param filtered_tools: filtered tools with their status
+    :param filtered_fp: path to the JSON output file
+    :param status_fp: path to the TSV file with tool status
+    """
+    if filtered_tools:
+        export_tools_to_json(filtered_tools, filtered_fp)
+        export_tools_to_tsv(
+            filtered_tools,
+            status_fp,
+            format_list_col=True,
+            to_keep_columns=["Suite ID", "Suite owner", "Description", "To keep", "Deprecated"],
+        )
+    else:
+        # if there are no ts filtered tools
+        print(f"No tools found for category {filtered_fp}")
 
-            # only keep the class if it is not a parent class
-            if include_class:
-                new_classes.append(cla)
 
-        except Exception as e:
-            print(f"Error processing class {cla}: {e}")
+def export_curated_tools(
+    tools: List[Dict],
+    tool_status: pd.DataFrame,
+    filtered_fp: str,
+    curated_fp: str,
+    wo_biotools_fp: str,
+    w_biotools_fp: str,
+    yml_fp: str,
+) -> None:
+    """
+    Curate the tools filtered for a community and export them
+
+    :param tools: tools filtered for the community
+    :param tool_status: dataframe with suite ID and owner and their 2 status: Keep and Deprecated
+    :param filtered_fp: path to the JSON output file of the curated tools
+    :param curated_fp: path to the TSV output file of the curated tools
+    :param wo_biotools_fp: path to the TSV output file of the curated tools without bio.tools
+    :param w_biotools_fp: path to the TSV output file of the curated tools with bio.tools
+    :param yml_fp: path to the YAML output file of the curated tools
+    """
+    curated_tools, tools_wo_biotools, tools_with_biotools = curate_tools(tools, tool_status)
+    if curated_tools:
+        export_tools_to_json(curated_tools, filtered_fp)
+        export_tools_to_tsv(
+            curated_tools,
+            curated_fp,
+            format_list_col=True,
+        )
+        export_tools_to_parquet(curated_tools, curated_fp)
+        export_tools_to_tsv(
+            tools_wo_biotools,
+            wo_biotools_fp,
+            format_list_col=True,
+            to_keep_columns=["Suite ID", "Homepage", "Suite source"],
+        )
+        export_tools_to_tsv(
+            tools_with_biotools,
+            w_biotools_fp,
+            format_list_col=True,
+            to_keep_columns=["Suite ID", "bio.tool name", "EDAM operations", "EDAM topics"],
+        )
+        export_tools_to_yml(curated_tools, yml_fp)
+    else:
+        # if there are no ts filtered tools
+        print("No tools left after curation")
+
+
+class EdamIndex:
+    """
+    Index of the classes of the EDAM ontology, with the transitive ancestors of each class as an integer bitset
+    """
+
+    def __init__(self, classes: List[Tuple[List[str], List[int]]]) -> None:
+        """
+        :param classes: labels (the first one being the main label) and indexes of the parent classes of each class
+        """
+        self.labels = [labels[0] if labels else "" for labels, _ in classes]
+        self.label_ids: Dict[str, int] = {}
+        for class_id, (labels, _) in enumerate(classes):
+            for label in labels:
+                self.label_ids.setdefault(label, class_id)
+        # bit i of ancestors[c] is set if class i is a (transitive) superclass of class c
+        self.ancestors: List[int] = [0] * len(classes)
+        done = [False] * len(classes)
+        for class_id in range(len(classes)):
+            # iterative depth-first traversal, ancestors of the parents are computed before their children
+            stack = [class_id]
+            while stack:
+                current = stack[-1]
+                if done[current]:
+                    stack.pop()
+                    continue
+                pending = [parent for parent in classes[current][1] if not done[parent] and parent not in stack]
+                if pending:
+                    stack.extend(pending)
+                    continue
+                bits = 0
+                for parent in classes[current][1]:
+                    bits |= (1 << parent) | self.ancestors[parent]
+                self.ancestors[current] = bits & ~(1 << current)
+                done[current] = True
+                stack.pop()
+        self._dropped: Dict[FrozenSet[str], FrozenSet[str]] = {}
+
+    def reduce(self, terms: List[str]) -> List[str]:
+        """
+        Reduce a list of terms to the terms that are not ancestors of another term, keeping their order.
+        Terms that are not in the ontology are removed.
+
+        :param terms: list of EDAM labels
+        """
+        key = frozenset(terms)
+        if key not in self._dropped:
+            class_ids = {self.label_ids[term] for term in key if term in self.label_ids}
+            all_ancestors = 0
+            for class_id in class_ids:
+                all_ancestors |= self.ancestors[class_id]
+            self._dropped[key] = frozenset(
+                term for term in key if term not in self.label_ids or all_ancestors >> self.label_ids[term] & 1
+            )
+        dropped = self._dropped[key]
+        return [self.labels[self.label_ids[term]] for term in terms if term not in dropped]
+
+
+def get_edam_index(classes: List[Dict[str, Any]]) -> EdamIndex:
+    """
+    Build the EDAM index from the EDAM classes
+
+    :param classes: classes from shared.load_edam_classes or shared.get_edam_classes
+    """
+    return EdamIndex([(cla["labels"], cla["parents"]) for cla in classes])
+
 
-    # convert back to terms, skipping None values
-    new_terms = [cla.label[0] for cla in new_classes if cla is not None]
-    # print(f"Terms: {len(terms)}, New terms: {len(new_terms)}")
-    return new_terms
+def reduce_ontology_terms(terms: List, ontology: EdamIndex) -> List:
+    """
+    Reduces a list of Ontology terms, to include only terms that are not super-classes of one of the other terms.
+    In other terms all classes that have a subclass (direct or not) in the terms are removed.
+
+    :terms: list of terms from that ontology
+    :ontology: index of the ontology, from get_edam_index
+    """
+    # if list is empty do nothing
+    if not terms:
+        return terms
+    return ontology.reduce(terms)
 
 
 def aggregate_tool_stats(
@@ -935,17 +2760,20 @@ def extract_top_tools_per_category(
     """
     Extract top tools per categories
     """
-    tools = pd.read_csv(tool_fp, sep="\t")
+    tools = shared.read_table(
+        tool_fp,
+        columns=["Suite ID", "Description", "Tool IDs", "EDAM operations", count_column],
+        list_columns=["Tool IDs", "EDAM operations"],
+    )
 
     # Some tools are not associated with EDAM operations and therefore not shown in the table even if they are used a lot.
     # To avoid that, we create a new category "No associated EDAM operation"
 
-    # Step 0 : Add the string "No associated EDAM operation" in all the empty cells of the "EDAM operations" column
-    tools["EDAM operations"] = tools["EDAM operations"].fillna("No associated EDAM operation").astype(str)
-
-    # Step 1: Split the categories into separate rows and strip whitespace
-    df = tools.assign(Category=tools["EDAM operations"].str.split(",")).explode("Category")
-    df["Category"] = df["Category"].str.strip()  # Strip whitespace
+    # Step 0 : Add "No associated EDAM operation" in all the empty lists of the "EDAM operations" column
+    # Step 1: Split the categories into separate rows
+    df = tools.assign(
+        Category=tools["EDAM operations"].map(lambda operations: operations or ["No associated EDAM operation"])
+    ).explode("Category")
 
     # Step 2: Group by category to calculate total count and item count
     grouped = (
@@ -1005,8 +2833,11 @@ def fill_lab_tool_section(
             tool_ids = row["Tool IDs"]
             wrapper_id = row["Suite ID"]
 
-            # Split the tool IDs by comma if it's a valid string, otherwise handle as an empty list
-            tool_ids_list = tool_ids.split(",") if isinstance(tool_ids, str) else []
+            # Split the tool IDs by comma if it's a valid string, otherwise handle as a list
+            if isinstance(tool_ids, str):
+                tool_ids_list = tool_ids.split(",")
+            else:
+                tool_ids_list = list(tool_ids) if isinstance(tool_ids, list) else []
 
             # Create the base URL template for each tool link
             url_template = "/?tool_id={tool_id}"
@@ -1058,7 +2889,11 @@ def extract_missing_tools_per_servers(tool_fp: str) -> dict:
     Extract missing tools per servers that could be installed in a Lab
     """
     top_tools_per_category = extract_top_tools_per_category(tool_fp)
-    tools = pd.read_csv(tool_fp, sep="\t").fillna("")
+    tools = shared.read_table(
+        tool_fp,
+        columns=lambda col: col in ("Suite ID", "Suite owner", "Tool IDs") or col.startswith("Number of tools on "),
+        list_columns=["Tool IDs"],
+    ).fillna("")
 
     # Add a new column with all zeros, this will create a Local_Galaxy.yml that has all tools of the Lab
     tools["Number of tools on Local_Galaxy"] = 0
@@ -1066,7 +2901,7 @@ def extract_missing_tools_per_servers(tool_fp: str) -> dict:
     servers = [col.replace("Number of tools on ", "") for col in tools.filter(regex="Number of tools on").columns]
     missing_tools: dict[str, dict] = {}
     for _index, tool in tools.iterrows():
-        tool_ids = tool["Tool IDs"].split(", ")
+        tool_ids = tool["Tool IDs"]
         # individual tools to install
         to_install = [{"name": t_id, "owner": tool["Suite owner"], "tool_panel_section_id": ""} for t_id in tool_ids]
         # identify servers missing tools
@@ -1091,7 +2926,7 @@ def export_missing_tools_to_yaml(server_f: Path, tools: list) -> None:
         "tools": tools,
     }
     with server_f.open("w") as output:
-        yaml.dump(tool_dict, output, default_flow_style=False)
+        output.write(shared.dump_yaml(tool_dict))
 
 
 def export_missing_tools(missing_tools: dict, tool_dp: str) -> None:
@@ -1111,27 +2946,175 @@ def export_missing_tools(missing_tools: dict, tool_dp: str) -> None:
         export_missing_tools_to_yaml(Path(top_d) / Path(server_fn), tools["top"])
 
 
+def get_tool_availability(tool: Dict) -> Dict[str, Any]:
+    """
+    Get the number of tools of a suite on the UseGalaxy servers where it is available
+    """
+    availability = {}
+    for field in tool:
+        field_value = tool[field]
+        availability_match_string = "[Nn]umber of tools"
+        if re.search(availability_match_string, field):
+            instance_match_string = "[Uu]se[Gg]alaxy\.[a-z]{2}"
+            if re.search(instance_match_string, field):
+                match = re.search(instance_match_string, field)
+                if match:
+                    field_name = match.group(0)
+                    if field_value != 0:
+                        availability[field_name] = field_value
+    return availability
+
+
 def export_tools_to_yml(tools: List[Dict], yml_output_path: str) -> None:
     """
     Export to YAML for rendering on the website
     """
     for tool in tools:
-        availability = {}
-        for field in tool:
-            field_value = tool[field]
-            availability_match_string = "[Nn]umber of tools"
-            if re.search(availability_match_string, field):
-                instance_match_string = "[Uu]se[Gg]alaxy\.[a-z]{2}"
-                if re.search(instance_match_string, field):
-                    match = re.search(instance_match_string, field)
-                    if match:
-                        field_name = match.group(0)
-                        if field_value != 0:
-                            availability[field_name] = field_value
-        tool["availability"] = availability
+        tool["availability"] = get_tool_availability(tool)
     shared.export_to_yml(tools, yml_output_path)
 
 
+def get_suite_key(suite_id: Any, suite_owner: Any) -> Tuple[str, str]:
+    """
+    Get the key identifying a tool suite in the JSON and TSV tool tables
+    """
+    return str(suite_id), str(suite_owner or "")
+
+
+def merge_tool_shard_parquets(
+    shard_tsv_paths: List[str], kept: Dict[Tuple[str, str], Tuple[int, str]], tsv_fp: str, batch_size: int = 10000
+) -> bool:
+    """
+    Merge the Parquet tool tables of the shards into the Parquet file next to the merged TSV table, streaming
+    the shards by record batches and writing the merged table by batches of rows, so the shards are never held
+    in memory. As the TSV tables, the shard tables are sorted by suite ID and merged in the same order,
+    with the same tool suites.
+
+    :param shard_tsv_paths: paths to the TSV tables of the shards, with the Parquet tables next to them
+    :param kept: shard index and parsed folder of the kept occurrence of each suite (see merge_tool_shards)
+    :param tsv_fp: path to the merged TSV table, written first
+    :param batch_size: number of rows read from a shard and written to the merged table at once
+    :return: False if a shard with kept suites has no Parquet table written from its TSV table, True otherwise
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    kept_shards = sorted({shard_id for shard_id, _ in kept.values()})
+    if not all(shared.is_parquet_current(shard_tsv_paths[shard_id]) for shard_id in kept_shards):
+        return False
+    if not kept_shards:
+        shared.get_parquet_path(tsv_fp).unlink(missing_ok=True)
+        return True
+    shard_files = {
+        shard_id: pq.ParquetFile(shared.get_parquet_path(shard_tsv_paths[shard_id])) for shard_id in kept_shards
+    }
+    try:
+        # columns missing in a shard are filled with nulls, as the TSV columns
+        schema = pa.unify_schemas(
+            [shard_file.schema_arrow.remove_metadata() for shard_file in shard_files.values()],
+            promote_options="permissive",
+        )
+
+        def _rows(shard_id: int, shard_file: Any) -> Iterator[Tuple[int, Dict[str, Any]]]:
+            for batch in shard_file.iter_batches(batch_size=batch_size):
+                for row in batch.to_pylist():
+                    yield shard_id, row
+
+        with shared.open_parquet_writer(schema, tsv_fp) as writer:
+            written: Set[Tuple[str, str]] = set()
+            rows: List[Dict[str, Any]] = []
+            # rows with the same suite ID come first from the first shard, as in the TSV table
+            for shard_id, row in heapq.merge(
+                *(_rows(shard_id, shard_file) for shard_id, shard_file in shard_files.items()),
+                key=lambda item: item[1]["Suite ID"] or "",
+            ):
+                key = get_suite_key(row["Suite ID"], row.get("Suite owner"))
+                if key not in written and kept.get(key) == (shard_id, row.get("Suite parsed folder") or ""):
+                    written.add(key)
+                    rows.append(row)
+                    if len(rows) == batch_size:
+                        writer.write_table(pa.Table.from_pylist(rows, schema=schema))
+                        rows = []
+            if rows:
+                writer.write_table(pa.Table.from_pylist(rows, schema=schema))
+    finally:
+        for shard_file in shard_files.values():
+            shard_file.close()
+    return True
+
+
+def merge_tool_shards(shard_paths: List[str], json_fp: str, tsv_fp: str, yml_fp: str) -> Dict[str, int]:
+    """
+    Merge the JSON, TSV and Parquet tool tables extracted for subsets of the repositories (shards) into the
+    JSON, TSV, Parquet and YAML tool tables, streaming the shards without holding them in memory.
+    A tool suite (suite ID and owner) found in several shards is kept from the first shard in path order
+    and from its first occurrence in this shard. As in export_tools_to_tsv, the TSV table is sorted by suite ID.
+    The Parquet table is not written if a shard has no Parquet table written from its TSV table.
+
+    :param shard_paths: paths to the JSON tables of the shards, with the TSV and Parquet tables next to them
+    :param json_fp: path to the merged JSON output file
+    :param tsv_fp: path to the merged TSV output file
+    :param yml_fp: path to the merged YAML output file
+    :return: numbers of shards, merged tools and resolved duplicates
+    """
+    shard_paths = sorted(shard_paths)
+    # shard and parsed folder of the kept occurrence of each suite
+    kept: Dict[Tuple[str, str], Tuple[int, str]] = {}
+    duplicates = 0
+
+    def _unique_tools() -> Iterator[Dict[str, Any]]:
+        nonlocal duplicates
+        for shard_id, shard_path in enumerate(shard_paths):
+            with Path(shard_path).open() as shard_f:
+                for tool in shared.iter_json_array(shard_f):
+                    key = get_suite_key(tool["Suite ID"], tool["Suite owner"])
+                    if key in kept:
+                        duplicates += 1
+                        continue
+                    kept[key] = (shard_id, tool.get("Suite parsed folder") or "")
+                    yield tool
+
+    # same layout as export_tools_to_json and export_tools_to_yml, the YAML table from the merged JSON table
+    with Path(json_fp).open("w") as json_f:
+        shared.write_json_list(_unique_tools(), json_f, default=list)
+    with Path(json_fp).open() as json_f, Path(yml_fp).open("w") as yml_f:
+        shared.write_yaml_list(
+            (dict(tool, availability=get_tool_availability(tool)) for tool in shared.iter_json_array(json_f)), yml_f
+        )
+
+    shard_tsv_paths = [str(Path(shard_path).with_suffix(".tsv")) for shard_path in shard_paths]
+    tsv_files = [Path(shard_tsv_path).open(newline="") for shard_tsv_path in shard_tsv_paths]
+    try:
+        readers = [csv.DictReader(f, delimiter="\t") for f in tsv_files]
+
+        def _rows(shard_id: int, reader: csv.DictReader) -> Iterator[Tuple[int, Dict[str, str]]]:
+            for row in reader:
+                yield shard_id, row
+
+        with Path(tsv_fp).open("w", newline="") as tsv_f:
+            # shards may have different columns, e.g. the placeholder columns of a shard without tools
+            fieldnames = list(dict.fromkeys(name for reader in readers for name in reader.fieldnames or []))
+            writer = csv.DictWriter(tsv_f, fieldnames=fieldnames, restval="", delimiter="\t", lineterminator="\n")
+            writer.writeheader()
+            written: Set[Tuple[str, str]] = set()
+            # rows with the same suite ID come first from the first shard
+            for shard_id, row in heapq.merge(
+                *(_rows(shard_id, reader) for shard_id, reader in enumerate(readers)),
+                key=lambda item: item[1]["Suite ID"],
+            ):
+                key = get_suite_key(row["Suite ID"], row["Suite owner"])
+                if key not in written and kept.get(key) == (shard_id, row.get("Suite parsed folder") or ""):
+                    written.add(key)
+                    writer.writerow(row)
+    finally:
+        for f in tsv_files:
+            f.close()
+    if not merge_tool_shard_parquets(shard_tsv_paths, kept, tsv_fp):
+        print("Some shards have no Parquet table, the merged Parquet table is not written", file=sys.stderr)
+        shared.get_parquet_path(tsv_fp).unlink(missing_ok=True)
+    return {"shards": len(shard_paths), "tools": len(kept), "duplicates": duplicates}
+
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(
         description="Extract Galaxy tools from GitHub repositories together with biotools and conda metadata"
@@ -1191,8 +3174,14 @@ if __name__ == "__main__":
     extract.add_argument(
         "--workers",
         type=int,
-        default=1,
-        help="Number of parallel workers for tool parsing (default: 1, sequential)",
+        default=None,
+        help="Number of parallel workers for tool parsing (default: 1, sequential, in thread mode; CPU count in process mode)",
+    )
+    extract.add_argument(
+        "--parse-mode",
+        choices=["thread", "process"],
+        default="thread",
+        help="Parse the tool folders in threads or, for CPU-bound macro expansion, in processes (default: thread)",
     )
     extract.add_argument(
         "--clone-depth",
@@ -1200,6 +3189,147 @@ if __name__ == "__main__":
         default=None,
         help="Git clone depth for tool repositories (default: shallow=1; 0 for full history)",
     )
+    extract.add_argument(
+        "--clone-mode",
+        choices=["full", "sparse"],
+        default="full",
+        help="Clone the full tool repositories, or only the history and the .shed.yml and XML files of the tool "
+        "folders with partial clones and sparse checkouts (default: full)",
+    )
+    extract.add_argument(
+        "--enrich-workers",
+        type=int,
+        default=16,
+        help="Number of parallel requests to get the conda and bio.tools metadata of the tools (default: 16)",
+    )
+    extract.add_argument(
+        "--metadata-cache-ttl",
+        type=float,
+        default=24,
+        help="Time in hours after which the cached conda and bio.tools metadata are fetched again (default: 24)",
+    )
+    extract.add_argument(
+        "--biotools-source",
+        choices=["api", "index"],
+        default="api",
+        help="Get the bio.tools metadata per entry from the bio.tools API, or from the bio.tools index of the cache "
+        "directory, built if missing or older than --metadata-cache-ttl (default: api)",
+    )
+    extract.add_argument(
+        "--conda-source",
+        choices=["api", "repodata"],
+        default="api",
+        help="Get the latest conda package versions per package from the Anaconda API, or from the Bioconda index of "
+        "the cache directory, built from the channel repodata.json if missing or older than --metadata-cache-ttl "
+        "(default: api)",
+    )
+    extract.add_argument(
+        "--edam-version",
+        default="1.25",
+        help="EDAM version used to reduce the EDAM terms, stored once in the edam folder of the cache directory "
+        "(default: 1.25)",
+    )
+    extract.add_argument(
+        "--offline",
+        action="store_true",
+        default=False,
+        help="Use only the cached server tools, EDAM ontology and conda and bio.tools metadata, whatever their age, "
+        "without requests",
+    )
+    extract.add_argument(
+        "--manifest",
+        required=False,
+        help="Filepath to JSON manifest of the previous extraction, used to parse only changed tool folders and updated",
+    )
+    extract.add_argument(
+        "--clone-workers",
+        type=int,
+        default=8,
+        help="Number of repositories cloned or updated in parallel (default: 8)",
+    )
+    extract.add_argument(
+        "--clone-timeout",
+        type=float,
+        default=900,
+        help="Timeout in seconds of each git clone or pull (default: 900)",
+    )
+    extract.add_argument(
+        "--clone-retries",
+        type=int,
+        default=2,
+        help="Number of retries, with exponential backoff, of a failed git clone or pull (default: 2)",
+    )
+
+    # Fill the cache of the tools installed on the Galaxy servers
+    prefetch = subparser.add_parser(
+        "prefetch",
+        help="Fetch the tools installed on the Galaxy servers, and optionally Bioconda and bio.tools, into the cache",
+    )
+    prefetch.add_argument(
+        "--test",
+        "-t",
+        action="store_true",
+        default=False,
+        required=False,
+        help="Fetch only the tools installed on UseGalaxy.eu",
+    )
+    prefetch.add_argument(
+        "--biotools-index",
+        action="store_true",
+        default=False,
+        help="Build also the bio.tools index in the cache directory",
+    )
+    prefetch.add_argument(
+        "--bioconda-index",
+        action="store_true",
+        default=False,
+        help="Build also the Bioconda index in the cache directory",
+    )
+    prefetch.add_argument(
+        "--edam-version",
+        action="append",
+        default=[],
+        help="Build also the store of this EDAM version in the edam folder of the cache directory, as extract "
+        "(can be specified multiple times)",
+    )
+
+    for server_parser in (extract, prefetch):
+        server_parser.add_argument(
+            "--server-workers",
+            type=int,
+            default=20,
+            help="Number of parallel requests to fetch the tools installed on the Galaxy servers (default: 20)",
+        )
+        server_parser.add_argument(
+            "--server-max-time",
+            type=float,
+            default=600,
+            help="Time in seconds after which the Galaxy servers that did not answer are considered without any tool; "
+            "running requests end on their own timeout (default: 600)",
+        )
+        server_parser.add_argument(
+            "--cache-dir",
+            default="~/.galaxy_tool_cache",
+            help="Directory to cache the tools installed on the Galaxy servers (default: ~/.galaxy_tool_cache)",
+        )
+        server_parser.add_argument(
+            "--cache-ttl",
+            type=float,
+            default=24,
+            help="Time in hours after which the cached tools of a server are revalidated (default: 24)",
+        )
+
+    # Merge the tools extracted for subsets of the repositories
+    merge = subparser.add_parser("merge", help="Merge the tools extracted for subsets of the repositories")
+    merge.add_argument(
+        "shards",
+        nargs="+",
+        help="Filepaths to JSON with the tools extracted for subsets of the repositories, with the TSV next to them. "
+        "A suite found in several subsets is kept from the first one in path order",
+    )
+    merge.add_argument("--all", "-o", required=True, help="Filepath to JSON with all extracted tools")
+    merge.add_argument("--all-tsv", "-j", required=True, help="Filepath to TSV with all extracted tools")
+    merge.add_argument("--all-yml", "-y", required=True, help="Filepath to yml with all extracted tools")
 
     # Filter tools based on ToolShed categories
     filtertools = subparser.add_parser("filter", help="Filter tools based on ToolShed categories")
@@ -1307,15 +3437,86 @@ if __name__ == "__main__":
                 add_extra_repositories=not args.avoid_extra_repositories,
             )
 
-        edam_ontology = get_ontology("https://edamontology.org/EDAM_1.25.owl").load()
+        edam_ontology = get_edam_index(
+            shared.load_edam_classes(args.edam_version, cache_dir=Path(args.cache_dir), offline=args.offline)
+        )
+        usage_stats = UsageStatsIndex(GALAXY_TOOL_STATS)
+        galaxy_servers = get_galaxy_servers(run_test=args.test)
+        prefetch_installed_tool_ids(
+            galaxy_servers,
+            workers=args.server_workers,
+            max_time=args.server_max_time,
+            cache=ServerToolCache(Path(args.cache_dir).expanduser(), ttl=args.cache_ttl * 3600, offline=args.offline),
+        )
 
         print(f"Cloning repositories into {repo_dir} ...")
+        previous_manifest = load_manifest(Path(args.manifest)) if args.manifest else {}
         clone_depth = None if args.clone_depth == 0 else (args.clone_depth or 1)
-        cloned = clone_repositories(repo_list, repo_dir, depth=clone_depth)
+        clone_report: Dict[str, Dict[str, Any]] = {}
+        cloned = clone_repositories(
+            repo_list,
+            repo_dir,
+            depth=clone_depth,
+            workers=args.clone_workers,
+            timeout=args.clone_timeout,
+            retries=args.clone_retries,
+            report=clone_report,
+            mode=args.clone_mode,
+            # unchanged repositories are reused from the manifest without being fetched
+            previous_heads={url: state["head"] for url, state in previous_manifest.items() if state.get("head")},
+        )
+        workers = args.workers or ((os.cpu_count() or 1) if args.parse_mode == "process" else 1)
+        manifest: Dict[str, Dict[str, Any]] = {}
         tools: List[Dict] = []
         for url, repo_path in cloned:
             print(f"Parsing tools from: {url} ({repo_path})")
-            tools.extend(parse_tools_from_local(repo_path, workers=args.workers, repo_url=url))
+            repo_manifest = None
+            if args.manifest:
+                repo_manifest = manifest[url] = previous_manifest.get(url, {})
+            tools.extend(
+                parse_tools_from_local(
+                    repo_path,
+                    workers=workers,
+                    repo_url=url,
+                    manifest=repo_manifest,
+                    parse_mode=args.parse_mode,
+                    head=clone_report[url].get("head"),
+                )
+            )
+        if args.manifest:
+            save_manifest(manifest, Path(args.manifest))
+        metadata_cache = UrlCache(
+            Path(args.cache_dir).expanduser() / "metadata.sqlite",
+            ttl=args.metadata_cache_ttl * 3600,
+            offline=args.offline,
+        )
+        biotools_index = None
+        if args.biotools_source == "index":
+            try:
+                biotools_index = get_biotools_index(
+                    Path(args.cache_dir).expanduser(),
+                    ttl=args.metadata_cache_ttl * 3600,
+                    offline=args.offline,
+                    workers=args.enrich_workers,
+                )
+            except Exception as ex:
+                print(f"Could not get the bio.tools index ({ex}), using the bio.tools API", file=sys.stderr)
+        bioconda_index = None
+        if args.conda_source == "repodata":
+            try:
+                bioconda_index = get_bioconda_index(
+                    Path(args.cache_dir).expanduser(), ttl=args.metadata_cache_ttl * 3600, offline=args.offline
+                )
+            except Exception as ex:
+                print(f"Could not get the Bioconda index ({ex}), using the Anaconda API", file=sys.stderr)
+        enrich_tools(
+            tools,
+            workers=args.enrich_workers,
+            cache=metadata_cache,
+            biotools_index=biotools_index,
+            bioconda_index=bioconda_index,
+        )
+        metadata_cache.close()
         if args.all_workflows:
             tools = add_workflow_ids_to_tools(tools, args.all_workflows)
         if args.all_tutorials:
@@ -1323,94 +3524,72 @@ if __name__ == "__main__":
         for tool in tools:
             tool.setdefault("Related Workflows", [])
             tool.setdefault("Related Tutorials", [])
+        server_names = list(galaxy_servers)
+        availability = get_tool_availability_index(galaxy_servers)
         for tool in tools:
             tool["EDAM reduced operations"] = reduce_ontology_terms(tool["EDAM operations"], ontology=edam_ontology)
             tool["EDAM reduced topics"] = reduce_ontology_terms(tool["EDAM topics"], ontology=edam_ontology)
-            if args.test:
-                tool["Number of tools on UseGalaxy.eu"] = check_tools_on_servers(
-                    tool["Tool IDs"], USEGALAXY_SERVER_URLS["UseGalaxy.eu"]
-                )
-            else:
-                for name, url in USEGALAXY_SERVER_URLS.items():
-                    tool[f"Number of tools on {name}"] = check_tools_on_servers(tool["Tool IDs"], url)
-                public_servers_df = pd.read_csv(public_servers, sep="\t")
-                for _index, row in public_servers_df.iterrows():
-                    name = row["name"]
-                    if name.lower() not in [n.lower() for n in USEGALAXY_SERVER_URLS.keys()]:
-                        url = row["url"]
-                        tool[f"Number of tools on {name}"] = check_tools_on_servers(tool["Tool IDs"], url)
-            for name, path in GALAXY_TOOL_STATS.items():
-                tool_stats_df = pd.read_csv(path)
-                mode: Literal["sum", "max"]
-                if "Suite users" in name:
-                    mode = "max"
-                else:
-                    mode = "sum"
-                tool[name] = get_tool_stats_from_stats_file(tool_stats_df, tool["Tool IDs"], mode=mode)
-            tool = aggregate_tool_stats(tool, STATS_SUM)
+            for name, count in count_tools_on_servers(tool["Tool IDs"], availability, server_names).items():
+                tool[f"Number of tools on {name}"] = count
+        usage_stats.add_stats_to_tools(tools, STATS_SUM)
 
         export_tools_to_json(tools, args.all)
         export_tools_to_tsv(tools, args.all_tsv, format_list_col=True)
+        export_tools_to_parquet(tools, args.all_tsv)
         export_tools_to_yml(tools, args.all_yml)
 
+    elif args.command == "prefetch":
+        prefetch_installed_tool_ids(
+            get_galaxy_servers(run_test=args.test),
+            workers=args.server_workers,
+            max_time=args.server_max_time,
+            cache=ServerToolCache(Path(args.cache_dir).expanduser(), ttl=args.cache_ttl * 3600),
+        )
+        # best effort: without an index or EDAM store, the extraction builds it again or falls back to the APIs
+        if args.bioconda_index:
+            try:
+                BiocondaIndex(Path(args.cache_dir).expanduser() / "bioconda_index.json.gz").build()
+            except Exception as ex:
+                print(f"Could not build the Bioconda index ({ex})", file=sys.stderr)
+        if args.biotools_index:
+            try:
+                BiotoolsIndex(Path(args.cache_dir).expanduser() / "biotools_index.json.gz").build(
+                    workers=args.server_workers
+                )
+            except Exception as ex:
+                print(f"Could not build the bio.tools index ({ex})", file=sys.stderr)
+        for edam_version in args.edam_version:
+            try:
+                shared.load_edam_classes(edam_version, cache_dir=Path(args.cache_dir))
+            except Exception as ex:
+                print(f"Could not build the store of EDAM {edam_version} ({ex})", file=sys.stderr)
+
+    elif args.command == "merge":
+        report = merge_tool_shards(args.shards, args.all, args.all_tsv, args.all_yml)
+        print(
+            f"Merged {report['tools']} tools from {report['shards']} subsets, "
+            f"{report['duplicates']} duplicated suites resolved"
+        )
+
     elif args.command == "filter":
-        with Path(args.all).open() as f:
-            tools = json.load(f)
+        tools = shared.load_json(args.all)
         # get categories and tools to exclude
         categories = shared.read_file(args.categories)
-        # get status if file provided
-        if args.status and Path(args.status).exists():
-            status = pd.read_csv(args.status, sep="\t").replace(np.nan, None)
-        else:
-            status = pd.DataFrame(columns=["Suite ID", "Suite owner", "Description", "To keep", "Deprecated"])
         # filter tool lists
-        filtered_tools = filter_tools(tools, categories, status)
-        if filtered_tools:
-            export_tools_to_json(filtered_tools, args.filtered)
-            export_tools_to_tsv(
-                filtered_tools,
-                args.status,
-                format_list_col=True,
-                to_keep_columns=["Suite ID", "Suite owner", "Description", "To keep", "Deprecated"],
-            )
-        else:
-            # if there are no ts filtered tools
-            print(f"No tools found for category {args.filtered}")
+        filtered_tools = filter_tools(tools, categories, read_tool_status(args.status))
+        export_filtered_tools(filtered_tools, args.filtered, args.status)
 
     elif args.command == "curate":
-        with Path(args.filtered).open() as f:
-            tools = json.load(f)
-        try:
-            status = pd.read_csv(args.status, sep="\t").replace(np.nan, None)
-        except Exception as ex:
-            print(f"Failed to load tool_status.tsv file with:\n{ex}")
-            print("Not assigning tool status for this community !")
-            status = pd.DataFrame(columns=["Suite ID", "Suite owner", "Description", "To keep", "Deprecated"])
-
-        curated_tools, tools_wo_biotools, tools_with_biotools = curate_tools(tools, status)
-        if curated_tools:
-            export_tools_to_json(curated_tools, args.filtered)
-            export_tools_to_tsv(
-                curated_tools,
-                args.curated,
-                format_list_col=True,
-            )
-            export_tools_to_tsv(
-                tools_wo_biotools,
-                args.wo_biotools,
-                format_list_col=True,
-                to_keep_columns=["Suite ID", "Homepage", "Suite source"],
-            )
-            export_tools_to_tsv(
-                tools_with_biotools,
-                args.w_biotools,
-                format_list_col=True,
-                to_keep_columns=["Suite ID", "bio.tool name", "EDAM operations", "EDAM topics"],
-            )
-            export_tools_to_yml(curated_tools, args.yml)
-        else:
-            # if there are no ts filtered tools
-            print("No tools left after curation")
+        tools = shared.load_json(args.filtered)
+        export_curated_tools(
+            tools,
+            read_tool_status(args.status),
+            args.filtered,
+            args.curated,
+            args.wo_biotools,
+            args.w_biotools,
+            args.yml,
+        )
 
     elif args.command == "popLabSection":
         lab_section = shared.load_yaml(args.lab)
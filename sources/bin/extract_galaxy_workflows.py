@@ -1,6 +1,7 @@
 #!/usr/bin/env python
 
 import argparse
+from pathlib import Path
 from typing import (
     Any,
     Dict,
@@ -459,6 +460,52 @@ class Workflows:
             ruamelyaml().dump(lab_section, lab_f)
 
 
+def read_workflow_status(status_fp: Optional[str]) -> Dict:
+    """
+    Read a workflow status file as a dictionary indexed by workflow link,
+    or get an empty status if missing or not readable
+    """
+    if status_fp and Path(status_fp).exists():
+        try:
+            return pd.read_csv(status_fp, sep="\t", index_col=0).to_dict("index")
+        except Exception as ex:
+            print(f"Failed to load {status_fp} file with:\n{ex}")
+            print("Not assigning workflow status for this community !")
+    return {}
+
+
+def export_filtered_workflows(wfs: Workflows, filtered_fp: str, tsv_filtered_fp: str, status_fp: str) -> None:
+    """
+    Export the workflows filtered for a community and update the workflow status file
+    """
+    shared.export_to_json(wfs.export_workflows_to_dict(), filtered_fp)
+    wfs.export_workflows_to_tsv(tsv_filtered_fp)
+    wfs.export_workflows_to_tsv(
+        status_fp,
+        to_keep_columns=[
+            "Link",
+            "Name",
+            "Source",
+            "Projects",
+            "Creators",
+            "Creation time",
+            "Update time",
+            "To keep",
+            "Deprecated",
+        ],
+    )
+
+
+def export_curated_workflows(wfs: Workflows, status: Dict, curated_fp: str, tsv_curated_fp: str, yml_fp: str) -> None:
+    """
+    Curate the workflows filtered for a community and export them
+    """
+    wfs.curate_workflows(status)
+    shared.export_to_json(wfs.export_workflows_to_dict(), curated_fp)
+    wfs.export_workflows_to_tsv(tsv_curated_fp)
+    shared.export_to_yml(wfs.export_workflows_to_dict(), yml_fp)
+
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Extract Galaxy Workflows from WorkflowHub and public servers")
     subparser = parser.add_subparsers(dest="command")
@@ -565,45 +612,13 @@ if __name__ == "__main__":
         wfs = Workflows()
         wfs.init_by_importing(wfs=shared.load_json(args.all))
         tags = shared.load_yaml(args.tags)
-        # get status if file provided
-        if args.status:
-            try:
-                status = pd.read_csv(args.status, sep="\t", index_col=0).to_dict("index")
-            except Exception:
-                status = {}
-        else:
-            status = {}
-        wfs.filter_workflows_by_tags(tags, status)
-        shared.export_to_json(wfs.export_workflows_to_dict(), args.filtered)
-        wfs.export_workflows_to_tsv(args.tsv_filtered)
-        wfs.export_workflows_to_tsv(
-            args.status,
-            to_keep_columns=[
-                "Link",
-                "Name",
-                "Source",
-                "Projects",
-                "Creators",
-                "Creation time",
-                "Update time",
-                "To keep",
-                "Deprecated",
-            ],
-        )
+        wfs.filter_workflows_by_tags(tags, read_workflow_status(args.status))
+        export_filtered_workflows(wfs, args.filtered, args.tsv_filtered, args.status)
 
     elif args.command == "curate":
         wfs = Workflows()
         wfs.init_by_importing(wfs=shared.load_json(args.filtered))
-        try:
-            status = pd.read_csv(args.status, sep="\t", index_col=0).to_dict("index")
-        except Exception as ex:
-            print(f"Failed to load {args.status} file with:\n{ex}")
-            print("Not assigning tool status for this community !")
-            status = {}
-        wfs.curate_workflows(status)
-        shared.export_to_json(wfs.export_workflows_to_dict(), args.curated)
-        wfs.export_workflows_to_tsv(args.tsv_curated)
-        shared.export_to_yml(wfs.export_workflows_to_dict(), args.yml)
+        export_curated_workflows(wfs, read_workflow_status(args.status), args.curated, args.tsv_curated, args.yml)
 
     elif args.command == "popLabSection":
         wfs = Workflows()
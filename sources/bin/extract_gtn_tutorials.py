@@ -3,6 +3,7 @@
 import argparse
 import time
 from datetime import date
+from pathlib import Path
 from typing import (
     Any,
     Dict,
@@ -13,7 +14,6 @@ from typing import (
 import pandas as pd
 import shared
 import yt_dlp
-from owlready2 import get_ontology
 from ruamel.yaml import YAML as ruamelyaml
 
 PLAUSIBLE_REQUEST_NB = 0
@@ -44,12 +44,14 @@ def get_short_tool_ids(tuto: dict) -> None:
 def get_edam_topics(tuto: dict, edam_ontology: dict) -> None:
     """
     Get EDAM topics instead of EDAM ids
+
+    :param edam_ontology: labels per EDAM class name (e.g. topic_0622)
     """
     tuto["edam_topic"] = []
     if "edam_ontology" in tuto:
         for term in tuto["edam_ontology"]:
-            if "topic" in term and edam_ontology[term]:
-                tuto["edam_topic"] += edam_ontology[term].label
+            if "topic" in term and edam_ontology.get(term):
+                tuto["edam_topic"] += edam_ontology[term]
 
 
 def get_edam_operations(tuto: dict, tools: dict) -> None:
@@ -178,13 +180,15 @@ def get_tutorials(
     tool_fp: str,
     plausible_api: str,
     run_test: bool,
+    edam_version: str = "unstable",
+    cache_dir: Path = shared.DEFAULT_CACHE_DIR,
 ) -> List[Dict]:
     """
     Extract training material from the GTN API, format them, extract EDAM operations from tools, feedback stats, view stats, etc
     """
     tools = shared.read_suite_per_tool_id(tool_fp)
     feedback = get_feedback_per_tutorials()
-    edam_ontology = get_ontology("https://edamontology.org/EDAM_unstable.owl").load()
+    edam_ontology = {cla["name"]: cla["labels"] for cla in shared.load_edam_classes(edam_version, cache_dir=cache_dir)}
     topics = shared.get_request_json("https://training.galaxyproject.org/training-material/api/topics.json", {})
     if run_test:
         topics = {"microbiome": topics["microbiome"]}
@@ -297,6 +301,14 @@ def export_tutorials_to_tsv(tutorials: list, output_fp: str) -> None:
     df.to_csv(output_fp, sep="\t", index=False)
 
 
+def export_filtered_tutorials(tutorials: list, output_fp: str, yml_fp: str) -> None:
+    """
+    Export tutorials filtered for a community to TSV and YAML files
+    """
+    export_tutorials_to_tsv(tutorials, output_fp)
+    shared.export_to_yml(tutorials, yml_fp)
+
+
 def extract_top_tutorials_per_category(
     tutorial_fp: str, count_column: str = "Visitors", category_nb: int = 10, top_tutorial_nb: int = 10
 ) -> pd.DataFrame:
@@ -412,6 +424,16 @@ if __name__ == "__main__":
         required=False,
         help="Run a small test case only on one topic",
     )
+    extract.add_argument(
+        "--edam-version",
+        default="unstable",
+        help="EDAM version used to get the EDAM topic labels, stored once in the edam folder of the cache directory (default: unstable)",
+    )
+    extract.add_argument(
+        "--cache-dir",
+        default="~/.galaxy_tool_cache",
+        help="Cache directory with the EDAM store, shared with extract_galaxy_tools.py (default: ~/.galaxy_tool_cache)",
+    )
 
     # Filter tutorials
     filtertuto = subparser.add_parser("filter", help="Filter training materials based on their tags")
@@ -456,7 +478,9 @@ if __name__ == "__main__":
     args = parser.parse_args()
 
     if args.command == "extract":
-        tutorials = get_tutorials(args.tools, args.api, args.test)
+        tutorials = get_tutorials(
+            args.tools, args.api, args.test, edam_version=args.edam_version, cache_dir=Path(args.cache_dir)
+        )
         shared.export_to_json(tutorials, args.all)
 
     elif args.command == "filter":
@@ -465,8 +489,7 @@ if __name__ == "__main__":
         tags = shared.read_file(args.tags) if args.tags else None
         # filter training lists
         filtered_tutorials = filter_tutorials(all_tutorials, tags)
-        export_tutorials_to_tsv(filtered_tutorials, args.filtered)
-        shared.export_to_yml(filtered_tutorials, args.yml)
+        export_filtered_tutorials(filtered_tutorials, args.filtered, args.yml)
 
     elif args.command == "popLabSection":
         lab_section = shared.load_yaml(args.lab)
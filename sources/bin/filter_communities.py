@@ -0,0 +1,312 @@
+#!/usr/bin/env python
+
+import argparse
+import copy
+from collections import defaultdict
+from pathlib import Path
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Set,
+)
+
+import extract_galaxy_tools
+import extract_galaxy_workflows
+import extract_gtn_tutorials
+import shared
+
+
+def get_communities(communities_dir: Path, names: Optional[List[str]] = None) -> List[str]:
+    """
+    Get the communities with a metadata folder, except "all"
+
+    :param communities_dir: folder with one folder per community
+    :param names: communities to keep, all if None
+    """
+    return sorted(
+        fp.name
+        for fp in communities_dir.iterdir()
+        if fp.is_dir()
+        and not fp.is_symlink()
+        and fp.name != "all"
+        and (fp / "metadata").is_dir()
+        and (names is None or fp.name in names)
+    )
+
+
+def build_inverted_index(values_per_community: Dict[str, List[str]]) -> Dict[str, Set[str]]:
+    """
+    Build an index of the communities per value (e.g. ToolShed category or tag)
+
+    :param values_per_community: values per community
+    """
+    index: Dict[str, Set[str]] = defaultdict(set)
+    for community, values in values_per_community.items():
+        for value in values:
+            index[value].add(community)
+    return index
+
+
+def match_communities(values: Iterable[str], index: Dict[str, Set[str]], match_all: Set[str]) -> Set[str]:
+    """
+    Get the communities with at least one of the values
+
+    :param values: values of an item (e.g. ToolShed categories or tags)
+    :param index: communities per value, from build_inverted_index
+    :param match_all: communities matching all items (e.g. without any category or tag)
+    """
+    communities = set(match_all)
+    for value in values:
+        communities.update(index.get(value, ()))
+    return communities
+
+
+def route_items(items: Iterable[Any], get_communities: Callable[[Any], Iterable[str]]) -> Dict[str, List[Any]]:
+    """
+    Route each item to all its communities, in one pass over the items.
+    The items keep their order in each community.
+
+    :param items: items to route
+    :param get_communities: function returning the communities of an item
+    """
+    routed: Dict[str, List[Any]] = defaultdict(list)
+    for item in items:
+        for community in get_communities(item):
+            routed[community].append(item)
+    return routed
+
+
+def route_tools(tools: List[Dict], categories: Dict[str, List[str]]) -> Dict[str, List[Dict]]:
+    """
+    Route tools to the communities with at least one of their ToolShed categories
+    (see extract_galaxy_tools.check_categories)
+
+    :param tools: tools with their metadata
+    :param categories: ToolShed categories per community
+    """
+    index = build_inverted_index(categories)
+    match_all = {community for community, community_categories in categories.items() if not community_categories}
+    return route_items(tools, lambda tool: match_communities(tool["ToolShed categories"] or (), index, match_all))
+
+
+def route_workflows(
+    workflows: List[extract_galaxy_workflows.Workflow], tags: Dict[str, Dict[str, List[str]]]
+) -> Dict[str, List[extract_galaxy_workflows.Workflow]]:
+    """
+    Route workflows to the communities with at least one tag of the workflow source in the workflow tags
+    or in the workflow name (see extract_galaxy_workflows.Workflow.test_tags and test_name)
+
+    :param workflows: workflows
+    :param tags: workflow tags per source (workflowhub or public) per community
+    """
+    indexes = {
+        source: build_inverted_index(
+            {community: community_tags.get(source) or [] for community, community_tags in tags.items()}
+        )
+        for source in ("workflowhub", "public")
+    }
+
+    def get_communities(wf: extract_galaxy_workflows.Workflow) -> Set[str]:
+        index = indexes["workflowhub" if "WorkflowHub" in wf.source else "public"]
+        # tags found in the name are tested once for all communities
+        values = [tag for tag in wf.tags if tag in index] + [tag for tag in index if tag in wf.name]
+        return match_communities(values, index, set())
+
+    return route_items(workflows, get_communities)
+
+
+def route_tutorials(tutorials: List[Dict], tags: Dict[str, List[str]]) -> Dict[str, List[Dict]]:
+    """
+    Route tutorials to the communities with at least one of their tags (see extract_gtn_tutorials.filter_tutorials)
+
+    :param tutorials: tutorials
+    :param tags: tutorial tags per community
+    """
+    index = build_inverted_index(tags)
+    match_all = {community for community, community_tags in tags.items() if not community_tags}
+    return route_items(tutorials, lambda tuto: match_communities(tuto.get("tags") or (), index, match_all))
+
+
+def filter_community_tools(tools: List[Dict], community_dir: Path) -> None:
+    """
+    Write the filtered and curated tools of a community, as the filter and curate commands of extract_galaxy_tools
+
+    :param tools: tools routed to the community
+    :param community_dir: folder of the community
+    """
+    resources_dir = community_dir / "resources"
+    status_fp = str(community_dir / "metadata" / "tool_status.tsv")
+    filtered_fp = str(resources_dir / "tools_filtered_by_ts_categories.json")
+    status_index = extract_galaxy_tools.get_status_index(extract_galaxy_tools.read_tool_status(status_fp))
+    # copies as the status and exported fields differ between communities
+    tools = [dict(tool) for tool in tools]
+    for tool in tools:
+        extract_galaxy_tools.add_status(tool, status_index)
+    extract_galaxy_tools.export_filtered_tools(tools, filtered_fp, status_fp)
+    if Path(status_fp).exists():
+        # the status file is updated with the filtered tools
+        extract_galaxy_tools.export_curated_tools(
+            tools,
+            extract_galaxy_tools.read_tool_status(status_fp),
+            filtered_fp,
+            str(resources_dir / "curated_tools.tsv"),
+            str(resources_dir / "curated_tools_wo_biotools.tsv"),
+            str(resources_dir / "curated_tools_w_biotools.tsv"),
+            str(resources_dir / "curated_tools.yml"),
+        )
+
+
+def filter_community_workflows(workflows: List[extract_galaxy_workflows.Workflow], community_dir: Path) -> None:
+    """
+    Write the filtered and curated workflows of a community,
+    as the filter and curate commands of extract_galaxy_workflows
+
+    :param workflows: workflows routed to the community
+    :param community_dir: folder of the community
+    """
+    if not workflows:
+        print(f"No workflows found for {community_dir.name}")
+        return
+    resources_dir = community_dir / "resources"
+    status_fp = str(community_dir / "metadata" / "workflow_status.tsv")
+    status = extract_galaxy_workflows.read_workflow_status(status_fp)
+    wfs = extract_galaxy_workflows.Workflows()
+    # copies as the status differ between communities
+    wfs.workflows = [copy.copy(wf) for wf in workflows]
+    for wf in wfs.workflows:
+        if wf.link in status:
+            wf.update_status(status[wf.link])
+    extract_galaxy_workflows.export_filtered_workflows(
+        wfs,
+        str(resources_dir / "tag_filtered_workflows.json"),
+        str(resources_dir / "tag_filtered_workflows.tsv"),
+        status_fp,
+    )
+    if Path(status_fp).exists():
+        extract_galaxy_workflows.export_curated_workflows(
+            wfs,
+            extract_galaxy_workflows.read_workflow_status(status_fp),
+            str(resources_dir / "curated_workflows.json"),
+            str(resources_dir / "curated_workflows.tsv"),
+            str(resources_dir / "curated_workflows.yml"),
+        )
+
+
+def filter_community_tutorials(tutorials: List[Dict], community_dir: Path) -> None:
+    """
+    Write the filtered tutorials of a community, as the filter command of extract_gtn_tutorials
+
+    :param tutorials: tutorials routed to the community
+    :param community_dir: folder of the community
+    """
+    if not tutorials:
+        print(f"No tutorials found for {community_dir.name}")
+        return
+    resources_dir = community_dir / "resources"
+    extract_gtn_tutorials.export_filtered_tutorials(
+        tutorials, str(resources_dir / "tutorials.tsv"), str(resources_dir / "tutorials.yml")
+    )
+
+
+def filter_communities(
+    communities_dir: Path,
+    communities: List[str],
+    tools_fp: Optional[str],
+    workflows_fp: Optional[str],
+    tutorials_fp: Optional[str],
+) -> None:
+    """
+    Filter the tools, workflows and tutorials of all communities, loading and routing each catalogue once
+
+    :param communities_dir: folder with one folder per community
+    :param communities: communities to filter
+    :param tools_fp: path to the JSON file with all tools, not filtered if None
+    :param workflows_fp: path to the JSON file with all workflows, not filtered if None
+    :param tutorials_fp: path to the JSON file with all tutorials, not filtered if None
+    """
+    metadata_dirs = {community: communities_dir / community / "metadata" for community in communities}
+    for community in communities:
+        (communities_dir / community / "resources").mkdir(parents=True, exist_ok=True)
+
+    if tools_fp:
+        categories = {
+            community: shared.read_file(str(metadata_dir / "categories"))
+            for community, metadata_dir in metadata_dirs.items()
+            if (metadata_dir / "categories").is_file()
+        }
+        routed_tools = route_tools(shared.load_json(tools_fp), categories)
+        for community in categories:
+            print(f"{community}: {len(routed_tools[community])} tools")
+            filter_community_tools(routed_tools[community], communities_dir / community)
+
+    if workflows_fp:
+        workflow_tags = {
+            community: shared.load_yaml(str(metadata_dir / "workflow_tags"))
+            for community, metadata_dir in metadata_dirs.items()
+            if (metadata_dir / "workflow_tags").is_file()
+        }
+        wfs = extract_galaxy_workflows.Workflows()
+        wfs.init_by_importing(wfs=shared.load_json(workflows_fp))
+        routed_workflows = route_workflows(wfs.workflows, workflow_tags)
+        for community in workflow_tags:
+            print(f"{community}: {len(routed_workflows[community])} workflows")
+            filter_community_workflows(routed_workflows[community], communities_dir / community)
+
+    if tutorials_fp:
+        tutorial_tags = {
+            community: shared.read_file(str(metadata_dir / "tutorial_tags"))
+            for community, metadata_dir in metadata_dirs.items()
+            if (metadata_dir / "tutorial_tags").is_file()
+        }
+        all_tutorials = shared.load_json(tutorials_fp)
+        if isinstance(all_tutorials, dict):
+            all_tutorials = list(all_tutorials.values())
+        routed_tutorials = route_tutorials(all_tutorials, tutorial_tags)
+        for community in tutorial_tags:
+            print(f"{community}: {len(routed_tutorials[community])} tutorials")
+            filter_community_tutorials(routed_tutorials[community], communities_dir / community)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Filter the tools, workflows and tutorials of all communities in a single pass over each catalogue"
+    )
+    parser.add_argument(
+        "--communities-dir",
+        default="communities",
+        help="Folder with one folder per community, with their metadata (default: communities)",
+    )
+    parser.add_argument(
+        "--community",
+        action="append",
+        help="Filter only this community (can be specified multiple times, default: all communities)",
+    )
+    parser.add_argument(
+        "--tools",
+        default="communities/all/resources/tools.json",
+        help="Path to the JSON file with all tools, or empty string to not filter the tools",
+    )
+    parser.add_argument(
+        "--workflows",
+        default="communities/all/resources/workflows.json",
+        help="Path to the JSON file with all workflows, or empty string to not filter the workflows",
+    )
+    parser.add_argument(
+        "--tutorials",
+        default="communities/all/resources/tutorials.json",
+        help="Path to the JSON file with all tutorials, or empty string to not filter the tutorials",
+    )
+    args = parser.parse_args()
+
+    communities_dir = Path(args.communities_dir)
+    filter_communities(
+        communities_dir,
+        get_communities(communities_dir, args.community),
+        args.tools,
+        args.workflows,
+        args.tutorials,
+    )
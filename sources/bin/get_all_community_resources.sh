@@ -0,0 +1,66 @@
+#!/usr/bin/env bash
+
+# stop on error
+set -e
+
+# filter the tools, workflows and tutorials of all communities, loading each catalogue once
+if [[ ! -z $1  && $1 == "test" ]]; then
+        python sources/bin/filter_communities.py \
+                --community microgalaxy \
+                --tools "communities/all/resources/test_tools.json" \
+                --workflows "communities/all/resources/test_workflows.json" \
+                --tutorials "communities/all/resources/test_tutorials.json"
+else
+        python sources/bin/filter_communities.py \
+                --tools "communities/all/resources/tools.json" \
+                --workflows "communities/all/resources/workflows.json" \
+                --tutorials "communities/all/resources/tutorials.json"
+fi;
+
+for com_data_fp in communities/* ; do
+        if [[ -d "$com_data_fp" && ! -L "$com_data_fp" ]]; then
+                COMMUNITY=`basename "$com_data_fp"`
+
+                if [[ "$COMMUNITY" == "all" || ( ! -z $1  && $1 == "test" && "$COMMUNITY" != "microgalaxy" ) ]]; then
+                        continue
+                fi;
+
+                if [[ -e "communities/$COMMUNITY/resources/curated_tools.yml" ]]; then
+                        mkdir -p _data/communities/$COMMUNITY/
+                        ln -sf ../../../communities/$COMMUNITY/resources/curated_tools.yml _data/communities/$COMMUNITY/curated_tools.yml
+                fi;
+
+                if [[ -f "communities/$COMMUNITY/metadata/categories" && -e "communities/$COMMUNITY/resources/curated_tools.tsv" ]]; then
+                        python sources/bin/create_wordcloud.py \
+                                --input "communities/$COMMUNITY/resources/curated_tools.tsv" \
+                                --name-col "Suite ID" \
+                                --stat-col "Suite runs (last 5 years) on main servers" \
+                                --wordcloud_mask "sources/data/usage_stats/wordcloud_mask.png" \
+                                --output "communities/$COMMUNITY/resources/tools_wordcloud.png"
+
+                        python sources/bin/create_interactive_table.py \
+                                --input "communities/$COMMUNITY/resources/curated_tools.tsv" \
+                                --template "sources/data/interactive_table_template.html" \
+                                --output "communities/$COMMUNITY/resources/tools.html"
+                fi;
+
+                if [[ -f "communities/$COMMUNITY/metadata/workflow_tags" && -e "communities/$COMMUNITY/resources/curated_workflows.tsv" ]]; then
+                        python sources/bin/create_interactive_table.py \
+                                --input "communities/$COMMUNITY/resources/curated_workflows.tsv" \
+                                --template "sources/data/interactive_table_template.html" \
+                                --output "communities/$COMMUNITY/resources/workflows.html"
+                fi;
+
+                if [[ -e "communities/$COMMUNITY/resources/tutorials.yml" ]]; then
+                        mkdir -p _data/communities/$COMMUNITY/
+                        ln -sf ../../../communities/$COMMUNITY/resources/tutorials.yml _data/communities/$COMMUNITY/tutorials.yml
+                fi;
+
+                if [[ -f "communities/$COMMUNITY/metadata/tutorial_tags" && -e "communities/$COMMUNITY/resources/tutorials.tsv" ]]; then
+                        python sources/bin/create_interactive_table.py \
+                                --input "communities/$COMMUNITY/resources/tutorials.tsv" \
+                                --template "sources/data/interactive_table_template.html" \
+                                --output "communities/$COMMUNITY/resources/tutorials.html"
+                fi;
+        fi;
+done
@@ -1,16 +1,31 @@
 #!/usr/bin/env python
 
+import gzip
+import hashlib
 import json
+import os
+import re
 import time
-from datetime import datetime
+from datetime import (
+    date,
+    datetime,
+)
 from pathlib import Path
 from typing import (
     Any,
+    Callable,
     Dict,
+    Iterable,
+    Iterator,
     List,
     Optional,
+    Set,
+    TextIO,
+    Tuple,
+    Union,
 )
 
+import numpy as np
 import pandas as pd
 import requests
 import yaml
@@ -18,6 +33,17 @@ from github.ContentFile import ContentFile
 from github.Repository import Repository
 from requests.exceptions import ConnectionError
 
+# cache of the server tool lists, Bioconda and bio.tools indexes and EDAM store
+DEFAULT_CACHE_DIR = Path("~/.galaxy_tool_cache")
+# key of the hash of the TSV file in the metadata of the Parquet file written next to it
+PARQUET_TSV_HASH_KEY = b"tsv_sha256"
+
+# libyaml (C) loader and emitter if PyYAML was built with it
+YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+YAML_DUMPER = getattr(yaml, "CSafeDumper", None)
+LIBYAML_UNSAFE_CHAR = re.compile(r"[^\x20-\x7e]")
+LIBYAML_SCALAR_TYPES = (type(None), bool, int, float, date, datetime)
+
 
 def get_first_commit_for_folder(tool: ContentFile, repo: Repository) -> str:
     """
@@ -45,6 +71,113 @@ def format_list_column(col: pd.Series) -> pd.Series:
     return col.apply(lambda x: ", ".join(str(i) for i in x))
 
 
+def get_parquet_path(tsv_path: str) -> Path:
+    """
+    Get the path of the Parquet file written next to a TSV file
+
+    :param tsv_path: path to the TSV file
+    """
+    return Path(tsv_path).with_suffix(".parquet")
+
+
+def get_file_hash(path: Path) -> str:
+    """
+    Get the SHA-256 hash of the content of a file
+
+    :param path: path to the file
+    """
+    digest = hashlib.sha256()
+    with path.open("rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def write_parquet(df: Any, tsv_path: str) -> None:
+    """
+    Write a table to the Parquet file next to its TSV file, with the hash of the TSV file in the Parquet metadata.
+    The TSV file must be written first.
+
+    :param df: table written in the TSV file, with native list columns, as pandas DataFrame or pyarrow Table
+    :param tsv_path: path to the TSV file
+    """
+    import pyarrow as pa
+
+    table = df if isinstance(df, pa.Table) else pa.Table.from_pandas(df, preserve_index=False)
+    with open_parquet_writer(table.schema, tsv_path) as writer:
+        writer.write_table(table)
+
+
+def open_parquet_writer(schema: Any, tsv_path: str) -> Any:
+    """
+    Open a writer of the Parquet file next to a TSV file, with the hash of the TSV file in the Parquet metadata,
+    to write a table by parts (see write_parquet). The TSV file must be written first.
+
+    :param schema: pyarrow schema of the table
+    :param tsv_path: path to the TSV file
+    :return: pyarrow ParquetWriter, to be closed
+    """
+    import pyarrow.parquet as pq
+
+    metadata = {**(schema.metadata or {}), PARQUET_TSV_HASH_KEY: get_file_hash(Path(tsv_path)).encode()}
+    return pq.ParquetWriter(get_parquet_path(tsv_path), schema.with_metadata(metadata))
+
+
+def is_parquet_current(tsv_path: str) -> bool:
+    """
+    Check if the Parquet file next to a TSV file has the same content: it exists and, if the TSV file exists,
+    it was written from the current TSV file (see write_parquet)
+
+    :param tsv_path: path to the TSV file
+    """
+    parquet_path = get_parquet_path(tsv_path)
+    if not parquet_path.exists():
+        return False
+    if not Path(tsv_path).exists():
+        return True
+    import pyarrow.parquet as pq
+
+    metadata = pq.read_schema(parquet_path).metadata or {}
+    return metadata.get(PARQUET_TSV_HASH_KEY) == get_file_hash(Path(tsv_path)).encode()
+
+
+def read_table(
+    tsv_path: str,
+    columns: Optional[Union[List[str], Callable[[str], bool]]] = None,
+    list_columns: Optional[List[str]] = None,
+) -> pd.DataFrame:
+    """
+    Read a table from the Parquet file next to the TSV file when it was written from the current TSV file
+    (see is_parquet_current), with native list columns, or from the TSV file with the list columns split.
+    List columns are returned as lists (empty if missing) in both cases.
+
+    :param tsv_path: path to the TSV file
+    :param columns: columns to load if present in the table, or function selecting them by name; all if None
+    :param list_columns: comma-separated columns in the TSV file
+    """
+    keep = (lambda col: col in columns) if isinstance(columns, list) else columns
+    parquet_path = get_parquet_path(tsv_path)
+    if is_parquet_current(tsv_path):
+        names = None
+        if keep is not None:
+            import pyarrow.parquet as pq
+
+            names = [name for name in pq.read_schema(parquet_path).names if keep(name)]
+        df = pd.read_parquet(parquet_path, columns=names)
+        for col in df.columns:
+            if df[col].dtype == object and df[col].map(lambda value: isinstance(value, np.ndarray)).any():
+                df[col] = df[col].map(lambda value: list(value) if value is not None else [])
+        return df
+
+    df = pd.read_csv(tsv_path, sep="\t", usecols=keep)
+    for col in list_columns or []:
+        if col in df:
+            df[col] = df[col].map(
+                lambda value: [v.strip() for v in value.split(",")] if isinstance(value, str) and value else []
+            )
+    return df
+
+
 def read_file(filepath: Optional[str]) -> List[str]:
     """
     Read an optional file with 1 element per line
@@ -61,38 +194,246 @@ def read_file(filepath: Optional[str]) -> List[str]:
         return []
 
 
-def export_to_json(data: List[Dict], output_fp: str) -> None:
+def write_json_list(items: Iterable[Any], f: TextIO, **kwargs: Any) -> None:
+    """
+    Write a list to a JSON file item per item, as json.dump(list(items), f, indent=4, **kwargs)
+    without holding the encoded list in memory
+
+    :param items: items of the list
+    :param f: output file
+    :param kwargs: other arguments of json.dumps (e.g. sort_keys, default)
+    """
+    empty = True
+    for item in items:
+        # strings are escaped in JSON so the only line breaks are between the values
+        encoded = json.dumps(item, indent=4, **kwargs).replace("\n", "\n    ")
+        f.write(f"{'[' if empty else ','}\n    {encoded}")
+        empty = False
+    f.write("[]" if empty else "\n]")
+
+
+def export_to_json(data: Union[List[Dict], Dict], output_fp: str) -> None:
     """
     Export to a JSON file
     """
     with Path(output_fp).open("w") as f:
-        json.dump(data, f, indent=4, sort_keys=True)
+        if isinstance(data, list):
+            write_json_list(data, f, sort_keys=True)
+        else:
+            f.write(json.dumps(data, indent=4, sort_keys=True))
+
+
+def loads_json(content: Union[str, bytes]) -> Any:
+    """
+    Decode a JSON document, with orjson if installed
+    """
+    try:
+        import orjson
+    except ImportError:
+        return json.loads(content)
+    try:
+        return orjson.loads(content)
+    except orjson.JSONDecodeError:
+        # e.g. NaN or integers larger than 64 bits, accepted by json
+        return json.loads(content)
 
 
 def load_json(input_df: str) -> Any:
     """
     Read a JSON file
     """
-    with Path(input_df).open("r") as t:
-        content = json.load(t)
+    with Path(input_df).open("rb") as t:
+        content = loads_json(t.read())
     return content
 
 
+class JsonStreamParser:
+    """
+    Parser of a JSON document read by successive parts, decoding its values one by one,
+    to iterate over large arrays or objects without holding the document in memory
+    """
+
+    def __init__(self, chunks: Iterable[str], name: str = "JSON document") -> None:
+        """
+        :param chunks: successive parts of the JSON text
+        :param name: name of the document in the error messages
+        """
+        self.chunks = iter(chunks)
+        self.name = name
+        self.decoder = json.JSONDecoder()
+        self.buf = ""
+        self.pos = 0
+        self.exhausted = False
+
+    def _more(self) -> None:
+        try:
+            chunk = next(self.chunks)
+        except StopIteration:
+            if self.exhausted:
+                raise ValueError(f"Truncated {self.name}") from None
+            self.exhausted = True
+            return
+        self.buf = self.buf[self.pos :] + chunk
+        self.pos = 0
+
+    def peek(self, separators: str = "") -> str:
+        """
+        Skip the whitespace and the given separators, and return the next character
+        """
+        while True:
+            while self.pos < len(self.buf) and (self.buf[self.pos].isspace() or self.buf[self.pos] in separators):
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            self._more()
+
+    def expect(self, char: str) -> None:
+        """
+        Skip the next character, after the whitespace, which must be the given one
+        """
+        if self.peek() != char:
+            raise ValueError(f"Invalid {self.name}: expected '{char}'")
+        self.pos += 1
+
+    def decode(self) -> Any:
+        """
+        Decode the next value
+        """
+        self.peek()
+        while True:
+            # a value is complete only when followed by another character (e.g. "12" could be the start of "123")
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+                if end < len(self.buf) or self.exhausted:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.exhausted:
+                    raise
+            self._more()
+
+    def iter_array(self) -> Iterator[Any]:
+        """
+        Iterate over the items of the next value, which must be an array
+        """
+        self.expect("[")
+        while self.peek(",") != "]":
+            yield self.decode()
+        self.pos += 1
+
+    def iter_object_keys(self) -> Iterator[str]:
+        """
+        Iterate over the keys of the next value, which must be an object.
+        The value of each key must be read (e.g. with decode) before getting the next key.
+        """
+        self.expect("{")
+        while self.peek(",") != "}":
+            key = self.decode()
+            self.expect(":")
+            yield key
+        self.pos += 1
+
+
+def iter_json_array(f: TextIO, chunk_size: int = 1 << 16) -> Iterator[Any]:
+    """
+    Iterate over the items of a JSON array file, reading it by chunks without holding it in memory
+
+    :param f: file with a JSON array
+    :param chunk_size: number of characters read at once
+    """
+    return JsonStreamParser(iter(lambda: f.read(chunk_size), ""), name=f.name).iter_array()
+
+
 def load_yaml(input_df: str) -> Dict:
     """
     Read a YAML file
     """
     with Path(input_df).open("r") as t:
-        content = yaml.safe_load(t)
+        content = yaml.load(t, Loader=YAML_LOADER)
     return content
 
 
+def check_libyaml_dump(data: Any, seen: Set[int]) -> Tuple[bool, bool]:
+    """
+    Check if the libyaml emitter dumps data as the pure Python emitter of yaml.dump, i.e. if data has only
+    basic types, strings of printable ASCII characters and no empty string keys (they are folded or quoted differently)
+
+    :param data: data to dump
+    :param seen: ids of the lists and dicts already checked, updated with the ones of data
+    :return: if libyaml can dump data, and if data shares a list or dict with the data already checked
+    """
+    compatible = True
+    shared = False
+    stack = [data]
+    while stack:
+        value = stack.pop()
+        if type(value) is str:
+            compatible = compatible and not LIBYAML_UNSAFE_CHAR.search(value)
+        elif type(value) in (dict, list):
+            if id(value) in seen:
+                shared = True
+                continue
+            seen.add(id(value))
+            if type(value) is dict:
+                compatible = compatible and "" not in value
+                stack.extend(value.keys())
+                stack.extend(value.values())
+            else:
+                stack.extend(value)
+        elif type(value) not in LIBYAML_SCALAR_TYPES:
+            # e.g. tuples are represented as lists by the safe representer
+            compatible = False
+    return compatible, shared
+
+
+def dump_yaml_document(data: Any, libyaml: bool) -> str:
+    """
+    Dump a YAML document with the libyaml emitter if possible, with the pure Python emitter otherwise
+    """
+    if libyaml and YAML_DUMPER is not None:
+        return yaml.dump(data, Dumper=YAML_DUMPER, default_flow_style=False)
+    return yaml.dump(data, default_flow_style=False)
+
+
+def dump_yaml(data: Any) -> str:
+    """
+    Dump to a YAML string, as yaml.dump(data, default_flow_style=False) but faster:
+    the items of a list are dumped one by one, with the libyaml emitter when it gives the same output.
+    """
+    if not isinstance(data, (dict, list)):
+        return dump_yaml_document(data, False)
+    seen: Set[int] = set()
+    if isinstance(data, dict):
+        return dump_yaml_document(data, check_libyaml_dump(data, seen)[0])
+    checks = [check_libyaml_dump(item, seen) for item in data]
+    if not data or any(shared for _, shared in checks):
+        # objects shared between items are dumped as anchors and aliases across items
+        return dump_yaml_document(data, all(compatible for compatible, _ in checks))
+    return "".join(dump_yaml_document([item], compatible) for item, (compatible, _) in zip(data, checks))
+
+
+def write_yaml_list(items: Iterable[Any], f: TextIO) -> None:
+    """
+    Write a list to a YAML file item per item, as yaml.dump(list(items), f, default_flow_style=False)
+    for items without shared objects
+
+    :param items: items of the list
+    :param f: output file
+    """
+    empty = True
+    for item in items:
+        f.write(dump_yaml([item]))
+        empty = False
+    if empty:
+        f.write(dump_yaml([]))
+
+
 def export_to_yml(data: list, yml_output_path: str) -> None:
     """
     Export to YAML file
     """
     with Path(yml_output_path).open("w") as file:
-        yaml.dump(data, file, default_flow_style=False)
+        file.write(dump_yaml(data))
 
 
 def read_suite_per_tool_id(tool_fp: str) -> Dict:
@@ -177,3 +518,57 @@ def get_edam_operation_from_tools(selected_tools: list, all_tools: dict) -> List
         else:
             print(f"{t} not found in all tools")
     return list(edam_operation)
+
+
+def get_edam_classes(ontology: Any) -> List[Dict[str, Any]]:
+    """
+    Get the classes of an ontology loaded with owlready2, with their name (e.g. topic_0622),
+    labels and the indexes of their parent classes in the list
+
+    :param ontology: ontology
+    """
+    ontology_classes = list(ontology.classes())
+    class_ids = {cla: class_id for class_id, cla in enumerate(ontology_classes)}
+    return [
+        {
+            "name": cla.name,
+            "labels": [str(label) for label in cla.label],
+            "parents": [class_ids[parent] for parent in cla.is_a if parent in class_ids],
+        }
+        for cla in ontology_classes
+    ]
+
+
+def load_edam_classes(
+    version: str, cache_dir: Path = DEFAULT_CACHE_DIR, offline: bool = False, max_age: float = 7 * 24 * 3600
+) -> List[Dict[str, Any]]:
+    """
+    Load the classes of an EDAM version (see get_edam_classes) from the on-disk store in the edam folder
+    of the cache directory, which is built from the EDAM OWL file if missing.
+    The "unstable" version is built again when older than max_age.
+
+    :param version: EDAM version, e.g. 1.25 or unstable
+    :param cache_dir: cache directory
+    :param offline: use only the store
+    :param max_age: time in seconds after which the "unstable" version is built again
+    """
+    store_dir = cache_dir.expanduser() / "edam"
+    store_path = store_dir / f"EDAM_{version}.json.gz"
+    if store_path.exists():
+        with gzip.open(store_path, "rt") as f:
+            content = json.load(f)
+        if offline or version != "unstable" or time.time() - content["created"] < max_age:
+            return content["classes"]
+    elif offline:
+        raise FileNotFoundError(f"EDAM {version} is not in the store {store_dir} in offline mode")
+
+    print(f"Building the store of EDAM {version} ...", flush=True)
+    from owlready2 import get_ontology
+
+    classes = get_edam_classes(get_ontology(f"https://edamontology.org/EDAM_{version}.owl").load())
+    store_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = store_path.with_name(f"{store_path.name}.{os.getpid()}.tmp")
+    with gzip.open(tmp_path, "wt") as f:
+        json.dump({"created": time.time(), "version": version, "classes": classes}, f)
+    os.replace(tmp_path, store_path)
+    return classes
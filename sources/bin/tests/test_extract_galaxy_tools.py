@@ -1,14 +1,23 @@
+import copy
+import io
 import json
 import os
 import shutil
+import subprocess
 import tempfile
+import time
+import types
 import unittest
 import xml.etree.ElementTree as et
+from datetime import date
+from functools import cmp_to_key
 from pathlib import Path
 from typing import (
     Any,
     Dict,
     List,
+    Optional,
+    Tuple,
     Union,
 )
 from unittest.mock import (
@@ -17,6 +26,7 @@ from unittest.mock import (
 )
 
 import pandas as pd
+import requests
 import shared
 import yaml
 from extract_galaxy_tools import (
@@ -27,30 +37,67 @@ from extract_galaxy_tools import (
     add_tutorial_ids_to_tools,
     add_workflow_ids_to_tools,
     aggregate_tool_stats,
+    BiocondaIndex,
+    BiotoolsIndex,
     check_categories,
     check_tools_on_servers,
     clone_repositories,
+    clone_repository,
+    compare_conda_version_tokens,
+    count_tools_on_servers,
+    crawl_tool_files,
     curate_tools,
+    EdamIndex,
+    enrich_tools,
     export_missing_tools,
     export_missing_tools_to_yaml,
     export_tools_to_json,
+    export_tools_to_parquet,
     export_tools_to_tsv,
     export_tools_to_yml,
     extract_missing_tools_per_servers,
     extract_top_tools_per_category,
+    fetch_json_concurrently,
     fill_lab_tool_section,
     filter_tools,
     get_all_installed_tool_ids_on_server,
     get_conda_package,
+    get_conda_version_tokens,
+    get_edam_index,
+    get_first_commit_dates,
     get_first_commit_for_local_folder,
+    get_installed_short_tool_ids_on_server,
     get_last_url_position,
     get_shed_attribute,
+    get_status_index,
+    get_tool_availability_index,
+    get_tool_folders,
     get_tool_metadata_from_local,
     get_tool_outputs,
     get_tool_stats_from_stats_file,
     get_xref,
+    iter_repodata_packages,
+    list_tool_files_from_git,
+    load_macro_file,
+    load_manifest,
+    merge_tool_shards,
+    needs_macro_expansion,
+    parse_macro_file,
     parse_tools_from_local,
+    prefetch_installed_tool_ids,
+    PREFETCHED_TOOL_IDS,
+    reduce_ontology_terms,
+    resolve_tokens,
+    save_manifest,
+    ServerToolCache,
+    SPARSE_CHECKOUT_PATTERNS,
     STATS_SUM,
+    UrlCache,
+    UsageStatsIndex,
+)
+from owlready2 import (
+    get_ontology,
+    Thing,
 )
 from requests import HTTPError
 
@@ -107,6 +154,65 @@ class TestGetToolStatsFromStatsFile(unittest.TestCase):
         self.assertEqual(result, 0)
 
 
+class TestUsageStatsIndex(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        runs = Path(self.tmp.name) / "tool_usage.csv"
+        runs.write_text(
+            "tool_name,count\n"
+            "toolshed.g2.bx.psu.edu/repos/iuc/snpsift/snpSift_filter,5\n"
+            "toolshed.g2.bx.psu.edu/repos/iuc/snpsift/snpSift_filter,10\n"
+            "toolshed.g2.bx.psu.edu/repos/iuc/freebayes/freebayes,20\n"
+            "freebayes,25\n"
+        )
+        users = Path(self.tmp.name) / "tool_users.csv"
+        users.write_text("tool_name,count\nsnpSift_filter,3\nfreebayes,7\n")
+        self.index = UsageStatsIndex(
+            {
+                "Suite runs (usegalaxy.eu)": runs,
+                "Suite users (usegalaxy.eu)": users,
+            }
+        )
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    def test_sum_mode_for_runs(self) -> None:
+        self.assertEqual(self.index.get_stat("Suite runs (usegalaxy.eu)", ["snpSift_filter", "freebayes"]), 60)
+
+    def test_max_mode_for_users(self) -> None:
+        self.assertEqual(self.index.get_stat("Suite users (usegalaxy.eu)", ["snpSift_filter", "freebayes"]), 7)
+
+    def test_tool_not_present(self) -> None:
+        self.assertEqual(self.index.get_stat("Suite runs (usegalaxy.eu)", ["nonexistent"]), 0)
+
+    def test_add_stats_to_tools(self) -> None:
+        tools: List[Dict[str, Any]] = [
+            {"Tool IDs": ["freebayes"]},
+            {"Tool IDs": ["snpSift_filter", "freebayes"]},
+            {"Tool IDs": []},
+            {"Tool IDs": ["nonexistent"]},
+        ]
+        self.index.add_stats_to_tools(tools, STATS_SUM)
+        self.assertEqual(tools[0]["Suite runs (usegalaxy.eu)"], 45)
+        self.assertEqual(tools[0]["Suite users (usegalaxy.eu)"], 7)
+        self.assertEqual(tools[1]["Suite runs (usegalaxy.eu)"], 60)
+        self.assertEqual(tools[1]["Suite users (usegalaxy.eu)"], 7)
+        self.assertEqual(tools[2]["Suite runs (usegalaxy.eu)"], 0)
+        self.assertEqual(tools[3]["Suite users (usegalaxy.eu)"], 0)
+
+    def test_add_stats_to_tools_matches_per_tool_aggregation(self) -> None:
+        tools: List[Dict[str, Any]] = [{"Tool IDs": ["snpSift_filter", "freebayes"]}, {"Tool IDs": ["freebayes"]}]
+        self.index.add_stats_to_tools(tools, STATS_SUM)
+        for tool in tools:
+            expected: Dict[str, Any] = {"Tool IDs": tool["Tool IDs"]}
+            for name in self.index.counts:
+                expected[name] = self.index.get_stat(name, tool["Tool IDs"])
+            self.assertEqual(tool, aggregate_tool_stats(expected, STATS_SUM))
+            self.assertIsInstance(tool["Suite runs on main servers"], int)
+
+
 class TestAggregateToolStats(unittest.TestCase):
     def test_basic_aggregation(self) -> None:
         tool: Dict[str, Union[int, float]] = {
@@ -275,6 +381,140 @@ class TestGetAllInstalledToolIdsOnServer(unittest.TestCase):
         self.assertEqual(result, [])
 
 
+class TestPrefetchInstalledToolIds(unittest.TestCase):
+    def setUp(self) -> None:
+        get_all_installed_tool_ids_on_server.cache_clear()
+        PREFETCHED_TOOL_IDS.clear()
+
+    def tearDown(self) -> None:
+        get_all_installed_tool_ids_on_server.cache_clear()
+        PREFETCHED_TOOL_IDS.clear()
+
+    @patch("extract_galaxy_tools.request_installed_tool_ids")
+    def test_prefetches_all_servers(self, mock_request: MagicMock) -> None:
+        def _request(url: str, session: Any = None, timeout: int = 30) -> Any:
+            if "down" in url:
+                raise HTTPError("Bad request")
+            return ["upload1", "fastp"], 1234
+
+        mock_request.side_effect = _request
+        servers = {"EU": "https://usegalaxy.eu/", "Down": "https://down.org"}
+
+        report = prefetch_installed_tool_ids(servers, workers=2)
+
+        self.assertEqual(report["EU"]["status"], "OK")
+        self.assertEqual(report["EU"]["size"], 1234)
+        self.assertEqual(report["EU"]["tools"], 2)
+        self.assertEqual(report["Down"]["status"], "FAIL")
+        # prefetched lists are used without querying the servers again
+        mock_request.reset_mock()
+        self.assertEqual(get_all_installed_tool_ids_on_server("https://usegalaxy.eu"), ["upload1", "fastp"])
+        self.assertEqual(get_all_installed_tool_ids_on_server("https://down.org"), [])
+        mock_request.assert_not_called()
+
+    @patch("extract_galaxy_tools.requests.Session.close")
+    @patch("extract_galaxy_tools.request_installed_tool_ids")
+    def test_caps_total_time(self, mock_request: MagicMock, mock_close: MagicMock) -> None:
+        def _request(url: str, session: Any = None, timeout: int = 30) -> Any:
+            if "slow" in url:
+                time.sleep(1)
+            return ["fastp"], 10
+
+        mock_request.side_effect = _request
+        servers = {"Fast": "https://fast.org", "Slow": "https://slow.org"}
+
+        report = prefetch_installed_tool_ids(servers, workers=2, max_time=0.2)
+
+        self.assertEqual(report["Fast"]["status"], "OK")
+        self.assertEqual(report["Slow"]["status"], "TIMEOUT")
+        self.assertEqual(PREFETCHED_TOOL_IDS["https://slow.org"], [])
+        # the session is not closed under the request still running
+        mock_close.assert_not_called()
+        prefetch_installed_tool_ids({"Fast": "https://fast.org"}, workers=2, max_time=0.2)
+        mock_close.assert_called_once()
+
+
+class TestServerToolCache(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.mkdtemp()
+        self.cache = ServerToolCache(Path(self.tmp_dir), ttl=3600)
+        self.session = MagicMock()
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.tmp_dir)
+
+    def _response(self, status_code: int, tool_ids: List[str], etag: str = "") -> MagicMock:
+        response = MagicMock(status_code=status_code, headers={"ETag": etag}, content=b"x" * 10)
+        response.json.return_value = [{"id": tool_id} for tool_id in tool_ids]
+        return response
+
+    def test_fetches_and_stores(self) -> None:
+        self.session.get.return_value = self._response(200, ["fastp", "upload1"], etag='"v1"')
+
+        self.assertEqual(self.cache.fetch("https://usegalaxy.eu/", self.session), (["fastp", "upload1"], 10, "server"))
+        entry = self.cache.load("https://usegalaxy.eu")
+        assert entry is not None
+        self.assertEqual(entry["tool_ids"], ["fastp", "upload1"])
+        self.assertEqual(entry["etag"], '"v1"')
+
+    def test_fresh_entry_is_used_without_request(self) -> None:
+        self.cache.save("https://usegalaxy.eu", ["fastp"])
+
+        self.assertEqual(self.cache.fetch("https://usegalaxy.eu", self.session), (["fastp"], 0, "cache"))
+        self.session.get.assert_not_called()
+
+    def test_stale_entry_is_revalidated(self) -> None:
+        self.cache.ttl = 0
+        self.cache.save("https://usegalaxy.eu", ["fastp"], etag='"v1"')
+        self.session.get.return_value = self._response(304, [])
+
+        self.assertEqual(self.cache.fetch("https://usegalaxy.eu", self.session), (["fastp"], 0, "revalidated"))
+        self.assertEqual(self.session.get.call_args.kwargs["headers"], {"If-None-Match": '"v1"'})
+
+        self.session.get.return_value = self._response(200, ["fastp", "multiqc"], etag='"v2"')
+        self.assertEqual(self.cache.fetch("https://usegalaxy.eu", self.session), (["fastp", "multiqc"], 10, "server"))
+
+    def test_stale_entry_is_used_when_the_server_fails(self) -> None:
+        self.cache.ttl = 0
+        self.cache.save("https://usegalaxy.eu", ["fastp"], etag='"v1"')
+
+        self.session.get.side_effect = requests.ConnectionError("unreachable")
+        self.assertEqual(self.cache.fetch("https://usegalaxy.eu", self.session), (["fastp"], 0, "stale"))
+        with self.assertRaises(requests.ConnectionError):
+            self.cache.fetch("https://usegalaxy.org", self.session)
+
+        self.session.get.side_effect = None
+        self.session.get.return_value = self._response(503, [])
+        self.assertEqual(self.cache.fetch("https://usegalaxy.eu", self.session), (["fastp"], 0, "stale"))
+
+    def test_snapshots_are_per_scheme(self) -> None:
+        self.cache.save("https://usegalaxy.eu", ["fastp"])
+
+        self.assertNotEqual(self.cache.get_path("http://usegalaxy.eu"), self.cache.get_path("https://usegalaxy.eu/"))
+        self.assertIsNone(self.cache.load("http://usegalaxy.eu"))
+
+    def test_offline_uses_stale_entries_only(self) -> None:
+        self.cache.ttl = 0
+        self.cache.offline = True
+        self.cache.save("https://usegalaxy.eu", ["fastp"])
+
+        self.assertEqual(self.cache.fetch("https://usegalaxy.eu", self.session), (["fastp"], 0, "cache"))
+        with self.assertRaises(ValueError):
+            self.cache.fetch("https://usegalaxy.org", self.session)
+        self.session.get.assert_not_called()
+
+    def test_prefetch_uses_cache(self) -> None:
+        self.cache.save("https://usegalaxy.eu", ["fastp"])
+
+        report = prefetch_installed_tool_ids({"EU": "https://usegalaxy.eu"}, workers=1, cache=self.cache)
+
+        self.assertEqual(report["EU"]["status"], "OK")
+        self.assertEqual(report["EU"]["source"], "cache")
+        self.assertEqual(PREFETCHED_TOOL_IDS["https://usegalaxy.eu"], ["fastp"])
+        PREFETCHED_TOOL_IDS.clear()
+        get_all_installed_tool_ids_on_server.cache_clear()
+
+
 class TestNormalizeRepoUrl(unittest.TestCase):
     def test_strips_trailing_slash(self) -> None:
         self.assertEqual(
@@ -373,6 +613,67 @@ class TestGetFirstCommitForLocalFolder(unittest.TestCase):
         mock_exists.assert_not_called()
 
 
+class TestGetFirstCommitDates(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.repo_path = Path(self.tmp.name)
+        self._git("init", "-q")
+        self._commit("tools/fastp/fastp.xml", "2020-01-15")
+        self._commit("tools/fastp/macros.xml", "2021-05-01")
+        self._commit("tools/suite/multiqc/multiqc.xml", "2022-02-02")
+        self._commit("README.md", "2023-03-03")
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    def _git(self, *args: str, date: str = "2020-01-01") -> None:
+        env = {
+            **os.environ,
+            "GIT_AUTHOR_NAME": "test",
+            "GIT_AUTHOR_EMAIL": "test@example.org",
+            "GIT_COMMITTER_NAME": "test",
+            "GIT_COMMITTER_EMAIL": "test@example.org",
+            "GIT_AUTHOR_DATE": f"{date}T12:00:00",
+            "GIT_COMMITTER_DATE": f"{date}T12:00:00",
+        }
+        subprocess.run(["git", *args], cwd=self.repo_path, env=env, check=True, capture_output=True)
+
+    def _commit(self, rel_path: str, date: str) -> None:
+        path = self.repo_path / rel_path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(rel_path)
+        self._git("add", rel_path)
+        self._git("commit", "-q", "-m", rel_path, date=date)
+
+    def test_matches_per_folder_git_log(self) -> None:
+        folders = ["tools/fastp", "tools/suite/multiqc", "tools/suite", "tools/missing"]
+
+        dates = get_first_commit_dates(self.repo_path, folders)
+
+        self.assertEqual(
+            dates, {"tools/fastp": "2020-01-15", "tools/suite/multiqc": "2022-02-02", "tools/suite": "2022-02-02"}
+        )
+        for folder in folders:
+            self.assertEqual(dates.get(folder, ""), get_first_commit_for_local_folder(self.repo_path, folder))
+
+    def test_not_a_repository(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            self.assertEqual(get_first_commit_dates(Path(tmp), ["tools/fastp"]), {})
+
+    @patch("extract_galaxy_tools.requests.get")
+    @patch("extract_galaxy_tools.get_first_commit_for_local_folder")
+    def test_metadata_uses_dates(self, mock_first_commit: MagicMock, mock_requests_get: MagicMock) -> None:
+        mock_requests_get.return_value.status_code = 404
+        fastp = self.repo_path / "tools" / "fastp"
+        shutil.copytree(Path(__file__).parent / "test-data" / "fastp_test", fastp, dirs_exist_ok=True)
+
+        metadata = get_tool_metadata_from_local(fastp, self.repo_path, first_commit_dates={"tools/fastp": "2020-01-15"})
+
+        assert metadata is not None
+        self.assertEqual(metadata["Suite first commit date"], "2020-01-15")
+        mock_first_commit.assert_not_called()
+
+
 class TestGetToolMetadataFromLocalReal(unittest.TestCase):
     """Tests using real Galaxy tool wrappers from the CI test repository."""
 
@@ -459,6 +760,386 @@ class TestGetToolMetadataFromLocalReal(unittest.TestCase):
         self.assertIn("Suite first commit date", metadata)
 
 
+class TestMacroFiles(unittest.TestCase):
+    def test_resolve_tokens(self) -> None:
+        tokens = {
+            "@VERSION@": "@TOOL_VERSION@+galaxy@GALAXY@",
+            "@TOOL_VERSION@": "@MAJOR@.1",
+            "@MAJOR@": "2",
+            "@GALAXY@": "0",
+            "@CYCLE@": "@CYCLE@",
+            "@OTHER@": "@UNKNOWN@",
+        }
+        self.assertEqual(
+            resolve_tokens(tokens),
+            {
+                "@VERSION@": "2.1+galaxy0",
+                "@TOOL_VERSION@": "2.1",
+                "@MAJOR@": "2",
+                "@GALAXY@": "0",
+                "@CYCLE@": "@CYCLE@",
+                "@OTHER@": "@UNKNOWN@",
+            },
+        )
+
+    def test_macro_file_is_parsed_once_until_modified(self) -> None:
+        test_data = Path(__file__).parent / "test-data" / "fastp_test"
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            shared_macros = Path(tmp_dir) / "macros.xml"
+            shutil.copy(test_data / "macros.xml", shared_macros)
+            for suite in ("suite_a", "suite_b"):
+                shutil.copytree(test_data, Path(tmp_dir) / suite, ignore=shutil.ignore_patterns("macros.xml"))
+                (Path(tmp_dir) / suite / "macros.xml").symlink_to(shared_macros)
+
+            parse_macro_file.cache_clear()
+            for suite in ("suite_a", "suite_b"):
+                metadata = get_tool_metadata_from_local(Path(tmp_dir) / suite, Path(tmp_dir), first_commit_dates={})
+                assert metadata is not None
+                self.assertEqual(metadata["Suite version"], "0.23.2")
+            self.assertEqual(parse_macro_file.cache_info().misses, 1)
+            self.assertEqual(parse_macro_file.cache_info().hits, 1)
+
+            shared_macros.write_text(
+                shared_macros.read_text().replace(
+                    '<token name="@WRAPPER_VERSION@">0.23.2</token>',
+                    '<token name="@WRAPPER_VERSION@">@MAJOR@.24.0</token><token name="@MAJOR@">1</token>',
+                )
+            )
+            metadata = get_tool_metadata_from_local(Path(tmp_dir) / "suite_a", Path(tmp_dir), first_commit_dates={})
+            assert metadata is not None
+            self.assertEqual(metadata["Suite version"], "1.24.0")
+            self.assertEqual(parse_macro_file.cache_info().misses, 2)
+
+
+class TestEnrichTools(unittest.TestCase):
+    @patch("extract_galaxy_tools.requests.Session.get")
+    def test_fetches_each_package_once(self, mock_get: MagicMock) -> None:
+        documents = {
+            "https://api.anaconda.org/package/bioconda/fastp": {"latest_version": "0.23.2"},
+            "https://api.anaconda.org/package/bioconda/scikit-image": {"latest_version": "0.25"},
+            "https://bio.tools/api/tool/fastp/?format=json": {
+                "name": "fastp",
+                "description": "A tool\ndesigned for FASTQ",
+                "function": [{"operation": [{"term": "Sequence trimming"}]}],
+                "topic": [{"term": "Sequencing"}],
+            },
+        }
+
+        def _get(url: str, timeout: int = 10) -> MagicMock:
+            response = MagicMock(status_code=200 if url in documents else 404)
+            response.json.return_value = documents.get(url)
+            return response
+
+        mock_get.side_effect = _get
+        tools: List[Dict[str, Any]] = [
+            {
+                "Suite conda package": package,
+                "Suite version": version,
+                "bio.tool ID": biotools_id,
+                "Latest suite conda package version": None,
+                "Suite version status": "To update",
+                "EDAM operations": [],
+                "EDAM topics": [],
+                "bio.tool name": None,
+                "bio.tool description": None,
+            }
+            for package, version, biotools_id in [
+                ("fastp", "0.23.2", "fastp"),
+                ("fastp", "0.20", "fastp"),
+                ("scikit-image", "0.18", "scikit-image"),
+                (None, "1.0", None),
+            ]
+        ]
+
+        enrich_tools(tools, workers=2)
+
+        self.assertEqual(mock_get.call_count, 4)
+        self.assertEqual(tools[0]["Suite version status"], "Up-to-date")
+        self.assertEqual(tools[1]["Suite version status"], "To update")
+        self.assertEqual(tools[1]["Latest suite conda package version"], "0.23.2")
+        self.assertEqual(tools[1]["EDAM operations"], ["Sequence trimming"])
+        self.assertEqual(tools[1]["bio.tool description"], "A tooldesigned for FASTQ")
+        self.assertEqual(tools[2]["Latest suite conda package version"], "0.25")
+        self.assertIsNone(tools[2]["bio.tool name"])
+        self.assertIsNone(tools[3]["Latest suite conda package version"])
+
+
+class TestBiotoolsIndex(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.index_path = Path(self.tmp.name) / "biotools_index.json.gz"
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    @staticmethod
+    def _page(biotools_ids: List[str]) -> MagicMock:
+        response = MagicMock(status_code=200)
+        response.json.return_value = {
+            "count": 3,
+            "list": [
+                {
+                    "biotoolsID": biotools_id,
+                    "name": biotools_id.lower(),
+                    "description": f"{biotools_id} description",
+                    "function": [{"operation": [{"term": "Sequence trimming"}, {"term": "Sequence filtering"}]}],
+                    "topic": [{"term": "Sequencing"}],
+                    "homepage": "https://example.org",
+                }
+                for biotools_id in biotools_ids
+            ],
+        }
+        return response
+
+    @patch("extract_galaxy_tools.requests.Session.get")
+    @patch("extract_galaxy_tools.requests.get")
+    def test_build_and_lookup(self, mock_get: MagicMock, mock_session_get: MagicMock) -> None:
+        mock_get.return_value = self._page(["fastp", "MultiQC"])
+        mock_session_get.return_value = self._page(["scikit-image"])
+
+        BiotoolsIndex(self.index_path).build(workers=2)
+        index = BiotoolsIndex(self.index_path)
+        self.assertTrue(index.load())
+
+        mock_session_get.assert_called_once_with("https://bio.tools/api/tool/?format=json&page=2", timeout=60)
+        self.assertEqual(sorted(index.entries), ["fastp", "multiqc", "scikit-image"])
+        self.assertIsNone(index.get("missing"))
+        metadata: Dict[str, Any] = {
+            "Suite conda package": None,
+            "Suite version": None,
+            "bio.tool ID": "multiqc",
+            "EDAM operations": [],
+            "EDAM topics": [],
+            "bio.tool name": None,
+            "bio.tool description": None,
+        }
+        enrich_tools([metadata], biotools_index=index)
+        self.assertEqual(metadata["EDAM operations"], ["Sequence trimming", "Sequence filtering"])
+        self.assertEqual(metadata["EDAM topics"], ["Sequencing"])
+        self.assertEqual(metadata["bio.tool name"], "multiqc")
+        self.assertEqual(metadata["bio.tool description"], "MultiQC description")
+        # the bio.tools API is not queried for the tool
+        self.assertEqual(mock_session_get.call_count, 1)
+
+    @patch("extract_galaxy_tools.time.sleep")
+    @patch("extract_galaxy_tools.requests.Session.get")
+    @patch("extract_galaxy_tools.requests.get")
+    def test_incomplete_index_is_not_saved(
+        self, mock_get: MagicMock, mock_session_get: MagicMock, mock_sleep: MagicMock
+    ) -> None:
+        mock_get.return_value = self._page(["fastp", "MultiQC"])
+        mock_session_get.return_value = MagicMock(status_code=404)
+
+        with self.assertRaises(RuntimeError):
+            BiotoolsIndex(self.index_path).build(retries=2)
+        self.assertFalse(self.index_path.exists())
+        self.assertEqual(mock_session_get.call_count, 3)
+
+    @patch("extract_galaxy_tools.time.sleep")
+    @patch("extract_galaxy_tools.requests.Session.get")
+    @patch("extract_galaxy_tools.requests.get")
+    def test_failed_pages_are_fetched_again(
+        self, mock_get: MagicMock, mock_session_get: MagicMock, mock_sleep: MagicMock
+    ) -> None:
+        server_error = MagicMock(status_code=503)
+        server_error.raise_for_status.side_effect = requests.exceptions.HTTPError("503 Service Unavailable")
+        mock_get.side_effect = [server_error, self._page(["fastp", "MultiQC"])]
+        mock_session_get.side_effect = [server_error, self._page(["scikit-image"])]
+
+        BiotoolsIndex(self.index_path).build()
+        index = BiotoolsIndex(self.index_path)
+        self.assertTrue(index.load())
+        self.assertEqual(sorted(index.entries), ["fastp", "multiqc", "scikit-image"])
+        self.assertEqual(mock_sleep.call_args_list, [((5,),), ((5,),)])
+
+
+class TestBiocondaIndex(unittest.TestCase):
+    repodata: Dict[str, Any] = {
+        "info": {"subdir": "noarch"},
+        "packages": {
+            "fastp-0.20.1-h8b12597_0.tar.bz2": {"name": "fastp", "version": "0.20.1", "depends": ["libgcc-ng >=7"]},
+            "fastp-0.23.2-h5f740d0_3.tar.bz2": {"name": "fastp", "version": "0.23.2", "depends": []},
+            "multiqc-1.9-py_1.tar.bz2": {"name": "multiqc", "version": "1.9", "depends": []},
+        },
+        "packages.conda": {
+            "multiqc-1.10-pyhdfd78af_0.conda": {"name": "multiqc", "version": "1.10", "depends": []},
+            "multiqc-1.10.dev0-pyhdfd78af_0.conda": {"name": "multiqc", "version": "1.10.dev0", "depends": []},
+        },
+        "removed": [],
+        "repodata_version": 1,
+    }
+
+    def test_iter_repodata_packages_in_small_chunks(self) -> None:
+        text = json.dumps(self.repodata, indent=2)
+        expected = [*self.repodata["packages"].values(), *self.repodata["packages.conda"].values()]
+        for size in (1, 10, len(text)):
+            records = list(iter_repodata_packages(text[i : i + size] for i in range(0, len(text), size)))
+            self.assertEqual(records, expected)
+        with self.assertRaises(ValueError):
+            list(iter_repodata_packages([text[:100]]))
+
+    def test_conda_version_ordering(self) -> None:
+        versions = ["1.10", "1.9", "2.0", "2.0a1", "2.0.dev0", "1.10.post1", "1.1", "1.1a1", "1!0.1", "1.1.0"]
+
+        def _compare(version: str, other: str) -> int:
+            return compare_conda_version_tokens(get_conda_version_tokens(version), get_conda_version_tokens(other))
+
+        ordered = sorted(versions, key=cmp_to_key(_compare))
+        self.assertEqual(
+            ordered, ["1.1a1", "1.1", "1.1.0", "1.9", "1.10", "1.10.post1", "2.0.dev0", "2.0a1", "2.0", "1!0.1"]
+        )
+
+    @patch("extract_galaxy_tools.requests.get")
+    def test_build_and_enrich(self, mock_get: MagicMock) -> None:
+        text = json.dumps(self.repodata).encode()
+
+        def _get(url: str, stream: bool = False, timeout: int = 300) -> MagicMock:
+            response = MagicMock()
+            response.__enter__.return_value = response
+            content = text if url.endswith("noarch/repodata.json") else b'{"packages": {}}'
+            response.iter_content.return_value = [content[i : i + 16] for i in range(0, len(content), 16)]
+            return response
+
+        mock_get.side_effect = _get
+        with tempfile.TemporaryDirectory() as tmp:
+            BiocondaIndex(Path(tmp) / "bioconda_index.json.gz").build()
+            index = BiocondaIndex(Path(tmp) / "bioconda_index.json.gz")
+            self.assertTrue(index.load())
+        self.assertEqual(index.versions, {"fastp": "0.23.2", "multiqc": "1.10"})
+
+        tools: List[Dict[str, Any]] = [
+            {
+                "Suite conda package": package,
+                "Suite version": "0.23.2",
+                "bio.tool ID": None,
+                "Latest suite conda package version": None,
+                "Suite version status": "To update",
+            }
+            for package in ("fastp", "multiqc", "missing")
+        ]
+        enrich_tools(tools, bioconda_index=index)
+        self.assertEqual(
+            [(tool["Latest suite conda package version"], tool["Suite version status"]) for tool in tools],
+            [("0.23.2", "Up-to-date"), ("1.10", "To update"), (None, "To update")],
+        )
+        self.assertEqual(mock_get.call_count, 2)
+
+
+class TestUrlCache(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = Path(self.tmp.name) / "cache" / "metadata.sqlite"
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    def test_ttl_and_offline(self) -> None:
+        cache = UrlCache(self.db_path, ttl=3600)
+        cache.set({"https://a.org": {"latest_version": "1.0"}, "https://missing.org": None})
+        self.assertEqual(
+            cache.get(["https://a.org", "https://missing.org", "https://b.org"]),
+            {"https://a.org": {"latest_version": "1.0"}, "https://missing.org": None},
+        )
+        cache.close()
+
+        cache = UrlCache(self.db_path, ttl=0)
+        self.assertEqual(cache.get(["https://a.org"]), {})
+        cache.offline = True
+        self.assertEqual(cache.get(["https://a.org"]), {"https://a.org": {"latest_version": "1.0"}})
+        cache.close()
+
+    @patch("extract_galaxy_tools.requests.Session.get")
+    def test_fetch_json_concurrently_with_cache(self, mock_get: MagicMock) -> None:
+        def _get(url: str, timeout: int = 10) -> MagicMock:
+            status_code = {"https://a.org": 200, "https://missing.org": 404}.get(url, 500)
+            response = MagicMock(status_code=status_code)
+            response.json.return_value = {"latest_version": "1.0", "files": ["large"]}
+            if status_code == 500:
+                response.raise_for_status.side_effect = HTTPError("Server error")
+            return response
+
+        mock_get.side_effect = _get
+        urls = {"a": "https://a.org", "missing": "https://missing.org", "down": "https://down.org"}
+        cache = UrlCache(self.db_path)
+
+        results = fetch_json_concurrently(urls, workers=2, cache=cache, fields=["latest_version"])
+
+        self.assertEqual(results, {"a": {"latest_version": "1.0"}, "missing": None, "down": None})
+        # failed requests are not cached
+        self.assertEqual(
+            cache.get(list(urls.values())), {"https://a.org": {"latest_version": "1.0"}, "https://missing.org": None}
+        )
+        mock_get.reset_mock()
+        cache.offline = True
+        self.assertEqual(fetch_json_concurrently(urls, cache=cache), results)
+        mock_get.assert_not_called()
+        cache.close()
+
+
+class TestReduceOntologyTerms(unittest.TestCase):
+    ontology: Any
+    index: EdamIndex
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        ontology = get_ontology("http://example.org/test_edam.owl")
+
+        def _add_class(name: str, parents: Tuple[Any, ...], labels: List[str]) -> Any:
+            cla: Any = types.new_class(name, parents)
+            cla.label = labels
+            return cla
+
+        with ontology:
+            operation = _add_class("operation_0004", (Thing,), ["Operation"])
+            analysis = _add_class("operation_2945", (operation,), ["Analysis"])
+            alignment = _add_class("operation_2928", (analysis,), ["Alignment", "Sequence alignment"])
+            trimming = _add_class("operation_3192", (operation,), ["Sequence trimming"])
+            # class with two parents
+            _add_class("operation_3198", (alignment, trimming), ["Read mapping"])
+        cls.ontology = ontology
+        cls.index = get_edam_index(shared.get_edam_classes(ontology))
+
+    def test_removes_transitive_ancestors(self) -> None:
+        self.assertEqual(reduce_ontology_terms(["Operation", "Alignment"], ontology=self.index), ["Alignment"])
+        self.assertEqual(
+            reduce_ontology_terms(["Read mapping", "Operation", "Sequence trimming", "Analysis"], ontology=self.index),
+            ["Read mapping"],
+        )
+
+    def test_keeps_order_duplicates_and_removes_unknown_terms(self) -> None:
+        terms = ["Sequence trimming", "Unknown", "Alignment", "Sequence trimming"]
+        self.assertEqual(
+            reduce_ontology_terms(terms, ontology=self.index), ["Sequence trimming", "Alignment", "Sequence trimming"]
+        )
+        self.assertEqual(reduce_ontology_terms(["Sequence alignment"], ontology=self.index), ["Alignment"])
+        self.assertEqual(reduce_ontology_terms([], ontology=self.index), [])
+
+    def test_edam_store(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache_dir = Path(tmp_dir)
+            with self.assertRaises(FileNotFoundError):
+                shared.load_edam_classes("1.25", cache_dir=cache_dir, offline=True)
+            with patch("owlready2.get_ontology") as mock_get_ontology:
+                mock_get_ontology.return_value.load.return_value = self.ontology
+                classes = shared.load_edam_classes("1.25", cache_dir=cache_dir)
+                mock_get_ontology.assert_called_once_with("https://edamontology.org/EDAM_1.25.owl")
+                self.assertEqual(shared.load_edam_classes("1.25", cache_dir=cache_dir, offline=True), classes)
+                self.assertEqual(shared.load_edam_classes("1.25", cache_dir=cache_dir), classes)
+                self.assertEqual(mock_get_ontology.call_count, 1)
+                # the unstable version is built again when too old
+                shared.load_edam_classes("unstable", cache_dir=cache_dir)
+                shared.load_edam_classes("unstable", cache_dir=cache_dir, max_age=0)
+                self.assertEqual(mock_get_ontology.call_count, 3)
+        self.assertEqual(
+            get_edam_index(classes).reduce(["Operation", "Read mapping"]),
+            self.index.reduce(["Operation", "Read mapping"]),
+        )
+        mapping = next(cla for cla in classes if cla["name"] == "operation_3198")
+        self.assertEqual(
+            [classes[parent]["name"] for parent in mapping["parents"]], ["operation_2928", "operation_3192"]
+        )
+
+
 class TestGetShedAttribute(unittest.TestCase):
     def test_returns_value_when_key_exists(self) -> None:
         content = {"name": "fastp", "owner": "iuc"}
@@ -536,20 +1217,44 @@ class TestAddStatus(unittest.TestCase):
         status_df = pd.DataFrame(
             {"Suite ID": ["fastp"], "Suite owner": ["iuc"], "To keep": [True], "Deprecated": [False]}
         )
-        add_status(self.tool, status_df)
+        add_status(self.tool, get_status_index(status_df))
         self.assertTrue(self.tool["To keep"])
         self.assertFalse(self.tool["Deprecated"])
 
     def test_sets_none_when_not_found(self) -> None:
         status_df = pd.DataFrame(columns=["Suite ID", "Suite owner", "To keep", "Deprecated"])
-        add_status(self.tool, status_df)
+        add_status(self.tool, get_status_index(status_df))
         self.assertIsNone(self.tool["To keep"])
         self.assertIsNone(self.tool["Deprecated"])
 
     def test_handles_missing_owner_column(self) -> None:
         status_df = pd.DataFrame({"Suite ID": ["fastp"], "To keep": [True], "Deprecated": [False]})
-        add_status(self.tool, status_df)
+        add_status(self.tool, get_status_index(status_df))
+        self.assertTrue(self.tool["To keep"])
+
+    def test_matches_owner_then_suite_id(self) -> None:
+        status_df = pd.DataFrame(
+            {
+                "Suite ID": ["fastp", "fastp", "fastp", "it's"],
+                "Suite owner": ["bgruening", "iuc", None, "iuc"],
+                "To keep": [False, True, False, None],
+                "Deprecated": [True, False, None, True],
+            }
+        )
+        status_index = get_status_index(status_df)
+        add_status(self.tool, status_index)
         self.assertTrue(self.tool["To keep"])
+        self.assertFalse(self.tool["Deprecated"])
+        # status without owner
+        tool: Dict[str, Any] = {"Suite ID": "fastp", "Suite owner": "other"}
+        add_status(tool, status_index)
+        self.assertFalse(tool["To keep"])
+        self.assertIsNone(tool["Deprecated"])
+        # suite ID with a quote
+        tool = {"Suite ID": "it's", "Suite owner": "iuc"}
+        add_status(tool, status_index)
+        self.assertIsNone(tool["To keep"])
+        self.assertTrue(tool["Deprecated"])
 
 
 class TestFilterTools(unittest.TestCase):
@@ -659,6 +1364,9 @@ class TestExportToolsToYml(unittest.TestCase):
 
 
 class TestCheckToolsOnServers(unittest.TestCase):
+    def setUp(self) -> None:
+        get_installed_short_tool_ids_on_server.cache_clear()
+
     @patch("extract_galaxy_tools.get_all_installed_tool_ids_on_server")
     def test_counts_matching_tools(self, mock_get_ids: MagicMock) -> None:
         mock_get_ids.return_value = [
@@ -675,6 +1383,32 @@ class TestCheckToolsOnServers(unittest.TestCase):
         self.assertEqual(count, 1)
 
 
+class TestToolAvailabilityIndex(unittest.TestCase):
+    def setUp(self) -> None:
+        get_installed_short_tool_ids_on_server.cache_clear()
+
+    def tearDown(self) -> None:
+        get_installed_short_tool_ids_on_server.cache_clear()
+
+    @patch("extract_galaxy_tools.get_all_installed_tool_ids_on_server")
+    def test_counts_tools_per_server(self, mock_get_ids: MagicMock) -> None:
+        installed = {
+            "https://usegalaxy.eu": ["toolshed.g2.bx.psu.edu/repos/iuc/fastp/fastp/1.0", "fastqc"],
+            "https://usegalaxy.org": ["fastqc"],
+            "https://usegalaxy.fr": [],
+        }
+        mock_get_ids.side_effect = lambda url: installed[url]
+        servers = {"EU": "https://usegalaxy.eu", "ORG": "https://usegalaxy.org", "FR": "https://usegalaxy.fr"}
+        availability = get_tool_availability_index(servers)
+
+        counts = count_tools_on_servers(["fastp", "fastqc", "nonexistent"], availability, list(servers))
+
+        self.assertEqual(counts, {"EU": 2, "ORG": 1, "FR": 0})
+        self.assertEqual(list(counts), ["EU", "ORG", "FR"])
+        for name, url in servers.items():
+            self.assertEqual(counts[name], check_tools_on_servers(["fastp", "fastqc", "nonexistent"], url))
+
+
 class TestCloneRepositories(unittest.TestCase):
     @patch("extract_galaxy_tools.subprocess.run")
     def test_clones_new_repositories(self, mock_run: MagicMock) -> None:
@@ -701,6 +1435,162 @@ class TestCloneRepositories(unittest.TestCase):
             )
             self.assertEqual(len(result), 1)
 
+    @patch("extract_galaxy_tools.time.sleep")
+    @patch("extract_galaxy_tools.subprocess.run")
+    def test_retries_and_reports_failures(self, mock_run: MagicMock, mock_sleep: MagicMock) -> None:
+        def _run(cmd: List[str], **kwargs: Any) -> MagicMock:
+            if "count-objects" in cmd:
+                return MagicMock(stdout="count: 0\nsize: 0\nsize-pack: 0\n")
+            if "https://github.com/iuc/broken" in cmd:
+                raise subprocess.CalledProcessError(128, cmd, stderr="fatal: repository not found")
+            if "https://github.com/iuc/slow" in cmd and mock_run.call_count < 6:
+                raise subprocess.TimeoutExpired(cmd, 1)
+            return MagicMock(stdout="")
+
+        mock_run.side_effect = _run
+        report: Dict[str, Dict[str, Any]] = {}
+        with tempfile.TemporaryDirectory() as tmp:
+            result = clone_repositories(
+                ["https://github.com/iuc/broken", "https://github.com/iuc/slow"],
+                Path(tmp),
+                workers=1,
+                retries=2,
+                report=report,
+            )
+        self.assertEqual(result, [("https://github.com/iuc/slow", Path(tmp) / "iuc-slow")])
+        self.assertEqual(report["https://github.com/iuc/broken"]["status"], "FAIL")
+        self.assertEqual(report["https://github.com/iuc/broken"]["attempts"], 3)
+        self.assertEqual(report["https://github.com/iuc/broken"]["error"], "fatal: repository not found")
+        self.assertEqual(report["https://github.com/iuc/slow"]["status"], "OK")
+        self.assertGreater(report["https://github.com/iuc/slow"]["attempts"], 1)
+        self.assertEqual(mock_sleep.call_args_list[:2], [((5,),), ((10,),)])
+
+    @patch("extract_galaxy_tools.subprocess.run")
+    def test_skips_repositories_with_unchanged_remote_head(self, mock_run: MagicMock) -> None:
+        heads = {"https://github.com/iuc/same": "a" * 40, "https://github.com/iuc/new": "b" * 40}
+
+        def _run(cmd: List[str], **kwargs: Any) -> MagicMock:
+            if "ls-remote" in cmd:
+                return MagicMock(returncode=0, stdout=f"{heads.get(cmd[2], 'c' * 40)}\tHEAD\n")
+            return MagicMock(stdout="")
+
+        mock_run.side_effect = _run
+        report: Dict[str, Dict[str, Any]] = {}
+        with tempfile.TemporaryDirectory() as tmp:
+            result = clone_repositories(
+                ["https://github.com/iuc/same", "https://github.com/iuc/new", "https://github.com/iuc/moved"],
+                Path(tmp),
+                report=report,
+                previous_heads={"https://github.com/iuc/same": "a" * 40, "https://github.com/iuc/new": "0" * 40},
+            )
+        # the unchanged repository is returned although it is not cloned
+        self.assertEqual(
+            [url for url, dest in result],
+            ["https://github.com/iuc/same", "https://github.com/iuc/new", "https://github.com/iuc/moved"],
+        )
+        self.assertEqual(report["https://github.com/iuc/same"]["action"], "skip")
+        self.assertEqual(report["https://github.com/iuc/same"]["head"], "a" * 40)
+        self.assertEqual(report["https://github.com/iuc/new"]["action"], "clone")
+        self.assertEqual(report["https://github.com/iuc/moved"]["action"], "clone")
+        cloned = [call.args[0][-2] for call in mock_run.call_args_list if call.args[0][:2] == ["git", "clone"]]
+        self.assertEqual(sorted(cloned), ["https://github.com/iuc/moved", "https://github.com/iuc/new"])
+
+    @patch("extract_galaxy_tools.subprocess.run")
+    def test_sparse_mode_commands(self, mock_run: MagicMock) -> None:
+        mock_run.return_value = MagicMock(stdout="")
+        with tempfile.TemporaryDirectory() as tmp:
+            dest = Path(tmp) / "iuc-fastp"
+            clone_repository("https://github.com/iuc/fastp", dest, depth=None, mode="sparse")
+            dest.mkdir()
+            clone_repository("https://github.com/iuc/fastp", dest, depth=None, mode="sparse")
+        cmds = [call.args[0] for call in mock_run.call_args_list if "count-objects" not in call.args[0]]
+        self.assertEqual(
+            cmds[0], ["git", "clone", "--filter=blob:none", "--no-checkout", "https://github.com/iuc/fastp", str(dest)]
+        )
+        sparse_checkout = ["git", "-C", str(dest), "sparse-checkout", "set", "--no-cone", *SPARSE_CHECKOUT_PATTERNS]
+        self.assertEqual(
+            cmds[1:],
+            [
+                sparse_checkout,
+                ["git", "-C", str(dest), "checkout"],
+                sparse_checkout,
+                ["git", "-C", str(dest), "pull", "--ff-only"],
+            ],
+        )
+
+    def test_sparse_clone_checks_out_tool_metadata_files(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            src = Path(tmp) / "src"
+            for rel_path in (
+                "README.md",
+                "tools/fastp/.shed.yml",
+                "tools/fastp/fastp.xml",
+                "tools/fastp/macros.xml",
+                "tools/fastp/test-data/out.xml",
+                "tools/fastp/test-data/reads.fastq",
+            ):
+                (src / rel_path).parent.mkdir(parents=True, exist_ok=True)
+                (src / rel_path).write_text(rel_path)
+            env = {**os.environ, "GIT_AUTHOR_DATE": "2020-01-15T12:00:00", "GIT_COMMITTER_DATE": "2020-01-15T12:00:00"}
+            for args in (
+                ["init", "-q"],
+                ["config", "uploadpack.allowFilter", "true"],
+                ["add", "-A"],
+                ["-c", "user.name=test", "-c", "user.email=test@example.org", "commit", "-q", "-m", "init"],
+            ):
+                subprocess.run(["git", *args], cwd=src, env=env, check=True, capture_output=True)
+
+            dest = Path(tmp) / "dest"
+            report = clone_repository(f"file://{src}", dest, depth=None, retries=0, mode="sparse")
+            self.assertEqual(report["status"], "OK", report["error"])
+            self.assertEqual(
+                sorted(str(fp.relative_to(dest)) for fp in dest.rglob("*") if fp.is_file() and ".git" not in fp.parts),
+                ["tools/fastp/.shed.yml", "tools/fastp/fastp.xml", "tools/fastp/macros.xml"],
+            )
+            self.assertEqual(get_first_commit_dates(dest, ["tools/fastp"]), {"tools/fastp": "2020-01-15"})
+            self.assertEqual(list(get_tool_folders(list_tool_files_from_git(dest) or [])), ["tools/fastp"])
+
+    def test_sparse_clone_checks_out_macros_from_outside_the_tool_folders(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            src = Path(tmp) / "src"
+            files = {
+                "tools/fastp/.shed.yml": "name: fastp",
+                "tools/fastp/fastp.xml": (
+                    "<tool><macros><import>macros.xml</import><import>../../shared/tokens.xml</import></macros></tool>"
+                ),
+                "shared/macros.xml": "<macros><token name='@VERSION@'>1.0</token></macros>",
+                "shared/tokens.xml": "<macros><import>citations.xml</import></macros>",
+                "shared/citations.xml": "<macros><xml name='citations'/></macros>",
+                "shared/README.md": "shared macros",
+            }
+            for rel_path, text in files.items():
+                (src / rel_path).parent.mkdir(parents=True, exist_ok=True)
+                (src / rel_path).write_text(text)
+            (src / "tools/fastp/macros.xml").symlink_to("../../shared/macros.xml")
+            for args in (
+                ["init", "-q"],
+                ["config", "uploadpack.allowFilter", "true"],
+                ["add", "-A"],
+                ["-c", "user.name=test", "-c", "user.email=test@example.org", "commit", "-q", "-m", "init"],
+            ):
+                subprocess.run(["git", *args], cwd=src, check=True, capture_output=True)
+
+            dest = Path(tmp) / "dest"
+            report = clone_repository(f"file://{src}", dest, depth=None, retries=0, mode="sparse")
+            self.assertEqual(report["status"], "OK", report["error"])
+            self.assertEqual(
+                sorted(str(fp.relative_to(dest)) for fp in dest.rglob("*") if fp.is_file() and ".git" not in fp.parts),
+                [
+                    "shared/citations.xml",
+                    "shared/macros.xml",
+                    "shared/tokens.xml",
+                    "tools/fastp/.shed.yml",
+                    "tools/fastp/fastp.xml",
+                    "tools/fastp/macros.xml",
+                ],
+            )
+            self.assertEqual(load_macro_file(dest / "tools/fastp/macros.xml")["macros"][0]["text"], "1.0")
+
 
 class TestParseToolsFromLocal(unittest.TestCase):
     def setUp(self) -> None:
@@ -716,6 +1606,15 @@ class TestParseToolsFromLocal(unittest.TestCase):
     def tearDown(self) -> None:
         self.tmp.cleanup()
 
+    def _commit(self, message: str) -> None:
+        for cmd in (["init", "-q"], ["add", "-A"], ["commit", "-q", "-m", message]):
+            subprocess.run(
+                ["git", "-c", "user.name=test", "-c", "user.email=test@example.org", *cmd],
+                cwd=self.repo_path,
+                check=True,
+                capture_output=True,
+            )
+
     @patch("extract_galaxy_tools.get_first_commit_for_local_folder")
     @patch("extract_galaxy_tools.requests.get")
     def test_parses_tools_from_local_repo(self, mock_requests_get: MagicMock, mock_first_commit: MagicMock) -> None:
@@ -725,6 +1624,255 @@ class TestParseToolsFromLocal(unittest.TestCase):
         self.assertEqual(len(tools), 1)
         self.assertEqual(tools[0]["Suite ID"], "fastp")
 
+    @patch("extract_galaxy_tools.requests.get")
+    def test_process_mode_matches_thread_mode(self, mock_requests_get: MagicMock) -> None:
+        mock_requests_get.return_value.status_code = 404
+        shutil.copytree(
+            Path(__file__).parent / "test-data" / "2d_auto_threshold_test", self.repo_path / "tools" / "threshold"
+        )
+
+        tools = parse_tools_from_local(self.repo_path, workers=2, parse_mode="process")
+
+        self.assertEqual(tools, parse_tools_from_local(self.repo_path, workers=1))
+        self.assertEqual([tool["Suite ID"] for tool in tools], ["fastp", "2d_auto_threshold"])
+        # the conda and bio.tools metadata are fetched afterwards by enrich_tools
+        mock_requests_get.assert_not_called()
+
+    @patch("extract_galaxy_tools.requests.get")
+    def test_reuses_unchanged_folders_from_manifest(self, mock_requests_get: MagicMock) -> None:
+        mock_requests_get.return_value.status_code = 404
+        shutil.copytree(
+            Path(__file__).parent / "test-data" / "2d_auto_threshold_test", self.repo_path / "tools" / "threshold"
+        )
+        self._commit("initial")
+        manifest: Dict[str, Any] = {}
+        tools = parse_tools_from_local(self.repo_path, manifest=manifest)
+        self.assertEqual([tool["Suite ID"] for tool in tools], ["fastp", "2d_auto_threshold"])
+        self.assertEqual(list(manifest["folders"]), ["tools/fastp", "tools/threshold"])
+
+        # unchanged HEAD: nothing is parsed and the returned metadata are copies
+        tools[0]["Suite ID"] = "modified"
+        with patch("extract_galaxy_tools.get_tool_metadata_from_local") as mock_metadata:
+            tools = parse_tools_from_local(self.repo_path, manifest=manifest)
+            mock_metadata.assert_not_called()
+        self.assertEqual([tool["Suite ID"] for tool in tools], ["fastp", "2d_auto_threshold"])
+        # HEAD known from the remote: the repository is not needed
+        tools = parse_tools_from_local(Path(self.tmp.name) / "not_cloned", manifest=manifest, head=manifest["head"])
+        self.assertEqual([tool["Suite ID"] for tool in tools], ["fastp", "2d_auto_threshold"])
+
+        # only the changed folder is parsed again
+        (self.repo_path / "tools" / "threshold" / "README").write_text("changed")
+        self._commit("change threshold")
+        with patch("extract_galaxy_tools.get_tool_metadata_from_local", return_value={"Suite ID": "new"}) as mock_meta:
+            tools = parse_tools_from_local(self.repo_path, manifest=manifest)
+            self.assertEqual(mock_meta.call_count, 1)
+            self.assertEqual(mock_meta.call_args.args[0], self.repo_path / "tools" / "threshold")
+        self.assertEqual([tool["Suite ID"] for tool in tools], ["fastp", "new"])
+
+    @patch("extract_galaxy_tools.requests.get")
+    def test_reparses_folders_with_changed_macros_outside_the_folder(self, mock_requests_get: MagicMock) -> None:
+        mock_requests_get.return_value.status_code = 404
+        tool_path = self.repo_path / "tools" / "fastp"
+        shared_macros = self.repo_path / "macros" / "fastp_macros.xml"
+        shared_macros.parent.mkdir()
+        (tool_path / "macros.xml").rename(shared_macros)
+        (tool_path / "macros.xml").symlink_to(Path("..") / ".." / "macros" / "fastp_macros.xml")
+        self._commit("initial")
+        manifest: Dict[str, Any] = {}
+        tools = parse_tools_from_local(self.repo_path, manifest=manifest)
+        self.assertEqual(tools[0]["Suite version"], "0.23.2")
+        self.assertEqual(list(manifest["folders"]["tools/fastp"]["dependencies"]), ["macros/fastp_macros.xml"])
+        tree_hash = manifest["folders"]["tools/fastp"]["tree"]
+
+        shared_macros.write_text(shared_macros.read_text().replace(">0.23.2<", ">0.24.0<"))
+        self._commit("update shared macros")
+        tools = parse_tools_from_local(self.repo_path, manifest=manifest)
+        # the tree hash of the folder is unchanged, but not the blob hash of its macros
+        self.assertEqual(manifest["folders"]["tools/fastp"]["tree"], tree_hash)
+        self.assertEqual(tools[0]["Suite version"], "0.24.0")
+
+    def test_manifest_roundtrip(self) -> None:
+        manifest_path = Path(self.tmp.name) / "manifest" / "tools.json"
+        self.assertEqual(load_manifest(manifest_path), {})
+        repositories = {"https://github.com/iuc/tools": {"head": "abc", "folders": {}}}
+
+        save_manifest(repositories, manifest_path)
+
+        self.assertEqual(load_manifest(manifest_path), repositories)
+
+
+class TestToolFolderDiscovery(unittest.TestCase):
+    def test_get_tool_folders(self) -> None:
+        file_paths = [
+            "tools/.shed.yml",
+            "tools/suite/.shed.yml",
+            "tools/suite/macros.xml",
+            "tools/suite/tool.xml",
+            "tools/suite/nested/.shed.yml",
+            "tools/suite/nested/nested.xml",
+            "tools/collection/a/.shed.yml",
+            "tools/collection/a/a.xml",
+            "tools/collection/b/deeper/.shed.yml",
+            "tools/collection-x/.shed.yml",
+            "wrappers/w/.shed.yml",
+            "other/o/.shed.yml",
+        ]
+        self.assertEqual(
+            get_tool_folders(reversed(file_paths)),
+            {
+                "tools/collection/a": ["a.xml"],
+                "tools/collection/b/deeper": [],
+                "tools/collection-x": [],
+                "tools/suite": ["tool.xml", "macros.xml"],
+                "wrappers/w": [],
+            },
+        )
+
+    def test_git_index_matches_crawling(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            repo_path = Path(tmp_dir)
+            for folder in ("tools/suite", "tools/collection/a", "tools/collection/b/deeper", "wrappers/w"):
+                (repo_path / folder / "test-data").mkdir(parents=True)
+                (repo_path / folder / ".shed.yml").write_text("name: tool\n")
+                (repo_path / folder / "tool.xml").write_text("<tool/>")
+                (repo_path / folder / "test-data" / "data.xml").write_text("<data/>")
+            (repo_path / "tools" / "suite" / "macros.xml").write_text("<macros/>")
+            self.assertIsNone(list_tool_files_from_git(repo_path))
+            crawled = get_tool_folders(crawl_tool_files(repo_path))
+
+            subprocess.run(["git", "init", "-q"], cwd=repo_path, check=True)
+            subprocess.run(["git", "add", "-A"], cwd=repo_path, check=True)
+            file_paths = list_tool_files_from_git(repo_path)
+            assert file_paths is not None
+            self.assertNotIn("tools/suite/test-data/data.xml", file_paths)
+            indexed = get_tool_folders(file_paths)
+
+        self.assertEqual(
+            list(indexed), ["tools/collection/a", "tools/collection/b/deeper", "tools/suite", "wrappers/w"]
+        )
+        self.assertEqual(list(crawled), list(indexed))
+        for folder, xml_files in indexed.items():
+            self.assertEqual(sorted(crawled[folder]), sorted(xml_files))
+
+
+class TestReadTable(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tools: List[Dict[str, Any]] = [
+            {
+                "Suite ID": "fastp",
+                "Tool IDs": ["fastp"],
+                "EDAM operations": [],
+                "Number of tools on UseGalaxy.eu": 1,
+                "Suite runs on main servers": 100,
+            },
+            {
+                "Suite ID": "bwa",
+                "Tool IDs": ["bwa", "bwa_mem"],
+                "EDAM operations": ["Read mapping", "Sequence alignment"],
+                "Number of tools on UseGalaxy.eu": 2,
+                "Suite runs on main servers": None,
+            },
+        ]
+        self.tmp = tempfile.TemporaryDirectory()
+        self.tsv_path = str(Path(self.tmp.name) / "tools.tsv")
+        df = pd.DataFrame(self.tools).sort_values("Suite ID")
+        for col in ["Tool IDs", "EDAM operations"]:
+            df[col] = shared.format_list_column(df[col])
+        df.to_csv(self.tsv_path, sep="\t", index=False)
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    def check_table(self, df: pd.DataFrame) -> None:
+        self.assertEqual(list(df.columns), ["Suite ID", "Tool IDs", "EDAM operations"])
+        self.assertEqual(df["Suite ID"].tolist(), ["bwa", "fastp"])
+        self.assertEqual(df["Tool IDs"].tolist(), [["bwa", "bwa_mem"], ["fastp"]])
+        self.assertEqual(df["EDAM operations"].tolist(), [["Read mapping", "Sequence alignment"], []])
+
+    def test_reads_tsv_with_list_columns(self) -> None:
+        df = shared.read_table(
+            self.tsv_path,
+            columns=["Suite ID", "Tool IDs", "EDAM operations", "Missing"],
+            list_columns=["Tool IDs", "EDAM operations"],
+        )
+        self.check_table(df)
+
+    def test_prefers_parquet(self) -> None:
+        export_tools_to_parquet(self.tools, self.tsv_path)
+        self.check_table(
+            shared.read_table(self.tsv_path, columns=lambda col: col in ("Suite ID", "Tool IDs", "EDAM operations"))
+        )
+        df = shared.read_table(self.tsv_path, columns=lambda col: col.startswith(("Number", "Suite runs")))
+        self.assertEqual(df["Number of tools on UseGalaxy.eu"].tolist(), [2, 1])
+        self.assertTrue(pd.isna(df["Suite runs on main servers"].iloc[0]))
+        # the TSV file is used when changed after the Parquet file, whatever the modification times
+        parquet_path = shared.get_parquet_path(self.tsv_path)
+        with open(self.tsv_path, "a") as f:
+            f.write("spades\tspades\t\t0\t\n")
+        os.utime(self.tsv_path, (0, 0))
+        self.assertGreater(parquet_path.stat().st_mtime, Path(self.tsv_path).stat().st_mtime)
+        df = shared.read_table(self.tsv_path, columns=["Suite ID", "Tool IDs"])
+        self.assertEqual(df["Tool IDs"].tolist(), ["bwa, bwa_mem", "fastp", "spades"])
+
+
+class TestSerialization(unittest.TestCase):
+    def setUp(self) -> None:
+        shared_list = ["a", "b"]
+        self.documents: List[Any] = [
+            [],
+            {},
+            None,
+            "text",
+            {"tools": [{"name": "fastp", "owner": "iuc"}], "install_tool_dependencies": True},
+            [
+                {
+                    "Suite ID": "fastp",
+                    "Tool IDs": ["fastp"],
+                    "Description": "Fast all-in-one " * 10,
+                    "number": 1.5,
+                    "date": date(2024, 1, 2),
+                },
+                # folded differently by libyaml
+                {"Suite ID": "spades", "Description": "St. Petersburg genome assembler \u2013 is intended " * 5},
+                {"Suite ID": "multiline", "Description": "first line\nsecond line " * 10},
+                {"": "empty key", "date": "2020-01-01", "yes": None},
+                {"tuple": (1, 2)},
+                {"shared": shared_list, "again": shared_list},
+            ],
+            [{"shared": shared_list}, {"shared": shared_list}],
+        ]
+
+    def test_dump_yaml_as_yaml_dump(self) -> None:
+        for data in self.documents:
+            self.assertEqual(shared.dump_yaml(data), yaml.dump(data, default_flow_style=False))
+
+    def test_write_yaml_list_as_yaml_dump(self) -> None:
+        for data in self.documents[:1] + self.documents[5:6]:
+            f = io.StringIO()
+            shared.write_yaml_list(iter(data), f)
+            self.assertEqual(f.getvalue(), yaml.dump(data, default_flow_style=False))
+
+    def test_write_json_list_as_json_dump(self) -> None:
+        data: List[Any] = [{"b": ["x", "y"], "a": {"c": "\n\u2013"}}, 1, [], {}, None, {"set": {"z"}}]
+        for items in ([], data):
+            for kwargs in ({"sort_keys": True}, {"default": list}):
+                if "set" in str(items) and "default" not in kwargs:
+                    continue
+                f = io.StringIO()
+                shared.write_json_list(iter(items), f, **kwargs)
+                self.assertEqual(f.getvalue(), json.dumps(items, indent=4, **kwargs))
+
+    def test_load_json_and_yaml(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            json_fp = Path(tmp_dir) / "data.json"
+            json_fp.write_text('[{"a": 1, "b": "\\u2013"}, NaN]')
+            data = shared.load_json(str(json_fp))
+            self.assertEqual(data[0], {"a": 1, "b": "\u2013"})
+            self.assertNotEqual(data[1], data[1])
+            yml_fp = Path(tmp_dir) / "data.yml"
+            yml_fp.write_text(shared.dump_yaml(self.documents[5][:4]))
+            self.assertEqual(shared.load_yaml(str(yml_fp)), self.documents[5][:4])
+
 
 class TestExtractTopToolsPerCategory(unittest.TestCase):
     def test_returns_top_tools(self) -> None:
@@ -769,6 +1917,71 @@ class TestFillLabToolSection(unittest.TestCase):
         self.assertIn(first_tab_id, ["more_tools", "de-novo_assembly", "quality_control"])
 
 
+class TestMergeToolShards(unittest.TestCase):
+    def test_iter_json_array(self) -> None:
+        items = [{"a": [1, 2]}, 12, "text, with ] and ,", None, []]
+        with tempfile.TemporaryFile("w+") as f:
+            json.dump(items, f, indent=4)
+            f.seek(0)
+            self.assertEqual(list(shared.iter_json_array(f, chunk_size=3)), items)
+            f.seek(0)
+            f.truncate()
+            f.write("[]")
+            f.seek(0)
+            self.assertEqual(list(shared.iter_json_array(f)), [])
+
+    def test_merges_and_deduplicates(self) -> None:
+        def _tool(suite_id: str, owner: str, folder: str) -> Dict[str, Any]:
+            return {
+                "Suite ID": suite_id,
+                "Suite owner": owner,
+                "Suite parsed folder": folder,
+                "Tool IDs": [suite_id],
+                "Number of tools on UseGalaxy.eu": 1,
+            }
+
+        shards = {
+            "repositories02.list_tools": [_tool("fastp", "iuc", "b/fastp"), _tool("bwa", "devteam", "b/bwa")],
+            "repositories01.list_tools": [
+                _tool("seqtk", "iuc", "a/seqtk"),
+                _tool("fastp", "iuc", "a/fastp"),
+                _tool("fastp", "bgruening", "a/fastp2"),
+            ],
+        }
+        expected = shards["repositories01.list_tools"] + [shards["repositories02.list_tools"][1]]
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            tmp = Path(tmp_dir)
+            for name, tools in shards.items():
+                export_tools_to_json(tools, str(tmp / f"{name}.json"))
+                pd.DataFrame(tools).sort_values("Suite ID").to_csv(tmp / f"{name}.tsv", sep="\t", index=False)
+                export_tools_to_parquet(tools, str(tmp / f"{name}.tsv"))
+            # a shard without tools, with the placeholder columns, first in path order
+            export_tools_to_json([], str(tmp / "repositories00.list_tools.json"))
+            export_tools_to_tsv([], str(tmp / "repositories00.list_tools.tsv"))
+            report = merge_tool_shards(
+                [str(tmp / f"{name}.json") for name in [*shards, "repositories00.list_tools"]],
+                str(tmp / "tools.json"),
+                str(tmp / "tools.tsv"),
+                str(tmp / "tools.yml"),
+            )
+            self.assertEqual(report, {"shards": 3, "tools": 4, "duplicates": 1})
+
+            export_tools_to_json(expected, str(tmp / "expected.json"))
+            self.assertEqual((tmp / "tools.json").read_text(), (tmp / "expected.json").read_text())
+            export_tools_to_yml(copy.deepcopy(expected), str(tmp / "expected.yml"))
+            self.assertEqual((tmp / "tools.yml").read_text(), (tmp / "expected.yml").read_text())
+            tsv = pd.read_csv(tmp / "tools.tsv", sep="\t")
+            self.assertEqual(tsv["Suite ID"].tolist(), ["bwa", "fastp", "fastp", "seqtk"])
+            self.assertEqual(
+                sorted(tsv["Suite parsed folder"]), sorted(tool["Suite parsed folder"] for tool in expected)
+            )
+            # the Parquet table has the same suites in the same order, with native list columns
+            self.assertTrue(shared.is_parquet_current(str(tmp / "tools.tsv")))
+            table = shared.read_table(str(tmp / "tools.tsv"))
+            self.assertEqual(table["Suite parsed folder"].tolist(), tsv["Suite parsed folder"].tolist())
+            self.assertEqual(table["Tool IDs"].tolist(), [[suite_id] for suite_id in tsv["Suite ID"]])
+
+
 class TestExportMissingToolsToYaml(unittest.TestCase):
     def test_writes_yaml(self) -> None:
         tmp = tempfile.NamedTemporaryFile(delete=False, suffix=".yaml")
@@ -827,6 +2040,68 @@ class TestLoadToolXmlFallback(unittest.TestCase):
             os.remove(tmp.name)
 
 
+class TestLoadToolXml(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.tool_dir = Path(self.tmp.name)
+        (self.tool_dir / "macros.xml").write_text("""<macros>
+    <token name="@TOOL_VERSION@">1.0</token>
+    <token name="@VERSION@">@TOOL_VERSION@+galaxy0</token>
+    <xml name="requirements">
+        <requirements><requirement type="package" version="@TOOL_VERSION@">tool</requirement></requirements>
+    </xml>
+    <xml name="citations"><citations><citation type="doi">10.1000/1</citation></citations></xml>
+</macros>""")
+        self.folder_tokens = {"@TOOL_VERSION@": "1.0", "@VERSION@": "1.0+galaxy0"}
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    def needs_expansion(self, tool_xml: str, folder_tokens: Optional[Dict[str, str]] = None) -> bool:
+        xml_path = self.tool_dir / "tool.xml"
+        xml_path.write_text(tool_xml)
+        return needs_macro_expansion(
+            et.parse(xml_path).getroot(),
+            self.tool_dir,
+            self.folder_tokens if folder_tokens is None else folder_tokens,
+        )
+
+    def test_needs_macro_expansion(self) -> None:
+        literal = """<tool id="tool" version="@VERSION@">
+    <macros><import>macros.xml</import></macros>
+    <requirements><requirement type="package">tool</requirement></requirements>
+    <outputs><data name="out" format="tabular"/></outputs>
+    <expand macro="citations"/>
+</tool>"""
+        self.assertFalse(self.needs_expansion(literal))
+        # requirements added by a macro, expand in a section, tokens not resolved as Galaxy
+        for tool_xml in (
+            literal.replace('<expand macro="citations"/>', '<expand macro="requirements"/>'),
+            literal.replace('<expand macro="citations"/>', '<expand macro="unknown"/>'),
+            literal.replace("<outputs>", '<outputs><expand macro="citations"/>'),
+            literal.replace('id="tool"', 'id="@TOOL_ID@"'),
+            literal.replace(">tool</requirement>", ">@TOOL_VERSION@</requirement>"),
+            literal.replace("</macros>", '<token name="@TOOL_VERSION@">2.0</token></macros>'),
+        ):
+            self.assertTrue(self.needs_expansion(tool_xml))
+        self.assertTrue(self.needs_expansion(literal, {"@VERSION@": "2.0"}))
+
+    def test_expands_macros_only_when_needed(self) -> None:
+        test_data = Path(__file__).parent / "test-data"
+        expected = {
+            folder: get_tool_metadata_from_local(test_data / folder, test_data, first_commit_dates={})
+            for folder in ("fastp_test", "2d_auto_threshold_test")
+        }
+        xml_macros_load = MagicMock(side_effect=et.parse)
+        with patch("extract_galaxy_tools._get_xml_macros_load", return_value=xml_macros_load):
+            for folder, metadata in expected.items():
+                self.assertEqual(
+                    get_tool_metadata_from_local(test_data / folder, test_data, first_commit_dates={}), metadata
+                )
+        # the xrefs of fastp come from the biotools macro
+        xml_macros_load.assert_called_once_with(str(test_data / "fastp_test" / "fastp.xml"))
+
+
 class TestExtractMissingToolsPerServers(unittest.TestCase):
     def test_returns_missing_tools_dict(self) -> None:
         data = {
@@ -0,0 +1,126 @@
+import json
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from typing import (
+    Any,
+    Dict,
+    List,
+)
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from extract_galaxy_tools import check_categories
+from extract_galaxy_workflows import Workflows
+from extract_gtn_tutorials import filter_tutorials
+from filter_communities import (
+    filter_communities,
+    get_communities,
+    route_tools,
+    route_tutorials,
+    route_workflows,
+)
+
+
+def _workflow(source: str, name: str, tags: List[str]) -> Dict[str, Any]:
+    return {
+        "source": source,
+        "id": name,
+        "link": f"https://example.org/{name}",
+        "name": name,
+        "creators": [],
+        "tags": tags,
+        "create_time": "",
+        "update_time": "",
+        "latest_version": 1,
+        "versions": 1,
+        "number_of_steps": 1,
+        "tools": [],
+        "edam_operation": [],
+        "edam_topic": [],
+        "license": "",
+        "doi": "",
+        "projects": [],
+    }
+
+
+class TestRouting(unittest.TestCase):
+    def test_route_tools_as_check_categories(self) -> None:
+        tools: List[Dict[str, Any]] = [
+            {"Suite ID": "t1", "ToolShed categories": ["Assembly", "Imaging"]},
+            {"Suite ID": "t2", "ToolShed categories": None},
+            {"Suite ID": "t3", "ToolShed categories": ["Proteomics"]},
+            {"Suite ID": "t4", "ToolShed categories": ["Imaging"]},
+        ]
+        categories = {"assembly": ["Assembly"], "imaging": ["Imaging", "Assembly"], "all": [], "other": ["Other"]}
+        routed = route_tools(tools, categories)
+        for community, community_categories in categories.items():
+            expected = [tool for tool in tools if check_categories(tool["ToolShed categories"], community_categories)]
+            self.assertEqual(routed.get(community, []), expected)
+
+    def test_route_workflows_as_filter_workflows_by_tags(self) -> None:
+        workflows: Any = [
+            _workflow("WorkflowHub", "amr detection", ["bacteria"]),
+            _workflow("WorkflowHub", "imaging", ["cells"]),
+            _workflow("usegalaxy.eu", "plant assembly", ["bacteria"]),
+            _workflow("usegalaxy.eu", "other", ["microgalaxy"]),
+        ]
+        tags = {
+            "microgalaxy": {"workflowhub": ["bacteria", "amr"], "public": ["microgalaxy"]},
+            "imaging": {"workflowhub": ["imaging"], "public": ["cells"]},
+            "plants": {"workflowhub": [], "public": ["plant"]},
+        }
+        wfs = Workflows()
+        wfs.init_by_importing(workflows)
+        routed = route_workflows(wfs.workflows, tags)
+        for community, community_tags in tags.items():
+            expected = [wf for wf in wfs.workflows if wf.test_tags(community_tags) or wf.test_name(community_tags)]
+            self.assertEqual(routed.get(community, []), expected)
+
+    def test_route_tutorials_as_filter_tutorials(self) -> None:
+        tutorials: List[Dict[str, Any]] = [
+            {"title": "a", "tags": ["microgalaxy", "assembly"]},
+            {"title": "b"},
+            {"title": "c", "tags": ["imaging"]},
+        ]
+        tags = {"microgalaxy": ["microgalaxy"], "imaging": ["imaging", "assembly"], "all": []}
+        routed = route_tutorials(tutorials, tags)
+        for community, community_tags in tags.items():
+            self.assertEqual(routed.get(community, []), filter_tutorials(tutorials, community_tags))
+
+
+class TestFilterCommunities(unittest.TestCase):
+    def test_filters_and_curates_tools_per_community(self) -> None:
+        tools_fp = Path(__file__).parents[3] / "communities" / "all" / "resources" / "test_tools.json"
+        with tools_fp.open() as f:
+            tool = json.load(f)[0]
+        tool["ToolShed categories"] = ["Sequence Analysis"]
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            communities_dir = Path(tmp_dir)
+            for community, to_keep in (("a", "True"), ("b", "False")):
+                metadata_dir = communities_dir / community / "metadata"
+                metadata_dir.mkdir(parents=True)
+                (metadata_dir / "categories").write_text("Sequence Analysis\n")
+                (metadata_dir / "tool_status.tsv").write_text(
+                    "Suite ID\tSuite owner\tDescription\tTo keep\tDeprecated\n"
+                    f"{tool['Suite ID']}\t{tool['Suite owner']}\t\t{to_keep}\tFalse\n"
+                )
+            (communities_dir / "all" / "metadata").mkdir(parents=True)
+            tools_fp = communities_dir / "tools.json"
+            tools_fp.write_text(json.dumps([tool, dict(tool, **{"Suite ID": "other", "ToolShed categories": []})]))
+
+            communities = get_communities(communities_dir)
+            self.assertEqual(communities, ["a", "b"])
+            filter_communities(communities_dir, communities, str(tools_fp), None, None)
+
+            with (communities_dir / "a" / "resources" / "tools_filtered_by_ts_categories.json").open() as f:
+                curated = json.load(f)
+            self.assertEqual([t["Suite ID"] for t in curated], [tool["Suite ID"]])
+            self.assertTrue(curated[0]["To keep"])
+            with (communities_dir / "b" / "resources" / "tools_filtered_by_ts_categories.json").open() as f:
+                filtered = json.load(f)
+            # the status of a community does not leak into the other one
+            self.assertFalse(filtered[0]["To keep"])
+            self.assertFalse((communities_dir / "b" / "resources" / "curated_tools.tsv").exists())